@@ -1,21 +1,114 @@
 # app/agents/urban_agent.py
 from app.core.agent_base import AgentBase
-from app.core.cognitive_services import CognitiveServicesClient
+from app.core import admission, deadline
+from app.core.admission import AdmissionRejectedError
+from app.core.answer_cache import mark_degraded
+from app.core.cognitive_services import CognitiveServicesClient, TextAnalysis
+from app.core.deadline import DeadlineExceeded
+from app.core.batching import create_batcher
+from app.core.local_nlp import LocalFastPath
+from app.core.metrics import STAGE_SECONDS, STREAM_FIRST_EVENT_SECONDS
+from app.core.streaming import analysis_events, chunk_text
+from app.core.topics import TopicTable
+from app.core.tracing import tracer
+import time
+import asyncio
 import logging
-from typing import List
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    from app.core.async_cognitive_services import AsyncCognitiveServicesClient
 
 class UrbanAgent(AgentBase):
     """
     A specific agent for urban-related questions. Inherits from AgentBase and implements
     the 'run' method to provide specific responses related to urban topics.
+    It is the default agent, answering every question no other agent claims.
     """
+    name = "urban"
+
     def __init__(self):
         """
         Initialize the agent. You can load data, models, or any setup here if needed.
         """
         super().__init__()  # Call the parent constructor to ensure proper initialization
         self.logger = logging.getLogger(__name__)  # Set up logging for debugging and tracking
-        self.cognitive_client = CognitiveServicesClient()  # Initialize the Azure Cognitive Services client
+        self.topics = TopicTable()  # Compiled topic matcher, reloaded when the topic file changes
+        self.fast_path = LocalFastPath()  # Local analysis that answers confident cases without Azure
+        self._build_lock = threading.Lock()  # Azure clients are built on first use (see _lazy)
+
+    def _lazy(self, name: str, factory: Callable[[], Any]) -> Any:
+        """
+        Return the component stored under 'name', building it on first use.
+        Requests racing for a component that is not built yet get the same one.
+        """
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            with self._build_lock:
+                if name not in self.__dict__:
+                    self.__dict__[name] = factory()
+                return self.__dict__[name]
+
+    @property
+    def cognitive_client(self) -> CognitiveServicesClient:
+        """The Azure Cognitive Services client"""
+        return self._lazy("_cognitive_client", CognitiveServicesClient)
+
+    @cognitive_client.setter
+    def cognitive_client(self, client: CognitiveServicesClient):
+        self.__dict__["_cognitive_client"] = client
+
+    @property
+    def async_cognitive_client(self) -> "AsyncCognitiveServicesClient":
+        """The client of the asynchronous (ASGI) path; WSGI workers never import httpx for it"""
+        def build():
+            from app.core.async_cognitive_services import AsyncCognitiveServicesClient
+            return AsyncCognitiveServicesClient()
+        return self._lazy("_async_cognitive_client", build)
+
+    @async_cognitive_client.setter
+    def async_cognitive_client(self, client: "AsyncCognitiveServicesClient"):
+        self.__dict__["_async_cognitive_client"] = client
+
+    @property
+    def batcher(self):
+        """Merges concurrent questions into batches when enabled, otherwise None"""
+        return self._lazy("_batcher", lambda: create_batcher(self.cognitive_client))
+
+    @batcher.setter
+    def batcher(self, batcher):
+        self.__dict__["_batcher"] = batcher
+
+    def warm_up(self, connect: bool = True):
+        """
+        Build the Azure clients ahead of the first question, which would otherwise pay for them.
+
+        Parameters:
+        - connect (bool): Also open pooled connections to Azure and the analysis cache. Only
+          worth it in the process that serves traffic, since connections do not survive a fork.
+        """
+        client = self.cognitive_client
+        self.batcher  # Built now rather than by the first question
+        if connect:
+            client.warm_up()
+
+    def reset_connections(self):
+        """Give the clients built so far new connection pools; called in forked worker processes"""
+        for name in ("_cognitive_client", "_async_cognitive_client"):
+            client = self.__dict__.get(name)
+            if client is not None:
+                client.reset_session()
+
+    async def awarm_up(self):
+        """
+        Asynchronous counterpart of warm_up for the ASGI path: builds the clients and
+        opens a pooled connection to Azure on the running event loop.
+        """
+        self.warm_up(connect=False)
+        await self.async_cognitive_client.warm_up()
 
     def run(self, question: str) -> str:
         """
@@ -36,19 +129,21 @@ class UrbanAgent(AgentBase):
             response = self.process_urban_question(question)
 
             # Log the response for debugging purposes
-            self.logger.info(f"Answering question: {question} with response: {response}")
+            self.logger.debug("Answering question: %s with response: %s", question, response)
             return response
 
         except ValueError as e:
             # Log and handle known exceptions
-            self.logger.error(f"Error: {str(e)}")
+            self.logger.error("Error: %s", e)
             return f"Error: {str(e)}"
 
         except Exception as e:
             # Log and handle unexpected exceptions
-            self.logger.error(f"Unexpected error: {str(e)}")
+            self.logger.error("Unexpected error: %s", e)
+            mark_degraded()
             return "Sorry, there was an issue processing your request."
 
+    @tracer.traced("process_urban_question")
     def process_urban_question(self, question: str) -> str:
         """
         Process urban-related questions using Azure Cognitive Services for enhanced responses.
@@ -59,37 +154,390 @@ class UrbanAgent(AgentBase):
         Returns:
         - str: A dynamic response based on the question and AI analysis.
         """
-        # Use Azure Cognitive Services to analyze the question
+        # Answer from the local analyzer when the mode and its confidence allow it
+        analysis = self.fast_path.try_local(question)
+        if analysis is not None:
+            return self.respond_to_analysis(question, analysis)
+
+        # While Azure is failing, skip the network entirely and use the degraded path
+        if self.cognitive_client.circuit_open():
+            self.logger.warning("Azure circuit breaker open, answering without Cognitive Services")
+            return self.fallback_response(question)
+
+        # Otherwise use Azure Cognitive Services to analyze the question
         try:
-            # Detect language of the question
-            language, language_confidence = self.cognitive_client.detect_language(question)
-            if language != "English" and language_confidence > 0.8:
-                self.logger.info(f"Detected non-English question in {language}")
-                # We could add translation here in the future
-            
-            # Extract key phrases to better understand the question's focus
-            key_phrases = self.cognitive_client.extract_key_phrases(question)
-            self.logger.info(f"Extracted key phrases: {key_phrases}")
-            
-            # Analyze sentiment to gauge user's emotional context
-            sentiment, sentiment_score = self.cognitive_client.analyze_sentiment(question)
-            self.logger.info(f"Detected sentiment: {sentiment} with score {sentiment_score}")
+            # Out of time already: do not start on Azure at all
+            deadline.check("analysis")
+            # Detect language, key phrases and sentiment in one concurrent exchange,
+            # shared with other questions arriving at the same time when micro-batching is on.
+            # Each call is bounded by the request's deadline; stages it cuts short fall back
+            # on their own, so the answer keeps whatever analysis did complete.
+            if self.batcher:
+                try:
+                    analysis = self.batcher.analyze(question, timeout=deadline.remaining())
+                except FutureTimeoutError:
+                    deadline.exceeded("micro_batch")
+            else:
+                analysis = self.cognitive_client.analyze(question)
+            return self.respond_to_analysis(question, analysis)
+
+        except AdmissionRejectedError as e:
+            # Over the Azure quota or budget: answer now rather than wait
+            self.logger.warning("Azure call shed (%s), answering without Cognitive Services", e.reason)
+            return self.fallback_response(question)
+
+        except DeadlineExceeded as e:
+            self.logger.warning("Request deadline exceeded at %s, answering without Cognitive Services", e.stage)
+            return self.fallback_response(question)
             
-            # Enhanced response logic using AI insights
-            response = self.generate_enhanced_response(question, key_phrases, sentiment)
+        except Exception as e:
+            self.logger.error("Error using Cognitive Services: %s", e)
+            return self.fallback_response(question)
+
+    @tracer.traced("process_urban_questions")
+    def process_urban_questions(self, questions: List[str]) -> List[str]:
+        """
+        Process many urban-related questions, sharing multi-document Azure requests between them.
+
+        Parameters:
+        - questions (List[str]): The urban-related questions to process.
+
+        Returns:
+        - List[str]: One response per question, in the same order.
+        """
+        # Only questions the local analyzer cannot answer confidently go to Azure
+        analyses = [self.fast_path.try_local(question) for question in questions]
+        remote = [index for index, analysis in enumerate(analyses) if analysis is None]
+        if remote and self.cognitive_client.circuit_open():
+            self.logger.warning("Azure circuit breaker open, answering without Cognitive Services")
+            for index in remote:
+                analyses[index] = self.fast_path.fallback(questions[index])
+        elif remote:
+            try:
+                # Batch jobs queue behind interactive questions for the Azure quota
+                deadline.check("analysis")
+                with admission.priority(admission.BATCH):
+                    remote_analyses = self.cognitive_client.analyze_batch([questions[index] for index in remote])
+            except AdmissionRejectedError as e:
+                self.logger.warning("Azure batch shed (%s), answering without Cognitive Services", e.reason)
+                remote_analyses = [self.fast_path.fallback(questions[index]) for index in remote]
+            except DeadlineExceeded as e:
+                self.logger.warning("Request deadline exceeded at %s, answering without Cognitive Services", e.stage)
+                remote_analyses = [self.fast_path.fallback(questions[index]) for index in remote]
+            except Exception as e:
+                self.logger.error("Error using Cognitive Services: %s", e)
+                remote_analyses = [self.fast_path.fallback(questions[index]) for index in remote]
+            for index, analysis in zip(remote, remote_analyses):
+                analyses[index] = analysis
+
+        return [self.respond_to_analysis(question, analysis) for question, analysis in zip(questions, analyses)]
+
+    def run_batch(self, questions: List[str]) -> List[str]:
+        """
+        Answer many questions with one shared analysis round trip to Azure per operation.
+
+        Parameters:
+        - questions (List[str]): The questions to be answered by the agent.
+
+        Returns:
+        - List[str]: One response per question, in the same order.
+        """
+        # Empty questions are answered with an error, as 'run' does, and the rest share the round trip
+        valid = [question for question in questions if question]
+        try:
+            answers = self.process_urban_questions(valid) if valid else []
+        except Exception as e:
+            answers = self._batch_failed(valid, e)
+        return self._merge_answers(questions, answers)
+
+    async def arun_batch(self, questions: List[str]) -> List[str]:
+        """
+        Asynchronous counterpart of 'run_batch' that awaits Azure instead of blocking a thread.
+
+        Parameters:
+        - questions (List[str]): The questions to be answered by the agent.
+
+        Returns:
+        - List[str]: One response per question, in the same order.
+        """
+        valid = [question for question in questions if question]
+        try:
+            answers = await self.aprocess_urban_questions(valid) if valid else []
+        except Exception as e:
+            answers = self._batch_failed(valid, e)
+        return self._merge_answers(questions, answers)
+
+    def _batch_failed(self, questions: List[str], error: Exception) -> List[str]:
+        self.logger.error("Unexpected error: %s", error)
+        mark_degraded()
+        return ["Sorry, there was an issue processing your request."] * len(questions)
+
+    @staticmethod
+    def _merge_answers(questions: List[str], answers: List[str]) -> List[str]:
+        """Put the answers to the non-empty questions back in place among errors for the empty ones"""
+        remaining = iter(answers)
+        return [next(remaining) if question else "Error: Question cannot be empty" for question in questions]
+
+    async def arun(self, question: str) -> str:
+        """
+        Asynchronous counterpart of 'run' that awaits Azure instead of blocking a thread.
+
+        Parameters:
+        - question (str): The question to be answered by the agent.
+
+        Returns:
+        - str: The response to the question.
+        """
+        try:
+            if not question:
+                raise ValueError("Question cannot be empty")
+
+            response = await self.aprocess_urban_question(question)
+
+            self.logger.debug("Answering question: %s with response: %s", question, response)
             return response
-            
+
+        except ValueError as e:
+            self.logger.error("Error: %s", e)
+            return f"Error: {str(e)}"
+
         except Exception as e:
-            self.logger.error(f"Error using Cognitive Services: {str(e)}")
-            
-            # Fall back to basic response logic if AI analysis fails
-            if "traffic" in question.lower():
-                return "Traffic is heavy in downtown today."
-            elif "weather" in question.lower():
-                return "The weather today is sunny with a high of 25°C."
+            self.logger.error("Unexpected error: %s", e)
+            mark_degraded()
+            return "Sorry, there was an issue processing your request."
+
+    @tracer.traced("process_urban_question")
+    async def aprocess_urban_question(self, question: str) -> str:
+        """
+        Asynchronous counterpart of 'process_urban_question'. The three analyses
+        run concurrently on the event loop.
+
+        Parameters:
+        - question (str): The urban-related question to process.
+
+        Returns:
+        - str: A dynamic response based on the question and AI analysis.
+        """
+        analysis = self.fast_path.try_local(question)
+        if analysis is not None:
+            return self.respond_to_analysis(question, analysis)
+
+        if self.async_cognitive_client.circuit_open():
+            self.logger.warning("Azure circuit breaker open, answering without Cognitive Services")
+            return self.fallback_response(question)
+
+        try:
+            deadline.check("analysis")
+            if self.batcher:
+                # Shielded: the batch goes on for the other questions in it
+                try:
+                    analysis = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(self.batcher.submit(question))),
+                                                      deadline.remaining())
+                except asyncio.TimeoutError:
+                    deadline.exceeded("micro_batch")
+            else:
+                analysis = await self.async_cognitive_client.analyze(question)
+            return self.respond_to_analysis(question, analysis)
+
+        except AdmissionRejectedError as e:
+            self.logger.warning("Azure call shed (%s), answering without Cognitive Services", e.reason)
+            return self.fallback_response(question)
+
+        except DeadlineExceeded as e:
+            self.logger.warning("Request deadline exceeded at %s, answering without Cognitive Services", e.stage)
+            return self.fallback_response(question)
+
+        except Exception as e:
+            self.logger.error("Error using Cognitive Services: %s", e)
+            return self.fallback_response(question)
+
+    @tracer.traced("aprocess_urban_questions")
+    async def aprocess_urban_questions(self, questions: List[str]) -> List[str]:
+        """
+        Asynchronous counterpart of 'process_urban_questions'.
+
+        Parameters:
+        - questions (List[str]): The urban-related questions to process.
+
+        Returns:
+        - List[str]: One response per question, in the same order.
+        """
+        analyses = [self.fast_path.try_local(question) for question in questions]
+        remote = [index for index, analysis in enumerate(analyses) if analysis is None]
+        if remote and self.async_cognitive_client.circuit_open():
+            self.logger.warning("Azure circuit breaker open, answering without Cognitive Services")
+            for index in remote:
+                analyses[index] = self.fast_path.fallback(questions[index])
+        elif remote:
+            try:
+                deadline.check("analysis")
+                with admission.priority(admission.BATCH):
+                    remote_analyses = await self.async_cognitive_client.analyze_batch(
+                        [questions[index] for index in remote])
+            except AdmissionRejectedError as e:
+                self.logger.warning("Azure batch shed (%s), answering without Cognitive Services", e.reason)
+                remote_analyses = [self.fast_path.fallback(questions[index]) for index in remote]
+            except DeadlineExceeded as e:
+                self.logger.warning("Request deadline exceeded at %s, answering without Cognitive Services", e.stage)
+                remote_analyses = [self.fast_path.fallback(questions[index]) for index in remote]
+            except Exception as e:
+                self.logger.error("Error using Cognitive Services: %s", e)
+                remote_analyses = [self.fast_path.fallback(questions[index]) for index in remote]
+            for index, analysis in zip(remote, remote_analyses):
+                analyses[index] = analysis
+
+        return [self.respond_to_analysis(question, analysis) for question, analysis in zip(questions, analyses)]
+
+    async def astream(self, question: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Answer a question as a series of events, so a client can show progress
+        before the answer is complete. The three Azure analyses run concurrently
+        and each is reported as soon as it returns; micro-batching is bypassed,
+        since it would hold every result back until the slowest one.
+
+        Parameters:
+        - question (str): The question to be answered by the agent.
+
+        Yields:
+        - Tuple[str, Dict[str, Any]]: ("language", ...), ("key_phrases", ...) and
+          ("sentiment", ...) in the order they complete, then ("answer", {"text": chunk})
+          for each chunk of the response and finally ("done", {"response": response}).
+        """
+        start = time.perf_counter()
+        first = True
+
+        def timed(event):
+            nonlocal first
+            if first:
+                STREAM_FIRST_EVENT_SECONDS.observe(time.perf_counter() - start)
+                first = False
+            return event
+
+        try:
+            if not question:
+                raise ValueError("Question cannot be empty")
+
+            analysis = self.fast_path.try_local(question)
+            source = "local"
+            if analysis is None and self.async_cognitive_client.circuit_open():
+                self.logger.warning("Azure circuit breaker open, answering without Cognitive Services")
+                analysis, source = self.fast_path.fallback(question), "fallback"
+                mark_degraded()
+
+            if analysis is not None:
+                for event in analysis_events(analysis, source):
+                    yield timed(event)
             else:
-                return f"Urban Copilot Response to: {question}"
+                analysis = TextAnalysis()
+                async for event in self._astream_analysis(question, analysis):
+                    yield timed(event)
+            response = self.respond_to_analysis(question, analysis)
+
+        except ValueError as e:
+            self.logger.error("Error: %s", e)
+            response = f"Error: {str(e)}"
+
+        except Exception as e:
+            self.logger.error("Unexpected error: %s", e)
+            mark_degraded()
+            response = "Sorry, there was an issue processing your request."
+
+        for chunk in chunk_text(response):
+            yield timed(("answer", {"text": chunk}))
+        yield ("done", {"response": response})
+
+    async def _astream_analysis(self, question: str, analysis: TextAnalysis) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Run the three Azure analyses concurrently, filling in 'analysis' and
+        yielding an event as each completes. If the calls are shed, the local
+        fallback analysis replaces them and its events are yielded instead.
+        """
+        client = self.async_cognitive_client
+        tasks = {
+            asyncio.ensure_future(client.detect_language(question)): "language",
+            asyncio.ensure_future(client.extract_key_phrases(question)): "key_phrases",
+            asyncio.ensure_future(client.analyze_sentiment(question)): "sentiment",
+        }
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if tasks[task] == "language":
+                        analysis.language, analysis.language_confidence = task.result()
+                        yield "language", {"language": analysis.language,
+                                           "confidence": analysis.language_confidence, "source": "azure"}
+                    elif tasks[task] == "key_phrases":
+                        analysis.key_phrases = task.result()
+                        yield "key_phrases", {"key_phrases": analysis.key_phrases, "source": "azure"}
+                    else:
+                        analysis.sentiment, analysis.sentiment_score = task.result()
+                        yield "sentiment", {"sentiment": analysis.sentiment,
+                                            "score": analysis.sentiment_score, "source": "azure"}
+
+        except AdmissionRejectedError as e:
+            self.logger.warning("Azure call shed (%s), answering without Cognitive Services", e.reason)
+            mark_degraded()
+            fallback = self.fast_path.fallback(question)
+            analysis.__dict__.update(fallback.__dict__)
+            for event in analysis_events(analysis, "fallback"):
+                yield event
+
+        finally:
+            # The client may have gone away: stop waiting on Azure for it
+            for task in pending:
+                task.cancel()
+
+    def respond_to_analysis(self, question: str, analysis: TextAnalysis) -> str:
+        """
+        Build the response to a question once its analysis is available.
+
+        Parameters:
+        - question (str): The original question
+        - analysis (TextAnalysis): Language, key phrases and sentiment of the question
+
+        Returns:
+        - str: An enhanced response tailored to the question context
+        """
+        if analysis.degraded:
+            mark_degraded()  # Part of the analysis is a fallback value
+
+        if analysis.language != "English" and analysis.language_confidence > 0.8:
+            self.logger.info("Detected non-English question in %s", analysis.language)
+            # We could add translation here in the future
+        
+        self.logger.debug("Extracted key phrases: %s", analysis.key_phrases)
+        self.logger.debug("Detected sentiment: %s with score %s", analysis.sentiment, analysis.sentiment_score)
+        
+        # Enhanced response logic using AI insights
+        return self.generate_enhanced_response(question, analysis.key_phrases, analysis.sentiment)
+
+    def fallback_response(self, question: str) -> str:
+        """
+        Response used when AI analysis fails: the question is analyzed locally
+        instead, whatever the local confidence.
+
+        Parameters:
+        - question (str): The original question
+
+        Returns:
+        - str: A response based on the local analysis, or a canned one
+        """
+        mark_degraded()
+        try:
+            analysis = self.fast_path.fallback(question)
+            return self.generate_enhanced_response(question, analysis.key_phrases, analysis.sentiment)
+        except Exception as e:
+            self.logger.error("Error analyzing question locally: %s", e)
+
+        if "traffic" in question.lower():
+            return "Traffic is heavy in downtown today."
+        elif "weather" in question.lower():
+            return "The weather today is sunny with a high of 25°C."
+        else:
+            return f"Urban Copilot Response to: {question}"
                 
+    @tracer.traced("generate_response")
     def generate_enhanced_response(self, question: str, key_phrases: List[str], sentiment: str) -> str:
         """
         Generate an enhanced response using AI insights from cognitive services
@@ -102,21 +550,11 @@ class UrbanAgent(AgentBase):
         Returns:
         - str: An enhanced response tailored to the question context
         """
-        # Example implementation - in production, this could use more advanced NLP or LLM
-        topic_responses = {
-            "traffic": "The current traffic conditions show moderate congestion in the city center. Consider using public transit or alternative routes.",
-            "parking": "There are several parking spots available in the downtown area. You can use the city's parking app to find and reserve a spot.",
-            "weather": "The current weather is mild with a chance of light showers in the evening. It's a good day for outdoor activities with proper preparation.",
-            "event": "There are several city events happening this weekend including a farmers market, art exhibition, and community cleanup.",
-            "public transit": "The public transit system is operating normally with minor delays on the blue line due to scheduled maintenance.",
-        }
-        
-        # Check if any key phrases match our topics
-        for phrase in key_phrases:
-            phrase_lower = phrase.lower()
-            for topic, response in topic_responses.items():
-                if topic in phrase_lower:
-                    return response
+        # Match key phrases against the precompiled topic table
+        with STAGE_SECONDS.labels(stage="topic_match").time():
+            topic = self.topics.index.match(key_phrases)
+        if topic is not None:
+            return topic.response
         
         # If no specific topic is matched, provide a general response
         if sentiment == "negative":
@@ -0,0 +1,418 @@
+"""
+ASGI entry point for Urban Copilot.
+Serves the question and health endpoints asynchronously so one process can
+keep many questions in flight while waiting on Azure, and streams answers
+as Server-Sent Events. Run it with:
+
+    uvicorn app.asgi:app --host 0.0.0.0 --port 8000
+"""
+
+import os
+import json
+import time
+import asyncio
+import contextlib
+from json import JSONDecodeError
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+from app.agents.urban_agent import UrbanAgent
+from app.core.agent_router import AgentUnavailableError, create_agent_router
+from app.core.answer_cache import (
+    CachedAnswer,
+    answer_headers,
+    create_answer_cache,
+    etag_matches,
+    make_etag,
+    mark_degraded,
+    track_degraded,
+)
+from app.core.circuit_breaker import CLOSED, breaker_states
+from app.core.deadline import DEADLINE_HEADER, deadline, request_budget
+from app.core.health import HealthProber
+from app.core.streaming import MEDIA_TYPE, STREAM_HEADERS, chunk_text, format_event
+from app.core.metrics import (
+    CONTENT_TYPE,
+    REGISTRY,
+    REQUESTS,
+    REQUESTS_IN_PROGRESS,
+    REQUEST_SECONDS,
+    STAGE_SECONDS,
+)
+from app.core.tracing import TRACEPARENT_HEADER, TRACE_ID_HEADER, tracer
+
+# Frontend files, served here too so the web UI can use the streaming endpoint
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+
+# Status recorded for requests whose client went away before the answer (nginx's convention)
+CLIENT_CLOSED_REQUEST = 499
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away before its answer was ready"""
+
+
+async def _wait_for_disconnect(request: Request):
+    """Return once the client has closed the connection; the request body must already be read"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Request, work):
+    """
+    Await the answer to a request, cancelling it if the client disconnects first
+
+    Args:
+        request: The request being answered
+        work: Coroutine computing the answer; it runs in a copy of the caller's context
+
+    Returns:
+        The result of the coroutine
+
+    Raises:
+        ClientDisconnected: The client went away and the work was cancelled
+    """
+    answer = asyncio.ensure_future(work)
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait((answer, disconnect), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect.cancel()
+        if not answer.done():
+            answer.cancel()
+    if answer not in done:
+        raise ClientDisconnected()
+    return answer.result()
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording request counts, in-flight requests and latency per route"""
+
+    def __init__(self, app, routes):
+        """
+        Args:
+            app: The wrapped ASGI application
+            routes: Known paths; any other path is recorded as "unmatched"
+        """
+        self.app = app
+        self.routes = set(routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        REGISTRY.start()
+        labels = {"method": scope["method"], "route": scope["path"] if scope["path"] in self.routes else "unmatched"}
+        status = 500  # Reported if the application fails before responding
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        REQUESTS_IN_PROGRESS.labels(**labels).inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_PROGRESS.labels(**labels).dec()
+            REQUESTS.labels(status=status, **labels).inc()
+            REQUEST_SECONDS.labels(**labels).observe(time.perf_counter() - start)
+
+
+class TracingMiddleware:
+    """ASGI middleware running each request in a span and returning its trace id in X-Trace-Id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        span = tracer.start_span(
+            f"{scope['method']} {scope['path']}",
+            kind="server",
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+            traceparent=headers.get(TRACEPARENT_HEADER),
+        )
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (TRACE_ID_HEADER.lower().encode("latin-1"), span.trace_id.encode("latin-1"))]}
+            await send(message)
+
+        with span:
+            await self.app(scope, receive, send_with_trace_id)
+
+
+def create_asgi_app(agent=None, router=None):
+    """
+    Create the ASGI application.
+
+    Args:
+        agent: The default agent, answering questions no other agent claims; a new UrbanAgent by default
+        router: The router choosing an agent for each question; by default one built by
+            create_agent_router around the default agent
+
+    Returns:
+        A Starlette application exposing /api/ask, /api/ask/stream, the /api/health probes and the web frontend
+    """
+    urban_agent = agent or UrbanAgent()
+    agent_router = router or create_agent_router(urban_agent)
+    # The checks run on a background thread, off the event loop, and build the Azure client on their first run
+    health_prober = HealthProber({
+        "cognitive_services": lambda: urban_agent.cognitive_client.is_available()
+    })
+    # Whole answers to repeated questions, cleared when the topic table is reloaded
+    answer_cache = create_answer_cache(urban_agent.topics)
+    answer_max_age = int(os.environ.get('ANSWER_CACHE_MAX_AGE', 60))
+    max_batch_questions = int(os.environ.get('MAX_BATCH_QUESTIONS', 100))
+
+    def send_answer(request: Request, body: bytes, etag):
+        """Serve an answer with its caching headers, or 304 (GET) / 412 (POST) if If-None-Match matches"""
+        headers = answer_headers(etag, answer_max_age)
+        if etag is not None and etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304 if request.method == 'GET' else 412, headers=headers)
+        return Response(body, headers=headers, media_type='application/json')
+
+    async def read_question(request: Request):
+        """The question payload: query parameters on GET, the JSON body otherwise"""
+        if request.method == 'GET':
+            return request.query_params
+        try:
+            return await request.json()
+        except JSONDecodeError:
+            return None
+
+    def request_deadline(request: Request):
+        """Bound the work done for a request by its X-Request-Timeout header or REQUEST_TIMEOUT"""
+        return deadline(request_budget(request.headers.get(DEADLINE_HEADER)))
+
+    def cached_answer(body: bytes) -> CachedAnswer:
+        return CachedAnswer(body.decode('utf-8'), make_etag(body))
+
+    async def ask_urban_question(request: Request):
+        """
+        Endpoint to ask urban planning questions.
+        Expects a JSON payload with a 'question' field, or 'question' and
+        'context' query parameters on GET. Repeated questions are answered
+        from the answer cache without running the agent.
+        """
+        data = await read_question(request)
+
+        if not data or 'question' not in data:
+            return JSONResponse({'error': 'Question is required'}, status_code=400)
+
+        question = data['question']
+        context = data.get('context', '')
+        version = urban_agent.topics.version
+        answer = await answer_cache.aget(question, context, version) if answer_cache else None
+        if answer is not None:
+            return send_answer(request, answer.body.encode('utf-8'), answer.etag)
+
+        with request_deadline(request), track_degraded() as outcome:
+            try:
+                response = await cancel_on_disconnect(request, agent_router.arun(question))
+            except ClientDisconnected:
+                return Response(status_code=CLIENT_CLOSED_REQUEST)
+        with STAGE_SECONDS.labels(stage="serialization").time():
+            body = JSONResponse({'response': response}).body
+
+        # Fallback answers are served as they are, never stored
+        if outcome.degraded:
+            return send_answer(request, body, None)
+        answer = cached_answer(body)
+        if answer_cache:
+            await answer_cache.aset(question, context, version, answer)
+        return send_answer(request, body, answer.etag)
+
+    async def ask_urban_questions_batch(request: Request):
+        """
+        Endpoint to ask many urban planning questions at once.
+        Expects a JSON payload with a 'questions' list of strings and returns one
+        result per question, in order, holding either a 'response' or an 'error'.
+        """
+        try:
+            data = await request.json()
+        except JSONDecodeError:
+            data = None
+
+        if not isinstance(data, dict) or not isinstance(data.get('questions'), list) or not data['questions']:
+            return JSONResponse({'error': 'A non-empty list of questions is required'}, status_code=400)
+
+        questions = data['questions']
+        if len(questions) > max_batch_questions:
+            return JSONResponse({'error': f'At most {max_batch_questions} questions are accepted per batch'},
+                                status_code=400)
+
+        results = []
+        valid = []
+        for index, question in enumerate(questions):
+            if not isinstance(question, str) or not question.strip():
+                results.append({'index': index, 'error': 'Question must be a non-empty string'})
+            else:
+                results.append({'index': index})
+                valid.append(index)
+
+        with request_deadline(request):
+            try:
+                responses = await cancel_on_disconnect(
+                    request, agent_router.arun_batch([questions[index] for index in valid]))
+            except ClientDisconnected:
+                return Response(status_code=CLIENT_CLOSED_REQUEST)
+        for index, response in zip(valid, responses):
+            results[index]['response'] = response
+
+        with STAGE_SECONDS.labels(stage="serialization").time():
+            return JSONResponse({'results': results})
+
+    async def stream_answer(question):
+        """
+        Events of an answer from the agent chosen for the question. Agents that
+        cannot stream send their whole answer as chunks once it is ready.
+        """
+        registered = agent_router.classify(question)
+        astream = getattr(registered.agent, 'astream', None)
+        if astream is None:
+            response = await agent_router.arun(question, registered)
+            for chunk in chunk_text(response):
+                yield 'answer', {'text': chunk}
+            yield 'done', {'response': response}
+            return
+        try:
+            async with registered.slot():
+                async for event in astream(question):
+                    yield event
+        except AgentUnavailableError as e:
+            mark_degraded()
+            yield 'answer', {'text': e.response}
+            yield 'done', {'response': e.response}
+
+    async def ask_urban_question_stream(request: Request):
+        """
+        Streaming variant of /api/ask, as Server-Sent Events.
+        Takes the same question payload and emits 'language', 'key_phrases'
+        and 'sentiment' events as each analysis completes, then 'answer'
+        events with chunks of the response and a final 'done' event holding
+        the whole response. Streams run on the event loop, so an open stream
+        holds no worker thread; a client that disconnects cancels its work.
+        """
+        data = await read_question(request)
+
+        if not data or 'question' not in data:
+            return JSONResponse({'error': 'Question is required'}, status_code=400)
+
+        question = data['question']
+        context = data.get('context', '')
+        version = urban_agent.topics.version
+        answer = await answer_cache.aget(question, context, version) if answer_cache else None
+        budget = request_budget(request.headers.get(DEADLINE_HEADER))
+
+        async def events():
+            if answer is not None:
+                response = json.loads(answer.body)['response']
+                for chunk in chunk_text(response):
+                    yield format_event('answer', {'text': chunk})
+                yield format_event('done', {'response': response})
+                return
+
+            with deadline(budget), track_degraded() as outcome:
+                async for event, payload in stream_answer(question):
+                    if event == 'done' and answer_cache and not outcome.degraded:
+                        await answer_cache.aset(question, context, version,
+                                                cached_answer(JSONResponse({'response': payload['response']}).body))
+                    yield format_event(event, payload)
+
+        return StreamingResponse(events(), media_type=MEDIA_TYPE, headers=STREAM_HEADERS)
+
+    async def health_check(request: Request):
+        """
+        Health check endpoint for monitoring.
+        Returns status of the application and its dependencies from the last
+        background check.
+        """
+        checks = health_prober.snapshot()
+        health_status = {
+            "status": "healthy",
+            "version": "1.0.0",
+            "services": {
+                "api": "up",
+                **{name: check["status"] for name, check in checks.items()}
+            },
+            "checks": checks,
+            "circuit_breakers": breaker_states(),
+            "agents": agent_router.stats()
+        }
+
+        breakers_closed = all(breaker["state"] == CLOSED for breaker in health_status["circuit_breakers"].values())
+        if not breakers_closed or not all(status == "up" for status in health_status["services"].values()):
+            health_status["status"] = "degraded"
+
+        return JSONResponse(health_status)
+
+    async def liveness_check(request: Request):
+        """Liveness probe; checks no dependency."""
+        return JSONResponse({"status": "alive"})
+
+    async def readiness_check(request: Request):
+        """Readiness probe; 503 until the first background dependency check has completed."""
+        health_prober.start()
+        if not health_prober.ready:
+            return JSONResponse({"status": "starting"}, status_code=503)
+        return JSONResponse({"status": "ready"})
+
+    async def index(request: Request):
+        """The web frontend"""
+        return FileResponse(os.path.join(STATIC_DIR, 'index.html'))
+
+    async def metrics(request: Request):
+        """Every metric, aggregated across worker processes when METRICS_MULTIPROC_DIR is set"""
+        return Response(REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        # Start probing before the first request so readiness flips early
+        health_prober.start()
+        # Build the clients and open a connection to Azure before taking traffic
+        if os.environ.get('ASGI_WARM_UP', 'True') == 'True':
+            await urban_agent.awarm_up()
+        yield
+        # Release pooled Azure connections on shutdown
+        await urban_agent.async_cognitive_client.aclose()
+
+    routes = [
+        Route('/', index, methods=['GET']),
+        Route('/api/ask', ask_urban_question, methods=['GET', 'POST']),
+        Route('/api/ask/batch', ask_urban_questions_batch, methods=['POST']),
+        Route('/api/ask/stream', ask_urban_question_stream, methods=['GET', 'POST']),
+        Route('/api/health', health_check, methods=['GET']),
+        Route('/api/health/live', liveness_check, methods=['GET']),
+        Route('/api/health/ready', readiness_check, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET']),
+        Mount('/static', StaticFiles(directory=STATIC_DIR), name='static'),
+    ]
+    return Starlette(
+        routes=routes,
+        middleware=[
+            Middleware(TracingMiddleware),
+            Middleware(RequestMetricsMiddleware, routes=[route.path for route in routes]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+# Create the application instance
+app = create_asgi_app()
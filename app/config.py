@@ -4,6 +4,8 @@ class Config:
     """
     Config class to manage Flask and Azure configuration settings.
     This class uses environment variables to configure the application.
+    Each component reads its own settings from the environment when it is
+    built; they are listed in the README rather than mirrored here.
     """
     # General Flask Configuration
     SECRET_KEY = os.getenv("SECRET_KEY", "default-secret-key")  # Secret key used for sessions and cryptography
@@ -14,7 +16,7 @@ class Config:
     # Azure API Credentials
     AZURE_API_KEY = os.getenv("AZURE_API_KEY", "")  # Azure API key to interact with Azure services
     AZURE_ENDPOINT = os.getenv("AZURE_ENDPOINT", "")  # Azure endpoint URL for accessing Azure services
-    
+
     # Database Configuration
     DB_USER = os.getenv("DB_USER", "urban_copilot_user")
     DB_PASSWORD = os.getenv("DB_PASSWORD")
@@ -22,11 +24,8 @@ class Config:
     DB_PORT = os.getenv("DB_PORT", "5432")
     DB_NAME = os.getenv("DB_NAME", "urban_copilot")
     
-    # Construct Database URL
-    if not DB_PASSWORD:
-        raise ValueError("Database password must be set in environment variables")
-        
-    DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    # Construct Database URL; empty without a password, since nothing connects to the database at startup
+    DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}" if DB_PASSWORD else ""
 
     # Optional: Other Configurations
     DEBUG = os.getenv("DEBUG", "True") == "True"  # General debug mode for the application; can be controlled by environment
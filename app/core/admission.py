@@ -0,0 +1,389 @@
+"""
+Admission control for Urban Copilot's calls to Azure
+Text Analytics enforces a transactions-per-second quota and bills per text
+record. A token bucket sized to the quota paces every call made by the
+synchronous and asynchronous clients, so a burst of traffic waits briefly
+in the app instead of coming back from Azure as 429s.
+
+Waiting calls are served by priority, interactive questions before batch
+jobs. A call that could not be served within its priority's longest wait,
+or that would overrun the daily text record budget, is shed at once with
+AdmissionRejectedError, and the agent answers it with the local analyzer.
+
+The quota and the budget belong to the Azure resource, not to a process.
+With a shared storage (ADMISSION_STORAGE_URI, sqlite:// or redis://, as for
+the rate limiter) every worker takes its tokens from one moving window and
+counts its records in one daily counter. Without one, each process paces
+itself to its share of the limits: AZURE_QUOTA_TPS and
+AZURE_DAILY_RECORD_BUDGET divided by WEB_CONCURRENCY.
+"""
+
+import os
+import math
+import logging
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import contextlib
+import contextvars
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from limits.storage import MovingWindowSupport, Storage, storage_from_string
+
+from app.core import deadline
+from app.core import rate_limit_storage  # noqa: F401  (registers the sqlite:// storage scheme)
+from app.core.metrics import (
+    ADMISSION_DECISIONS,
+    ADMISSION_WAIT_SECONDS,
+    AZURE_QUOTA_TOKENS,
+    AZURE_RECORD_BUDGET_REMAINING,
+    AZURE_TEXT_RECORDS,
+)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# Lower ranks are served first
+PRIORITY_RANKS = {INTERACTIVE: 0, BATCH: 1}
+
+# Characters billed as one text record
+CHARACTERS_PER_RECORD = 1000
+
+# Keys of the shared storage
+QUOTA_KEY = "urban-copilot/admission/quota"
+RECORDS_KEY = "urban-copilot/admission/records"
+
+logger = logging.getLogger(__name__)
+
+_current_priority: "contextvars.ContextVar[str]" = contextvars.ContextVar("admission_priority", default=INTERACTIVE)
+
+
+class AdmissionRejectedError(Exception):
+    """Raised instead of calling Azure when a call is shed"""
+
+    def __init__(self, reason: str, priority: str):
+        super().__init__(f"Azure call shed ({priority}): {reason}")
+        self.reason = reason
+        self.priority = priority
+
+
+@contextlib.contextmanager
+def priority(name: str):
+    """Run the calls made inside the block, including those on copied contexts, at the given priority"""
+    if name not in PRIORITY_RANKS:
+        raise ValueError(f"Unknown admission priority: {name}")
+    token = _current_priority.set(name)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> str:
+    """The priority of the running code; interactive unless set by priority()"""
+    return _current_priority.get()
+
+
+def text_records(texts: Iterable[str]) -> int:
+    """Number of billable text records: one per started CHARACTERS_PER_RECORD characters of each text"""
+    return sum(max(1, math.ceil(len(text) / CHARACTERS_PER_RECORD)) for text in texts)
+
+
+class _Waiter:
+    """A call queued for tokens; ordered by priority, then arrival"""
+
+    __slots__ = ("rank", "sequence", "cost", "granted", "event")
+
+    def __init__(self, rank: int, sequence: int, cost: float):
+        self.rank = rank
+        self.sequence = sequence
+        self.cost = cost
+        self.granted = False
+        self.event = threading.Event()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.rank, self.sequence) < (other.rank, other.sequence)
+
+
+class AdmissionController:
+    """Token bucket with a priority queue and a daily text record budget"""
+
+    def __init__(self, rate: float = 0.0, burst: Optional[float] = None,
+                 max_wait: Optional[Dict[str, float]] = None, record_budget: int = 0,
+                 storage: Optional[Storage] = None):
+        """
+        Args:
+            rate: Transactions per second allowed by the Azure tier; 0 disables pacing
+            burst: Transactions that may be sent at once after a quiet period; defaults to one second's worth
+            max_wait: Longest time in seconds a call may wait for tokens, per priority
+            record_budget: Text records that may be sent per UTC day; 0 for no budget
+            storage: 'limits' storage with moving windows shared by every process calling Azure;
+                None keeps the bucket and the budget in this process
+        """
+        if storage is not None and not isinstance(storage, MovingWindowSupport):
+            raise ValueError(f"Admission storage {storage!r} does not support moving windows")
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.max_wait = {INTERACTIVE: 0.5, BATCH: 10.0}
+        self.max_wait.update(max_wait or {})
+        self.record_budget = record_budget
+        self.storage = storage
+        # The shared bucket is a moving window of whole seconds holding 'burst' transactions or more
+        self._window = max(1, math.ceil(self.capacity / rate)) if rate > 0 else 1
+        self._window_limit = max(1, int(rate * self._window))
+
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._waiters: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._budget_day = None
+        self.records_used = 0
+
+        # Counters for monitoring
+        self.admitted = 0
+        self.shed = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether calls are paced or budgeted at all"""
+        return self.rate > 0 or self.record_budget > 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self, cost: float) -> bool:
+        """Take a call's tokens from the shared window, or else the local bucket; False if there are not enough"""
+        if self.storage is not None:
+            try:
+                # A call costing more than the window holds is let through once it is empty
+                return self.storage.acquire_entry(QUOTA_KEY, self._window_limit, self._window,
+                                                  amount=min(math.ceil(cost), self._window_limit))
+            except Exception as e:
+                logger.warning(f"Admission storage unavailable, pacing this process alone: {e}")
+        if self._tokens >= min(cost, self.capacity):
+            # A call costing more than the bucket holds is let through once it is full, leaving a debt
+            self._tokens -= cost
+            return True
+        return False
+
+    def _available(self) -> float:
+        """Tokens that could be taken now"""
+        if self.storage is not None:
+            try:
+                _, count = self.storage.get_moving_window(QUOTA_KEY, self._window_limit, self._window)
+                return float(self._window_limit - count)
+            except Exception:
+                pass
+        return self._tokens
+
+    def _dispatch(self):
+        """Hand tokens to queued calls in priority order while the bucket has enough"""
+        while self._waiters and self._take(self._waiters[0].cost):
+            waiter = heapq.heappop(self._waiters)
+            waiter.granted = True
+            waiter.event.set()
+
+    def _records_key(self, today) -> str:
+        return f"{RECORDS_KEY}/{today.isoformat()}"
+
+    def _check_budget(self, records: int, priority: str):
+        if not self.record_budget:
+            return
+        today = datetime.now(timezone.utc).date()
+        if today != self._budget_day:
+            self._budget_day = today
+            self.records_used = 0
+        if self.storage is not None:
+            try:
+                # Checked before and counted after the call is admitted; concurrent workers may overrun by a call
+                self.records_used = self.storage.get(self._records_key(today))
+            except Exception as e:
+                logger.warning(f"Admission storage unavailable, budgeting this process alone: {e}")
+        if self.records_used + records > self.record_budget:
+            self._reject("budget", priority)
+
+    def _count_records(self, records: int):
+        """Add the records of an admitted call to today's use"""
+        if self.storage is not None and self.record_budget and records:
+            try:
+                # The counter outlives the UTC day it counts, so it is never reset under a late worker
+                self.records_used = self.storage.incr(self._records_key(self._budget_day), 2 * 86400, amount=records)
+                return
+            except Exception as e:
+                logger.warning(f"Admission storage unavailable, budgeting this process alone: {e}")
+        self.records_used += records
+
+    def _reject(self, reason: str, priority: str):
+        self.shed += 1
+        ADMISSION_DECISIONS.labels(priority=priority, decision=f"shed_{reason}").inc()
+        raise AdmissionRejectedError(reason, priority)
+
+    def _admit(self, records: int, priority: str, waited: float):
+        self.admitted += 1
+        self._count_records(records)
+        ADMISSION_DECISIONS.labels(priority=priority, decision="admitted").inc()
+        ADMISSION_WAIT_SECONDS.labels(priority=priority).observe(waited)
+        AZURE_TEXT_RECORDS.labels(priority=priority).inc(records)
+        if self.rate > 0:
+            AZURE_QUOTA_TOKENS.set(max(0.0, self._available()))
+        if self.record_budget:
+            AZURE_RECORD_BUDGET_REMAINING.set(max(0, self.record_budget - self.records_used))
+
+    def _begin(self, cost: float, records: int, priority: str) -> Optional[_Waiter]:
+        """Admit the call at once or queue it; returns the queued waiter, or None if admitted"""
+        with self._lock:
+            self._check_budget(records, priority)
+            if self.rate <= 0:
+                self._admit(records, priority, 0.0)
+                return None
+            self._refill(time.monotonic())
+            if not self._waiters and self._take(cost):
+                self._admit(records, priority, 0.0)
+                return None
+            waiter = _Waiter(PRIORITY_RANKS[priority], next(self._sequence), cost)
+            heapq.heappush(self._waiters, waiter)
+            return waiter
+
+    def _abandon(self, waiter: _Waiter):
+        """
+        Take a call that stopped waiting, e.g. cancelled with its request, out of
+        the queue, give back any tokens it was handed, and serve the calls behind it
+        """
+        with self._lock:
+            if waiter.granted:
+                # Entries of a shared window cannot be taken back; they expire with it
+                if self.storage is None:
+                    self._tokens = min(self.capacity, self._tokens + waiter.cost)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+            self._dispatch()
+
+    def _poll(self, waiter: _Waiter, records: int, priority: str, started: float) -> float:
+        """
+        Check on a queued call
+
+        Returns:
+            0 once the call is admitted, otherwise the seconds it should wait before checking again
+
+        Raises:
+            AdmissionRejectedError: If the call cannot get its tokens within its priority's longest wait,
+                or before the deadline of the request it serves
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._dispatch()
+            if waiter.granted:
+                self._admit(records, priority, now - started)
+                return 0.0
+            # Tokens needed before this call is served, assuming no more urgent call arrives
+            ahead = sum(other.cost for other in self._waiters if other < waiter)
+            wait = (ahead + min(waiter.cost, self.capacity) - self._available()) / self.rate
+            # A call never waits past the deadline of the request it serves
+            max_wait = self.max_wait[priority]
+            left = deadline.remaining()
+            if left is not None:
+                max_wait = min(max_wait, now - started + left)
+            if now + wait - started > max_wait:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                self._dispatch()  # calls behind it may fit now
+                self._reject("deadline", priority)
+            # Other processes do not wake this one when a shared window frees up, so it polls no faster than tokens come
+            return max(wait, 0.001 if self.storage is None else 1 / self.rate)
+
+    def acquire(self, cost: float = 1, records: int = 0, priority: Optional[str] = None):
+        """
+        Wait until a call may be sent to Azure
+
+        Args:
+            cost: Transactions the call uses
+            records: Billable text records the call sends
+            priority: INTERACTIVE or BATCH; defaults to the priority of the running code
+
+        Raises:
+            AdmissionRejectedError: If the call is shed
+        """
+        priority = priority or current_priority()
+        waiter = self._begin(cost, records, priority)
+        if waiter is None:
+            return
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._poll(waiter, records, priority, started)
+                if not wait:
+                    return
+                waiter.event.wait(wait)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    async def aacquire(self, cost: float = 1, records: int = 0, priority: Optional[str] = None):
+        """Asynchronous counterpart of 'acquire' that sleeps on the event loop instead of blocking"""
+        priority = priority or current_priority()
+        waiter = self._begin(cost, records, priority)
+        if waiter is None:
+            return
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._poll(waiter, records, priority, started)
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+        except BaseException:
+            # Cancelled (e.g. the client disconnected) or shed: nobody waits on this place any more
+            self._abandon(waiter)
+            raise
+
+    def stats(self) -> Dict[str, object]:
+        """Bucket level, queue length and budget use"""
+        with self._lock:
+            if self.rate > 0:
+                self._refill(time.monotonic())
+            return {
+                "rate": self.rate,
+                "tokens": round(self._available(), 3),
+                "shared": self.storage is not None,
+                "queued": len(self._waiters),
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "record_budget": self.record_budget,
+                "records_used": self.records_used,
+            }
+
+
+def create_admission_controller() -> AdmissionController:
+    """
+    Build the controller selected by the AZURE_QUOTA_*, AZURE_DAILY_RECORD_BUDGET
+    and ADMISSION_* settings. Without a shared storage the quota and the budget
+    are split evenly between the WEB_CONCURRENCY worker processes.
+    """
+    uri = os.environ.get("ADMISSION_STORAGE_URI", os.environ.get("RATELIMIT_STORAGE_URI", "memory://"))
+    storage = None if uri.startswith("memory://") else storage_from_string(uri)
+    processes = 1 if storage is not None else max(1, int(os.environ.get("WEB_CONCURRENCY", 1)))
+    # Every worker reports the shared quota and budget, so they must not be added up across workers
+    for gauge in (AZURE_QUOTA_TOKENS, AZURE_RECORD_BUDGET_REMAINING):
+        gauge.multiprocess_mode = "sum" if storage is None else "latest"
+    burst = os.environ.get("AZURE_QUOTA_BURST")
+    return AdmissionController(
+        rate=float(os.environ.get("AZURE_QUOTA_TPS", 0)) / processes,
+        burst=max(1.0, float(burst) / processes) if burst else None,
+        max_wait={
+            INTERACTIVE: float(os.environ.get("ADMISSION_MAX_WAIT_INTERACTIVE", 0.5)),
+            BATCH: float(os.environ.get("ADMISSION_MAX_WAIT_BATCH", 10)),
+        },
+        record_budget=math.ceil(int(os.environ.get("AZURE_DAILY_RECORD_BUDGET", 0)) / processes),
+        storage=storage,
+    )
+
+
+# One controller per process, shared by the synchronous and asynchronous clients; see ADMISSION_STORAGE_URI for sharing it across processes
+admission_controller = create_admission_controller()
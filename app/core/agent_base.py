@@ -1,9 +1,18 @@
 # app/core/agent_base.py
+import asyncio
+from typing import List
+
+
 class AgentBase:
     """
     A base class for agents. This class defines a contract that all agents must follow.
-    The 'run' method must be implemented in any subclass.
+    The 'run' method must be implemented in any subclass. The asynchronous and batch
+    methods have default adapters built on 'run', which subclasses may override with
+    native implementations.
     """
+    name = "base"  # Name of the agent in routing, limits and metrics
+    keywords = ()  # Words in a question that route it to this agent (see app.core.agent_router)
+
     def run(self, question: str) -> str:
         """
         Abstract method to process a question and return a response.
@@ -16,3 +25,60 @@ class AgentBase:
         - str: The response to the question.
         """
         raise NotImplementedError("This method should be implemented in subclasses")
+
+    def implements(self, method: str) -> bool:
+        """
+        Check whether the agent has its own version of a method rather than the
+        default adapter of AgentBase. Routers use this to run agents without
+        native asynchronous methods on a pool of their own.
+
+        Parameters:
+        - method (str): The method name, e.g. 'arun'.
+
+        Returns:
+        - bool: True if a subclass overrides the method.
+        """
+        return getattr(type(self), method) is not getattr(AgentBase, method)
+
+    async def arun(self, question: str) -> str:
+        """
+        Asynchronous counterpart of 'run'. By default 'run' is called on the event
+        loop's default thread pool; the agent router runs such agents on the
+        agent's own pool instead, so a stuck agent cannot fill the shared one.
+
+        Parameters:
+        - question (str): The question to be answered by the agent.
+
+        Returns:
+        - str: The response to the question.
+        """
+        return await asyncio.to_thread(self.run, question)
+
+    def run_batch(self, questions: List[str]) -> List[str]:
+        """
+        Answer many questions. By default each is answered by 'run' in turn;
+        override it to share work, such as one round trip to a service, between them.
+
+        Parameters:
+        - questions (List[str]): The questions to be answered by the agent.
+
+        Returns:
+        - List[str]: One response per question, in the same order.
+        """
+        return [self.run(question) for question in questions]
+
+    async def arun_batch(self, questions: List[str]) -> List[str]:
+        """
+        Asynchronous counterpart of 'run_batch'. By default the questions are
+        answered concurrently by the agent's own 'arun', or else by 'run_batch'
+        on one worker thread.
+
+        Parameters:
+        - questions (List[str]): The questions to be answered by the agent.
+
+        Returns:
+        - List[str]: One response per question, in the same order.
+        """
+        if not self.implements('arun'):
+            return await asyncio.to_thread(self.run_batch, questions)
+        return list(await asyncio.gather(*(self.arun(question) for question in questions)))
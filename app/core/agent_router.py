@@ -0,0 +1,413 @@
+"""
+Agent routing for Urban Copilot
+Sends each question to the registered agent whose keywords it mentions as
+whole words, found in one pass over the question with the same Aho-Corasick
+matcher as the topic table, or to the default agent when none matches.
+
+Each agent runs in its own bounded pool with its own timeout. A slow agent
+can only fill its own pool: further questions for it are turned away at
+once, and those that overrun its timeout are answered with an apology,
+while every other agent keeps answering. Latency, throughput and in-flight
+questions are exported per agent.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import importlib
+import threading
+import contextlib
+import contextvars
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from app.core.agent_base import AgentBase
+from app.core.answer_cache import mark_degraded
+from app.core.metrics import AGENT_IN_FLIGHT, AGENT_REQUESTS, AGENT_SECONDS
+from app.core.topics import Topic, TopicIndex
+
+logger = logging.getLogger(__name__)
+
+# Answers given instead of the agent's when it is saturated or too slow
+BUSY_RESPONSE = "Sorry, too many questions like yours are being answered right now. Please try again shortly."
+TIMEOUT_RESPONSE = "Sorry, answering your question took too long. Please try again."
+
+
+class AgentUnavailableError(Exception):
+    """Raised when an agent cannot answer: its pool is full ("busy") or it overran its timeout ("timeout")"""
+
+    def __init__(self, agent: str, reason: str):
+        super().__init__(f"Agent {agent} unavailable: {reason}")
+        self.agent = agent
+        self.reason = reason
+
+    @property
+    def response(self) -> str:
+        """The apology answered in place of the agent"""
+        return BUSY_RESPONSE if self.reason == "busy" else TIMEOUT_RESPONSE
+
+
+# Synchronous counterpart of each asynchronous agent method
+SYNC_METHODS = {"arun": "run", "arun_batch": "run_batch"}
+
+
+def _setting(agent: str, key: str, default: float) -> float:
+    """Read AGENT_<NAME>_<KEY>, falling back to AGENT_<KEY> and then the default"""
+    value = os.environ.get(f"AGENT_{agent.upper()}_{key}") or os.environ.get(f"AGENT_{key}")
+    return float(value) if value else default
+
+
+class RegisteredAgent:
+    """An agent with its own worker pool, bound on questions in flight, and timeout"""
+
+    def __init__(self, name: str, agent: AgentBase, keywords: Iterable[str] = (),
+                 max_concurrency: Optional[int] = None, max_queue: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        """
+        Args:
+            name: Name of the agent in limits, logs and metrics
+            agent: The agent answering the questions
+            keywords: Words that route a question to this agent
+            max_concurrency: Questions answered at once; defaults to AGENT_<NAME>_MAX_CONCURRENCY, then AGENT_MAX_CONCURRENCY
+            max_queue: Questions waiting for the pool beyond that before more are turned away; AGENT_[<NAME>_]MAX_QUEUE
+            timeout: Seconds a question may take, waiting included; AGENT_[<NAME>_]TIMEOUT
+        """
+        self.name = name
+        self.agent = agent
+        self.keywords = [keyword.lower() for keyword in keywords]
+        self.max_concurrency = int(max_concurrency or _setting(name, "MAX_CONCURRENCY", 32))
+        self.max_queue = int(max_queue if max_queue is not None else _setting(name, "MAX_QUEUE", 64))
+        self.timeout = float(timeout or _setting(name, "TIMEOUT", 30))
+
+        # Worker threads are only started on first use
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix=f"agent-{name}")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        # asyncio semaphores bind to an event loop, so there is one per loop
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+
+    def _admit(self):
+        """Count a question in, or turn it away if the pool and its queue are full"""
+        with self._lock:
+            if self.in_flight >= self.max_concurrency + self.max_queue:
+                AGENT_REQUESTS.labels(agent=self.name, outcome="busy").inc()
+                raise AgentUnavailableError(self.name, "busy")
+            self.in_flight += 1
+        AGENT_IN_FLIGHT.labels(agent=self.name).inc()
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        AGENT_IN_FLIGHT.labels(agent=self.name).dec()
+
+    def _observe(self, outcome: str, start: float):
+        AGENT_REQUESTS.labels(agent=self.name, outcome=outcome).inc()
+        AGENT_SECONDS.labels(agent=self.name).observe(time.perf_counter() - start)
+
+    def submit(self, method: str, argument: Any) -> Future:
+        """
+        Start one of the agent's methods ("run" or "run_batch") on its pool
+
+        Raises:
+            AgentUnavailableError: The pool and its queue are full
+        """
+        self._admit()
+        # The slot is freed when the agent is done, even if the caller stopped waiting,
+        # so an agent stuck on its dependencies fills its own pool and nothing else
+        future = self._executor.submit(contextvars.copy_context().run, getattr(self.agent, method), argument)
+        future.add_done_callback(lambda _: self._release())
+        future.started = time.perf_counter()
+        return future
+
+    def result(self, future: Future) -> Any:
+        """
+        Wait for a call started by 'submit', up to the timeout counted from its start
+
+        Raises:
+            AgentUnavailableError: The call took longer than the timeout
+        """
+        try:
+            response = future.result(timeout=max(0.0, future.started + self.timeout - time.perf_counter()))
+        except FutureTimeoutError:
+            future.cancel()
+            self._observe("timeout", future.started)
+            raise AgentUnavailableError(self.name, "timeout")
+        except Exception:
+            self._observe("error", future.started)
+            raise
+        self._observe("ok", future.started)
+        return response
+
+    def run(self, question: str) -> str:
+        """
+        Answer a question on the agent's pool
+
+        Raises:
+            AgentUnavailableError: The pool is full, or the answer took longer than the timeout
+        """
+        return self.result(self.submit("run", question))
+
+    def run_batch(self, questions: List[str]) -> List[str]:
+        """
+        Answer a batch of questions on the agent's pool, as one question in its limits
+
+        Raises:
+            AgentUnavailableError: The pool is full, or the answers took longer than the timeout
+        """
+        return self.result(self.submit("run_batch", questions))
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one of the agent's places for the duration of the block, waiting
+        for one if all are taken but the queue is not full
+
+        Raises:
+            AgentUnavailableError: The pool and its queue are full
+        """
+        self._admit()
+        try:
+            loop = asyncio.get_running_loop()
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+            async with semaphore:
+                yield
+        finally:
+            self._release()
+
+    async def _acall(self, method: str, argument: Any) -> Any:
+        """
+        Await one of the agent's coroutine methods ("arun" or "arun_batch") in a
+        slot, cancelling it if it overruns the timeout. Agents that only have the
+        default adapter run the synchronous method on the agent's own pool
+        instead, where a stuck call keeps its thread, and its place in the
+        agent's limits, until it returns, without touching any other pool.
+        """
+        if not self.agent.implements(method):
+            future = self.submit(SYNC_METHODS[method], argument)
+            start = future.started
+            call = asyncio.wrap_future(future)  # cancelling it drops the call if it has not started yet
+        else:
+            async def answer():
+                async with self.slot():
+                    return await getattr(self.agent, method)(argument)
+            start = time.perf_counter()
+            call = answer()
+
+        try:
+            response = await asyncio.wait_for(call, self.timeout)
+        except asyncio.TimeoutError:
+            self._observe("timeout", start)
+            raise AgentUnavailableError(self.name, "timeout")
+        except asyncio.CancelledError:
+            # The client went away; the agent's work was cancelled with it
+            self._observe("cancelled", start)
+            raise
+        except AgentUnavailableError:
+            raise
+        except Exception:
+            self._observe("error", start)
+            raise
+        self._observe("ok", start)
+        return response
+
+    async def arun(self, question: str) -> str:
+        """
+        Answer a question without blocking the event loop, cancelling the agent if it overruns the timeout
+
+        Raises:
+            AgentUnavailableError: The pool is full, or the answer took longer than the timeout
+        """
+        return await self._acall("arun", question)
+
+    async def arun_batch(self, questions: List[str]) -> List[str]:
+        """
+        Answer a batch of questions without blocking the event loop, as one question in the agent's limits
+
+        Raises:
+            AgentUnavailableError: The pool is full, or the answers took longer than the timeout
+        """
+        return await self._acall("arun_batch", questions)
+
+    def stats(self) -> Dict[str, Any]:
+        """Limits and current load, for monitoring"""
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "timeout": self.timeout,
+        }
+
+
+class AgentRouter:
+    """Registry of agents and the classifier choosing one for each question"""
+
+    def __init__(self):
+        self._agents: Dict[str, RegisteredAgent] = {}
+        self._default: Optional[str] = None
+        self._index = TopicIndex([], whole_words=True)
+
+    def register(self, agent: AgentBase, name: Optional[str] = None, keywords: Optional[Iterable[str]] = None,
+                 default: bool = False, **limits) -> RegisteredAgent:
+        """
+        Add an agent to the router
+
+        Args:
+            agent: The agent
+            name: Its name; defaults to the agent's 'name' attribute
+            keywords: Words that route a question to it; defaults to the agent's 'keywords'.
+                Agents registered first win when a question mentions keywords of several.
+            default: Whether it answers the questions no other agent's keywords match
+            limits: max_concurrency, max_queue and timeout of its pool (see RegisteredAgent)
+
+        Returns:
+            The registered agent
+        """
+        name = name or agent.name
+        if name in self._agents:
+            raise ValueError(f"An agent named {name} is already registered")
+        registered = RegisteredAgent(name, agent, keywords if keywords is not None else agent.keywords, **limits)
+        self._agents[name] = registered
+        if default or self._default is None:
+            self._default = name
+        # Recompile the classifier; registration happens at startup only
+        self._index = TopicIndex(
+            [Topic(name=entry.name, response="", patterns=entry.keywords)
+             for entry in self._agents.values() if entry.keywords],
+            whole_words=True,
+        )
+        logger.info(f"Registered agent {name} (keywords: {', '.join(registered.keywords) or 'none'})")
+        return registered
+
+    @property
+    def agents(self) -> List[RegisteredAgent]:
+        """The registered agents, in registration order"""
+        return list(self._agents.values())
+
+    def get(self, name: str) -> RegisteredAgent:
+        """The registered agent with the given name"""
+        return self._agents[name]
+
+    def classify(self, question: str) -> RegisteredAgent:
+        """
+        Choose the agent for a question
+
+        Returns:
+            The first registered agent whose keywords occur in the question as whole words
+            ("bus" in "next bus?" but not in "business hours"), or the default agent
+        """
+        if self._default is None:
+            raise RuntimeError("No agent is registered")
+        topic = self._index.match_phrase(question) if isinstance(question, str) else None
+        return self._agents[topic.name if topic is not None else self._default]
+
+    def run(self, question: str) -> str:
+        """Answer a question with the agent chosen for it, or apologize if that agent is unavailable"""
+        registered = self.classify(question)
+        try:
+            return registered.run(question)
+        except AgentUnavailableError as e:
+            logger.warning(str(e))
+            mark_degraded()
+            return e.response
+
+    async def arun(self, question: str, registered: Optional[RegisteredAgent] = None) -> str:
+        """
+        Asynchronous counterpart of run
+
+        Args:
+            question: The question
+            registered: The agent 'classify' chose for it, if the caller classified it already
+        """
+        registered = registered or self.classify(question)
+        try:
+            return await registered.arun(question)
+        except AgentUnavailableError as e:
+            logger.warning(str(e))
+            mark_degraded()
+            return e.response
+
+    def _group(self, questions: List[str]) -> Dict[str, List[int]]:
+        """Positions of the questions routed to each agent"""
+        groups: Dict[str, List[int]] = {}
+        for index, question in enumerate(questions):
+            groups.setdefault(self.classify(question).name, []).append(index)
+        return groups
+
+    def run_batch(self, questions: List[str]) -> List[str]:
+        """
+        Answer many questions, each agent answering its share as one batch on its own pool.
+        The shares are answered concurrently; an unavailable agent's share gets its apology.
+
+        Returns:
+            One response per question, in the same order
+        """
+        groups = self._group(questions)
+        started = {}
+        responses: List[Optional[str]] = [None] * len(questions)
+        for name, indexes in groups.items():
+            try:
+                started[name] = self._agents[name].submit("run_batch", [questions[index] for index in indexes])
+            except AgentUnavailableError as e:
+                self._apologize(e, responses, indexes)
+        for name, future in started.items():
+            try:
+                answers = self._agents[name].result(future)
+            except AgentUnavailableError as e:
+                self._apologize(e, responses, groups[name])
+                continue
+            for index, answer in zip(groups[name], answers):
+                responses[index] = answer
+        return responses
+
+    async def arun_batch(self, questions: List[str]) -> List[str]:
+        """Asynchronous counterpart of run_batch"""
+        groups = self._group(questions)
+        responses: List[Optional[str]] = [None] * len(questions)
+
+        async def answer(name: str, indexes: List[int]):
+            try:
+                answers = await self._agents[name].arun_batch([questions[index] for index in indexes])
+            except AgentUnavailableError as e:
+                self._apologize(e, responses, indexes)
+                return
+            for index, response in zip(indexes, answers):
+                responses[index] = response
+
+        await asyncio.gather(*(answer(name, indexes) for name, indexes in groups.items()))
+        return responses
+
+    @staticmethod
+    def _apologize(error: AgentUnavailableError, responses: List[Optional[str]], indexes: List[int]):
+        logger.warning(str(error))
+        mark_degraded()
+        for index in indexes:
+            responses[index] = error.response
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Limits and current load of each agent"""
+        return {name: registered.stats() for name, registered in self._agents.items()}
+
+
+def create_agent_router(default_agent: AgentBase) -> AgentRouter:
+    """
+    Build the router with the default agent and the agents listed in AGENT_PLUGINS
+
+    Args:
+        default_agent: Agent answering the questions no other agent's keywords match
+
+    Returns:
+        An AgentRouter. AGENT_PLUGINS is a comma-separated list of "module:Class"
+        agent classes, constructed without arguments and registered in order.
+    """
+    router = AgentRouter()
+    for path in filter(None, (item.strip() for item in os.environ.get("AGENT_PLUGINS", "").split(","))):
+        module_name, _, class_name = path.partition(":")
+        agent_class = getattr(importlib.import_module(module_name), class_name)
+        router.register(agent_class())
+    router.register(default_agent, default=True)
+    return router
@@ -0,0 +1,248 @@
+"""
+Answer cache for Urban Copilot
+Stores the serialized /api/ask response keyed on the normalized question,
+the context and the version of the topic table, so a repeated question is
+answered without running the agent at all. Every answer carries a strong
+ETag derived from its body, so clients and CDNs can revalidate with
+If-None-Match instead of downloading it again.
+
+Answers built while Azure was failing, shed or bypassed are marked degraded
+and never cached, so a fallback answer does not outlive the outage. Entries
+of an older topic table are unreachable once the table changes, and the
+cache is cleared when the table is reloaded.
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import contextlib
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+
+from app.core.cache import DiskBackend, MemoryBackend, RedisBackend, normalize_text
+from app.core.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Label of the answer cache in urban_analysis_cache_requests_total
+OPERATION = "answer"
+
+
+class AnswerOutcome:
+    """What happened while an answer was built; collected by track_degraded"""
+
+    def __init__(self):
+        self.degraded = False
+
+
+_outcome: ContextVar[Optional[AnswerOutcome]] = ContextVar("answer_outcome", default=None)
+
+
+@contextlib.contextmanager
+def track_degraded() -> Iterator[AnswerOutcome]:
+    """Collect whether the answer built inside the block fell back to degraded analysis"""
+    outcome = AnswerOutcome()
+    token = _outcome.set(outcome)
+    try:
+        yield outcome
+    finally:
+        try:
+            _outcome.reset(token)
+        except ValueError:
+            pass  # Closed from another context, e.g. an abandoned streaming generator
+
+
+def mark_degraded():
+    """
+    Record that the answer being built does not reflect a full analysis.
+    Worker threads and tasks started with a copy of the caller's context
+    share the caller's outcome, so they may call this too.
+    """
+    outcome = _outcome.get()
+    if outcome is not None:
+        outcome.degraded = True
+
+
+def make_etag(body: bytes) -> str:
+    """Strong entity tag of a response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluate an If-None-Match header against the current ETag, using the weak
+    comparison RFC 9110 prescribes for it.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def answer_headers(etag: Optional[str], max_age: int) -> Dict[str, str]:
+    """
+    Caching headers of an answer
+
+    Args:
+        etag: The answer's ETag, or None for a degraded answer that must not be stored
+        max_age: Seconds clients and CDNs may reuse the answer without revalidating
+
+    Returns:
+        ETag and Cache-Control headers
+    """
+    if etag is None:
+        return {"Cache-Control": "no-store"}
+    return {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+
+
+@dataclass(frozen=True)
+class CachedAnswer:
+    """A serialized answer and its ETag"""
+
+    body: str
+    etag: str
+
+
+class AnswerCache:
+    """Cache of whole serialized answers with hit/miss counters"""
+
+    def __init__(self, backend, ttl: float = 3600):
+        """
+        Args:
+            backend: Storage backend (MemoryBackend, DiskBackend or RedisBackend)
+            ttl: Seconds an answer stays valid on the server
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(question: Any, context: Any, version: str) -> str:
+        """Build the cache key of a question asked in a context against a topic table version"""
+        question, context = (value if isinstance(value, str) else json.dumps(value, sort_keys=True)
+                             for value in (question, context))
+        normalized = normalize_text(question) + "\x1f" + normalize_text(context)
+        return f"{version}:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+
+    def get(self, question: str, context: Any, version: str) -> Optional[CachedAnswer]:
+        """
+        Look up a cached answer
+
+        Returns:
+            The cached answer, or None on a miss
+        """
+        try:
+            value = self.backend.get(self.make_key(question, context, version))
+        except Exception as e:
+            # A broken cache must never break question answering
+            self.errors += 1
+            CACHE_REQUESTS.labels(operation=OPERATION, result="error").inc()
+            logger.warning(f"Answer cache lookup failed: {e}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+            CACHE_REQUESTS.labels(operation=OPERATION, result="miss").inc()
+            return None
+        self.hits += 1
+        CACHE_REQUESTS.labels(operation=OPERATION, result="hit").inc()
+        return CachedAnswer(**json.loads(value))
+
+    def set(self, question: str, context: Any, version: str, answer: CachedAnswer):
+        """Store the answer to a question"""
+        try:
+            value = json.dumps({"body": answer.body, "etag": answer.etag})
+            self.backend.set(self.make_key(question, context, version), value, self.ttl)
+        except Exception as e:
+            self.errors += 1
+            CACHE_REQUESTS.labels(operation=OPERATION, result="error").inc()
+            logger.warning(f"Answer cache store failed: {e}")
+
+    @property
+    def blocking(self) -> bool:
+        """Whether the backend does disk or network I/O, which must stay off an event loop"""
+        return not isinstance(self.backend, MemoryBackend)
+
+    async def aget(self, question: str, context: Any, version: str) -> Optional[CachedAnswer]:
+        """Asynchronous counterpart of 'get', looking blocking backends up on a worker thread"""
+        if self.blocking:
+            return await asyncio.to_thread(self.get, question, context, version)
+        return self.get(question, context, version)
+
+    async def aset(self, question: str, context: Any, version: str, answer: CachedAnswer):
+        """Asynchronous counterpart of 'set', writing to blocking backends on a worker thread"""
+        if self.blocking:
+            await asyncio.to_thread(self.set, question, context, version, answer)
+        else:
+            self.set(question, context, version, answer)
+
+    def clear(self):
+        """Drop every cached answer"""
+        try:
+            self.backend.clear()
+        except Exception as e:
+            logger.warning(f"Answer cache clear failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def create_answer_cache(topics=None, cache_type: Optional[str] = None) -> Optional[AnswerCache]:
+    """
+    Build the answer cache selected by the ANSWER_CACHE_TYPE setting
+
+    Args:
+        topics: TopicTable whose reloads clear the cache
+        cache_type: "simple" (in-process), "filesystem" (SQLite on disk), "redis" or "null";
+            defaults to ANSWER_CACHE_TYPE, then CACHE_TYPE
+
+    Returns:
+        An AnswerCache, or None when caching is disabled
+    """
+    cache_type = (cache_type or os.environ.get("ANSWER_CACHE_TYPE") or os.environ.get("CACHE_TYPE", "simple")).lower()
+    ttl = float(os.environ.get("ANSWER_CACHE_TTL", 3600))
+
+    if cache_type in ("null", "none"):
+        return None
+    if cache_type in ("simple", "memory"):
+        backend = MemoryBackend(
+            max_entries=int(os.environ.get("ANSWER_CACHE_THRESHOLD", 10000)),
+            max_bytes=int(os.environ.get("CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+        )
+    elif cache_type in ("filesystem", "disk"):
+        backend = DiskBackend(
+            os.path.join(os.environ.get("CACHE_DIR", "cache"), "answers.sqlite3"),
+            max_entries=int(os.environ.get("ANSWER_CACHE_THRESHOLD", 100000)),
+        )
+    elif cache_type == "redis":
+        backend = RedisBackend(os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0"),
+                               prefix="urban-copilot:answer:")
+    else:
+        raise ValueError(f"Unsupported ANSWER_CACHE_TYPE: {cache_type}")
+
+    cache = AnswerCache(backend, ttl=ttl)
+    if topics is not None:
+        topics.add_reload_listener(lambda index: cache.clear())
+    logger.info(f"Answer cache enabled with {type(backend).__name__}")
+    return cache
@@ -0,0 +1,428 @@
+"""
+Asynchronous Azure Cognitive Services integration for Urban Copilot
+This module mirrors CognitiveServicesClient on top of httpx so that one
+event loop can keep many questions in flight while waiting on Azure.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import httpx
+from typing import Dict, List, Any, Optional, Tuple
+
+from app.core import deadline
+from app.core.admission import AdmissionRejectedError, admission_controller, text_records
+from app.core.answer_cache import mark_degraded
+from app.core.cache import create_cache
+from app.core.circuit_breaker import CircuitOpenError, get_breaker
+from app.core.metrics import AZURE_REQUESTS, STAGE_SECONDS
+from app.core.tracing import TRACEPARENT_HEADER, tracer
+from app.core.cognitive_services import (
+    API_VERSION,
+    RETRY_STATUS_CODES,
+    STAGE_NAMES,
+    TextAnalysis,
+    batch_records,
+    circuit_open,
+    merge_batch,
+    plan_batch,
+    parse_language,
+    parse_sentiment,
+    parse_key_phrases,
+)
+
+logger = logging.getLogger(__name__)
+
+# Longest delay between two retries, whatever Retry-After asks for
+MAX_BACKOFF = 5.0
+
+
+class AsyncCognitiveServicesClient:
+    """Asynchronous client for interacting with Azure Cognitive Services"""
+
+    def __init__(self, api_key=None, endpoint=None, pool_size=None, connect_timeout=None,
+                 read_timeout=None, max_retries=None, backoff_factor=None, transport=None, cache=None,
+                 admission=None):
+        """
+        Initialize the asynchronous Azure Cognitive Services client
+
+        Args:
+            api_key: The Azure Cognitive Services API key
+            endpoint: The Azure Cognitive Services endpoint URL
+            pool_size: Maximum number of connections kept open to the endpoint
+            connect_timeout: Seconds to wait for a connection to be established
+            read_timeout: Seconds to wait for Azure to send a response
+            max_retries: Retries for throttled (429) and 5xx responses and connection errors
+            backoff_factor: Base delay in seconds for the jittered exponential backoff
+            transport: Optional httpx transport, e.g. httpx.MockTransport in tests
+            cache: AnalysisCache for results; built from the CACHE_TYPE setting by default
+            admission: AdmissionController pacing calls to the Azure quota; the process-wide one by default
+        """
+        # Use parameters or fall back to environment variables
+        self.api_key = api_key or os.environ.get('AZURE_API_KEY')
+        self.endpoint = endpoint or os.environ.get('AZURE_ENDPOINT')
+        self.pool_size = pool_size or int(os.environ.get('AZURE_POOL_SIZE', 100))
+        self.connect_timeout = connect_timeout or float(os.environ.get('AZURE_CONNECT_TIMEOUT', 3.05))
+        self.read_timeout = read_timeout or float(os.environ.get('AZURE_READ_TIMEOUT', 10))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get('AZURE_MAX_RETRIES', 2))
+        self.backoff_factor = backoff_factor if backoff_factor is not None else float(os.environ.get('AZURE_BACKOFF_FACTOR', 0.25))
+        self._transport = transport
+        self.cache = cache if cache is not None else create_cache(namespace=API_VERSION)
+        self.admission = admission if admission is not None else admission_controller
+
+        if not self.api_key or not self.endpoint:
+            logger.warning("Azure Cognitive Services credentials not configured")
+
+        # The httpx client binds to the running event loop, so it is created on first use
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The pooled httpx client shared by every call made through this client"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={
+                    "Ocp-Apim-Subscription-Key": self.api_key or "",
+                    "Content-Type": "application/json"
+                },
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                transport=self._transport,
+            )
+        return self._client
+
+    def reset_session(self):
+        """
+        Forget the pooled httpx client so the next call opens fresh connections
+
+        Called in worker processes forked after the client was used; the
+        inherited client belongs to the parent's sockets and event loop, so
+        it is dropped rather than closed.
+        """
+        self._client = None
+
+    async def warm_up(self):
+        """
+        Open a pooled connection to the endpoint on the running event loop, so
+        the first question does not pay for the TCP and TLS handshakes.
+        Failures are only logged; the first question will connect instead.
+        """
+        if not self.api_key or not self.endpoint:
+            return
+        try:
+            await self.client.head(self.endpoint, timeout=httpx.Timeout(5, connect=self.connect_timeout))
+        except Exception as e:
+            logger.warning(f"Azure Cognitive Services warm-up failed: {e}")
+
+    async def aclose(self):
+        """Close the pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _url(self, operation: str) -> str:
+        """Build the full URL of a Text Analytics operation"""
+        return f"{self.endpoint.rstrip('/')}/text/analytics/{API_VERSION}/{operation}"
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """
+        Compute how long to wait before the next attempt
+
+        Args:
+            attempt: Zero-based number of the attempt that just failed
+            response: The failed response, whose Retry-After header wins if present
+
+        Returns:
+            The delay in seconds, capped at MAX_BACKOFF
+        """
+        if response is not None and "Retry-After" in response.headers:
+            try:
+                return min(float(response.headers["Retry-After"]), MAX_BACKOFF)
+            except ValueError:
+                pass  # HTTP-date values fall back to the computed backoff
+        delay = self.backoff_factor * (2 ** attempt) + random.uniform(0, self.backoff_factor)
+        return min(delay, MAX_BACKOFF)
+
+    async def _post(self, operation: str, documents: List[Dict[str, str]], admitted: bool = False) -> Dict[str, Any]:
+        """
+        Send documents to a Text Analytics operation, retrying throttled and failed calls
+
+        The call first waits for quota from the admission controller, which
+        may shed it with AdmissionRejectedError. The operation's circuit
+        breaker (shared with the synchronous client) is consulted next and
+        fails the call immediately while it is open.
+
+        Each attempt's timeouts and each backoff are cut to the time left
+        before the request's deadline, and no attempt is started once it has passed.
+
+        Args:
+            operation: The operation path, e.g. "languages"
+            documents: The documents to analyze, each with an "id" and a "text"
+            admitted: True if the caller already acquired quota for this call
+
+        Returns:
+            The decoded JSON response
+
+        Raises:
+            DeadlineExceeded: If the deadline passed before or during the call
+        """
+        deadline.check(operation)
+        if not admitted:
+            await self.admission.aacquire(records=text_records(document["text"] for document in documents))
+
+        breaker = get_breaker(operation)
+        if not breaker.allow():
+            AZURE_REQUESTS.labels(operation=operation, status="circuit_open").inc()
+            raise CircuitOpenError(operation)
+
+        # Every exit, cancellation included, records an outcome with the breaker or
+        # releases the call, so a half-open probe cannot hold its slot forever
+        settled = False
+        try:
+            with tracer.start_span(f"cognitive_services.{operation}", kind="client",
+                                   attributes={"documents": len(documents)}) as span:
+                # Pass the trace on so Azure-side diagnostics can be correlated
+                headers = {TRACEPARENT_HEADER: span.traceparent} if span.sampled else None
+                start = time.monotonic()
+                for attempt in range(self.max_retries + 1):
+                    span.set_attribute("attempts", attempt + 1)
+                    timeout = httpx.Timeout(deadline.bound(self.read_timeout),
+                                            connect=deadline.bound(self.connect_timeout))
+                    try:
+                        response = await self.client.post(self._url(operation), json={"documents": documents},
+                                                          headers=headers, timeout=timeout)
+                    except httpx.TransportError:
+                        AZURE_REQUESTS.labels(operation=operation, status="error").inc()
+                        # A call cut short by the request's deadline says nothing about Azure's health
+                        if deadline.expired():
+                            deadline.exceeded(operation)
+                        if attempt == self.max_retries:
+                            settled = True
+                            breaker.record_failure(time.monotonic() - start)
+                            raise
+                        await asyncio.sleep(deadline.bound(self._backoff(attempt)))
+                        deadline.check(operation)
+                        continue
+
+                    AZURE_REQUESTS.labels(operation=operation, status=response.status_code).inc()
+                    span.set_attribute("http.status_code", response.status_code)
+                    if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries and not deadline.expired():
+                        await asyncio.sleep(deadline.bound(self._backoff(attempt, response)))
+                        deadline.check(operation)
+                        continue
+
+                    settled = True
+                    if response.status_code in RETRY_STATUS_CODES:
+                        breaker.record_failure(time.monotonic() - start)
+                    else:
+                        breaker.record_success(time.monotonic() - start)
+
+                    response.raise_for_status()  # Raise exception for HTTP errors
+                    return response.json()
+        finally:
+            if not settled:
+                breaker.release()
+
+    def circuit_open(self) -> bool:
+        """
+        Check whether any operation's circuit breaker is open
+
+        Returns:
+            True if Azure is currently being bypassed for at least one operation
+        """
+        return circuit_open()
+
+    async def is_available(self) -> str:
+        """
+        Check if the Azure Cognitive Services API is available
+
+        Returns:
+            str: "up" if the service is available, "down" if not
+        """
+        if not self.api_key or not self.endpoint:
+            return "down"
+
+        try:
+            response = await self.client.get(self._url("languages"), timeout=httpx.Timeout(5, connect=self.connect_timeout))
+            if response.status_code < 400:
+                return "up"
+            logger.warning(f"Azure Cognitive Services returned status code: {response.status_code}")
+            return "down"
+        except Exception as e:
+            logger.error(f"Error checking Azure Cognitive Services availability: {e}")
+            return "down"
+
+    @STAGE_SECONDS.labels(stage="language").time()
+    async def detect_language(self, text: str) -> Tuple[str, float]:
+        """
+        Detect the language of the provided text
+
+        Args:
+            text: The text to analyze
+
+        Returns:
+            A tuple containing (language_name, confidence_score)
+
+        Raises:
+            AdmissionRejectedError: If the call was shed to protect the Azure quota or budget
+        """
+        if not self.api_key or not self.endpoint:
+            return ("en", 1.0)  # Default to English
+
+        cached = await self.cache.aget("languages", text) if self.cache else None
+        if cached is not None:
+            return tuple(cached)
+
+        try:
+            result = await self._post("languages", [{"id": "1", "text": text}])
+            language, confidence = parse_language(result['documents'][0])
+            if self.cache:
+                await self.cache.aset("languages", text, [language, confidence])
+            return (language, confidence)
+        except AdmissionRejectedError:
+            raise  # Shed calls are answered by the agent's local fallback
+        except Exception as e:
+            logger.error(f"Error detecting language: {str(e)}")
+            mark_degraded()
+            return ("en", 0.0)  # Default to English with zero confidence on error
+
+    @STAGE_SECONDS.labels(stage="sentiment").time()
+    async def analyze_sentiment(self, text: str) -> Tuple[str, float]:
+        """
+        Analyze the sentiment of the provided text
+
+        Args:
+            text: The text to analyze
+
+        Returns:
+            A tuple containing (sentiment, confidence_score)
+            sentiment is one of: positive, neutral, negative
+
+        Raises:
+            AdmissionRejectedError: If the call was shed to protect the Azure quota or budget
+        """
+        if not self.api_key or not self.endpoint:
+            return ("neutral", 0.5)  # Default to neutral
+
+        cached = await self.cache.aget("sentiment", text) if self.cache else None
+        if cached is not None:
+            return tuple(cached)
+
+        try:
+            result = await self._post("sentiment", [{"id": "1", "text": text}])
+            sentiment, score = parse_sentiment(result['documents'][0])
+            if self.cache:
+                await self.cache.aset("sentiment", text, [sentiment, score])
+            return (sentiment, score)
+        except AdmissionRejectedError:
+            raise  # Shed calls are answered by the agent's local fallback
+        except Exception as e:
+            logger.error(f"Error analyzing sentiment: {str(e)}")
+            mark_degraded()
+            return ("neutral", 0.5)  # Default to neutral on error
+
+    @STAGE_SECONDS.labels(stage="key_phrases").time()
+    async def extract_key_phrases(self, text: str) -> List[str]:
+        """
+        Extract key phrases from the provided text
+
+        Args:
+            text: The text to analyze
+
+        Returns:
+            A list of key phrases
+
+        Raises:
+            AdmissionRejectedError: If the call was shed to protect the Azure quota or budget
+        """
+        if not self.api_key or not self.endpoint:
+            return [text]  # Return the original text as a single phrase
+
+        cached = await self.cache.aget("keyPhrases", text) if self.cache else None
+        if cached is not None:
+            return cached
+
+        try:
+            result = await self._post("keyPhrases", [{"id": "1", "text": text}])
+            key_phrases = parse_key_phrases(result['documents'][0])
+            if self.cache:
+                await self.cache.aset("keyPhrases", text, key_phrases)
+            return key_phrases
+        except AdmissionRejectedError:
+            raise  # Shed calls are answered by the agent's local fallback
+        except Exception as e:
+            logger.error(f"Error extracting key phrases: {str(e)}")
+            mark_degraded()
+            return [text]  # Return the original text on error
+
+    async def analyze(self, text: str) -> TextAnalysis:
+        """
+        Run language detection, key phrase extraction and sentiment analysis
+        on the provided text concurrently
+
+        Args:
+            text: The text to analyze
+
+        Returns:
+            A TextAnalysis holding the results of all three operations
+
+        Raises:
+            AdmissionRejectedError: If any of the calls was shed
+        """
+        (language, language_confidence), key_phrases, (sentiment, sentiment_score) = await asyncio.gather(
+            self.detect_language(text),
+            self.extract_key_phrases(text),
+            self.analyze_sentiment(text),
+        )
+        return TextAnalysis(
+            language=language,
+            language_confidence=language_confidence,
+            key_phrases=key_phrases,
+            sentiment=sentiment,
+            sentiment_score=sentiment_score,
+        )
+
+    async def _with_cache(self, func, *args):
+        """Run work that reads or writes the cache, on a worker thread if the cache does disk or network I/O"""
+        if self.cache and self.cache.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def _post_quietly(self, operation: str, documents: List[Dict[str, str]],
+                            admitted: bool = False) -> Optional[Dict[str, Any]]:
+        """Like _post, but log failures and return None so one bad chunk cannot sink a batch"""
+        try:
+            with STAGE_SECONDS.labels(stage=STAGE_NAMES[operation]).time():
+                return await self._post(operation, documents, admitted=admitted)
+        except Exception as e:
+            logger.error(f"Error calling Text Analytics {operation} for {len(documents)} documents: {str(e)}")
+            return None
+
+    async def analyze_batch(self, texts: List[str]) -> List[TextAnalysis]:
+        """
+        Analyze many texts in as few multi-document requests as possible, all
+        sent concurrently on the event loop (see CognitiveServicesClient.analyze_batch)
+
+        Args:
+            texts: The texts to analyze
+
+        Returns:
+            One TextAnalysis per text, in the same order
+
+        Raises:
+            AdmissionRejectedError: If the exchange was shed to protect the Azure quota or budget
+        """
+        if not self.api_key or not self.endpoint:
+            return [await self.analyze(text) for text in texts]
+
+        results, chunks = await self._with_cache(plan_batch, texts, self.cache)
+
+        # The whole exchange is admitted or shed as one, so a batch never ends up half analyzed
+        if chunks:
+            await self.admission.aacquire(cost=len(chunks), records=batch_records(chunks))
+
+        responses = await asyncio.gather(*(self._post_quietly(operation, documents, admitted=True)
+                                           for operation, documents, _ in chunks))
+        return await self._with_cache(merge_batch, texts, results, chunks, responses, self.cache)
@@ -0,0 +1,152 @@
+"""
+Server-side micro-batching for Urban Copilot
+Merges single-question analyses that arrive within a short window into one
+multi-document Text Analytics request per operation.
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.cognitive_services import TextAnalysis
+from app.core.metrics import MICRO_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Dispatcher that sits between the agent and CognitiveServicesClient.
+
+    Callers submit one text each; a background thread collects submissions
+    until either max_batch_size texts are waiting or max_wait seconds have
+    passed since the first one, then hands the batch to analyze_batch on a
+    worker thread and goes back to collecting. Each caller receives the
+    TextAnalysis of its own text.
+    """
+
+    def __init__(self, client, max_batch_size: int = 10, max_wait: float = 0.01, max_concurrent_batches: Optional[int] = None):
+        """
+        Args:
+            client: The CognitiveServicesClient whose analyze_batch serves the batches
+            max_batch_size: Largest number of texts merged into one batch
+            max_wait: Longest time in seconds the first text of a batch waits for company
+            max_concurrent_batches: Batches that may be in flight at once; defaults to the client's pool size
+        """
+        self.client = client
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_batches or getattr(client, "pool_size", 10),
+            thread_name_prefix="micro-batch",
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        # Counters for monitoring
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_started(self):
+        """Start the collector thread on first use (after any worker fork)"""
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._collect, name="micro-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """
+        Queue a text for analysis
+
+        Args:
+            text: The text to analyze
+
+        Returns:
+            A Future resolving to the TextAnalysis of the text
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def analyze(self, text: str, timeout: Optional[float] = None) -> TextAnalysis:
+        """
+        Analyze a text as part of the next batch, blocking until its result is ready
+
+        Args:
+            text: The text to analyze
+            timeout: Optional number of seconds to wait for the result
+
+        Returns:
+            The TextAnalysis of the text
+        """
+        return self.submit(text).result(timeout)
+
+    def _collect(self):
+        """Collector loop: group queued texts into batches and dispatch them"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self.batches += 1
+            self.items += len(batch)
+            MICRO_BATCH_SIZE.observe(len(batch))
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch: List[Tuple[str, Future]]):
+        """Analyze one batch and hand each caller its own result"""
+        try:
+            analyses = self.client.analyze_batch([text for text, _ in batch])
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(batch)} texts failed: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), analysis in zip(batch, analyses):
+            future.set_result(analysis)
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch counters, including how full batches are on average"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "fill_ratio": round(self.items / (self.batches * self.max_batch_size), 4) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+def create_batcher(client) -> Optional[MicroBatcher]:
+    """
+    Build the micro-batcher selected by the MICRO_BATCH_* settings
+
+    Args:
+        client: The CognitiveServicesClient serving the batches
+
+    Returns:
+        A MicroBatcher, or None when micro-batching is disabled
+    """
+    if os.environ.get("MICRO_BATCH_ENABLED", "False") != "True":
+        return None
+
+    return MicroBatcher(
+        client,
+        max_batch_size=int(os.environ.get("MICRO_BATCH_MAX_SIZE", 10)),
+        max_wait=float(os.environ.get("MICRO_BATCH_MAX_WAIT_MS", 10)) / 1000,
+    )
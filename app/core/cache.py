@@ -0,0 +1,296 @@
+"""
+Analysis cache for Urban Copilot
+Stores Text Analytics results keyed on the normalized text, the operation and
+the API version, so repeated questions skip the round trip to Azure.
+"""
+
+import os
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so that trivially different spellings share one cache entry"""
+    return " ".join(unicodedata.normalize("NFKC", text).split()).casefold()
+
+
+class MemoryBackend:
+    """In-process LRU store bounded by entry count and approximate size in bytes"""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 16 * 1024 * 1024):
+        """
+        Args:
+            max_entries: Maximum number of entries kept
+            max_bytes: Maximum total size of the keys and values kept
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)  # Mark as most recently used
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._size += len(key) + len(value)
+            # Evict least recently used entries until both bounds hold
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _remove(self, key: str):
+        value, _ = self._entries.pop(key)
+        self._size -= len(key) + len(value)
+
+
+class DiskBackend:
+    """SQLite-backed store shared by every worker process on the host"""
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        """
+        Args:
+            path: Location of the SQLite database file
+            max_entries: Maximum number of entries kept before the least recently used are evicted
+        """
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection = None
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection must not be shared with the parent process after a fork
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache "
+                "(key TEXT PRIMARY KEY, value TEXT, expires_at REAL, accessed_at REAL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS analysis_cache_accessed ON analysis_cache (accessed_at)")
+        return self._connection
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value, expires_at FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                connection.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+                return None
+            connection.execute("UPDATE analysis_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO analysis_cache VALUES (?, ?, ?, ?)", (key, value, now + ttl, now)
+            )
+            # Evict expired entries first, then the least recently used ones
+            connection.execute("DELETE FROM analysis_cache WHERE expires_at < ?", (now,))
+            connection.execute(
+                "DELETE FROM analysis_cache WHERE key IN (SELECT key FROM analysis_cache "
+                "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM analysis_cache")
+
+
+class RedisBackend:
+    """
+    Store backed by a Redis-compatible server.
+    Memory bound and LRU eviction are enforced by the server, e.g. with
+    'maxmemory 256mb' and 'maxmemory-policy allkeys-lru'.
+    """
+
+    def __init__(self, url: str, prefix: str = "urban-copilot:analysis:"):
+        """
+        Args:
+            url: Connection URL, e.g. redis://localhost:6379/0
+            prefix: Namespace prepended to every key
+        """
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("The redis package is required for CACHE_TYPE=redis (pip install redis)") from e
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._client.get(self.prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str, ttl: float):
+        self._client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + "*"):
+            self._client.delete(key)
+
+
+class AnalysisCache:
+    """Content-addressed cache of Text Analytics results with hit/miss counters"""
+
+    def __init__(self, backend, ttl: float = 3600, namespace: str = ""):
+        """
+        Args:
+            backend: Storage backend (MemoryBackend, DiskBackend or RedisBackend)
+            ttl: Seconds an entry stays valid
+            namespace: Extra key component, typically the Text Analytics API version
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def make_key(self, operation: str, text: str) -> str:
+        """Build the cache key of an operation applied to a text"""
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{operation}:{digest}"
+
+    def get(self, operation: str, text: str) -> Optional[Any]:
+        """
+        Look up a cached result
+
+        Returns:
+            The cached result, or None on a miss
+        """
+        try:
+            value = self.backend.get(self.make_key(operation, text))
+        except Exception as e:
+            # A broken cache must never break question answering
+            self.errors += 1
+            CACHE_REQUESTS.labels(operation=operation, result="error").inc()
+            logger.warning(f"Analysis cache lookup failed: {e}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+            CACHE_REQUESTS.labels(operation=operation, result="miss").inc()
+            return None
+        self.hits += 1
+        CACHE_REQUESTS.labels(operation=operation, result="hit").inc()
+        return json.loads(value)
+
+    def set(self, operation: str, text: str, result: Any):
+        """Store the result of an operation applied to a text"""
+        try:
+            self.backend.set(self.make_key(operation, text), json.dumps(result), self.ttl)
+        except Exception as e:
+            self.errors += 1
+            CACHE_REQUESTS.labels(operation=operation, result="error").inc()
+            logger.warning(f"Analysis cache store failed: {e}")
+
+    @property
+    def blocking(self) -> bool:
+        """Whether the backend does disk or network I/O, which must stay off an event loop"""
+        return not isinstance(self.backend, MemoryBackend)
+
+    async def aget(self, operation: str, text: str) -> Optional[Any]:
+        """Asynchronous counterpart of 'get', looking blocking backends up on a worker thread"""
+        if self.blocking:
+            return await asyncio.to_thread(self.get, operation, text)
+        return self.get(operation, text)
+
+    async def aset(self, operation: str, text: str, result: Any):
+        """Asynchronous counterpart of 'set', writing to blocking backends on a worker thread"""
+        if self.blocking:
+            await asyncio.to_thread(self.set, operation, text, result)
+        else:
+            self.set(operation, text, result)
+
+    def clear(self):
+        """Drop every cached result"""
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def create_cache(cache_type: Optional[str] = None, namespace: str = "") -> Optional[AnalysisCache]:
+    """
+    Build the analysis cache selected by the CACHE_TYPE setting
+
+    Args:
+        cache_type: "simple" (in-process), "filesystem" (SQLite on disk), "redis" or "null";
+            defaults to the CACHE_TYPE environment variable
+        namespace: Extra key component, typically the Text Analytics API version
+
+    Returns:
+        An AnalysisCache, or None when caching is disabled
+    """
+    cache_type = (cache_type or os.environ.get("CACHE_TYPE", "simple")).lower()
+    ttl = float(os.environ.get("CACHE_DEFAULT_TIMEOUT", 3600))
+
+    if cache_type in ("null", "none"):
+        return None
+    if cache_type in ("simple", "memory"):
+        backend = MemoryBackend(
+            max_entries=int(os.environ.get("CACHE_THRESHOLD", 10000)),
+            max_bytes=int(os.environ.get("CACHE_MAX_BYTES", 16 * 1024 * 1024)),
+        )
+    elif cache_type in ("filesystem", "disk"):
+        backend = DiskBackend(
+            os.path.join(os.environ.get("CACHE_DIR", "cache"), "analysis.sqlite3"),
+            max_entries=int(os.environ.get("CACHE_THRESHOLD", 100000)),
+        )
+    elif cache_type == "redis":
+        backend = RedisBackend(os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    else:
+        raise ValueError(f"Unsupported CACHE_TYPE: {cache_type}")
+
+    logger.info(f"Analysis cache enabled with {type(backend).__name__}")
+    return AnalysisCache(backend, ttl=ttl, namespace=namespace)
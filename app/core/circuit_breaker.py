@@ -0,0 +1,190 @@
+"""
+Circuit breakers for Urban Copilot's calls to Azure
+A breaker per Text Analytics operation watches recent error rates and
+latencies. Once Azure misbehaves the breaker opens and calls fail fast
+without touching the network until a cool-down has passed, after which a
+few probe calls decide whether to close it again.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Any, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Azure while a breaker is open"""
+
+    def __init__(self, name: str):
+        super().__init__(f"Circuit breaker '{name}' is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker driven by error rate and slow-call rate"""
+
+    def __init__(self, name: str, window_size: int = 20, min_calls: int = 10, failure_rate: float = 0.5,
+                 slow_call_duration: float = 2.0, slow_call_rate: float = 0.5, open_duration: float = 30.0,
+                 half_open_calls: int = 3):
+        """
+        Args:
+            name: Name reported in errors and health checks, e.g. the operation
+            window_size: Number of recent calls considered
+            min_calls: Calls needed in the window before the rates are judged
+            failure_rate: Share of failed calls that opens the breaker
+            slow_call_duration: Seconds after which a successful call counts as slow
+            slow_call_rate: Share of slow calls that opens the breaker
+            open_duration: Seconds the breaker stays open before probing
+            half_open_calls: Successful probe calls needed to close the breaker
+        """
+        self.name = name
+        self.window_size = window_size
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._outcomes = deque(maxlen=window_size)  # (failed, slow) per call
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.times_opened = 0
+        self.rejected_calls = 0
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the cool-down has passed"""
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_duration:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+
+    def allow(self) -> bool:
+        """
+        Decide whether a call may go ahead
+
+        Returns:
+            True if the call may be made; False if it must fail fast
+        """
+        with self._lock:
+            self._refresh()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes_in_flight < self.half_open_calls - self._probe_successes:
+                self._probes_in_flight += 1
+                return True
+            self.rejected_calls += 1
+            return False
+
+    def record_success(self, duration: float):
+        """Record a call that got a usable answer after 'duration' seconds"""
+        slow = duration >= self.slow_call_duration
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if slow:
+                    self._open()
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                return
+            self._outcomes.append((False, slow))
+            self._evaluate()
+
+    def record_failure(self, duration: float = 0.0):
+        """Record a call that failed after 'duration' seconds"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append((True, duration >= self.slow_call_duration))
+            self._evaluate()
+
+    def release(self):
+        """
+        Record a call that ended without telling anything about the dependency,
+        e.g. cut short by the caller's deadline or cancelled. Frees its probe
+        slot while half-open and leaves the failure window untouched.
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _evaluate(self):
+        if self._state != CLOSED or len(self._outcomes) < self.min_calls:
+            return
+        calls = len(self._outcomes)
+        failures = sum(1 for failed, _ in self._outcomes if failed)
+        slow = sum(1 for _, is_slow in self._outcomes if is_slow)
+        if failures / calls >= self.failure_rate or slow / calls >= self.slow_call_rate:
+            self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.times_opened += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """State and counters for health checks and metrics"""
+        with self._lock:
+            self._refresh()
+            calls = len(self._outcomes)
+            failures = sum(1 for failed, _ in self._outcomes if failed)
+            return {
+                "state": self._state,
+                "recent_calls": calls,
+                "recent_failure_rate": round(failures / calls, 4) if calls else 0.0,
+                "times_opened": self.times_opened,
+                "rejected_calls": self.rejected_calls,
+            }
+
+
+# One breaker per name and process, shared by the synchronous and asynchronous clients
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Return the process-wide breaker for a name, creating it from the CIRCUIT_BREAKER_* settings
+
+    Args:
+        name: Usually the Text Analytics operation, e.g. "sentiment"
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                name,
+                window_size=int(os.environ.get("CIRCUIT_BREAKER_WINDOW", 20)),
+                min_calls=int(os.environ.get("CIRCUIT_BREAKER_MIN_CALLS", 10)),
+                failure_rate=float(os.environ.get("CIRCUIT_BREAKER_FAILURE_RATE", 0.5)),
+                slow_call_duration=float(os.environ.get("CIRCUIT_BREAKER_SLOW_CALL_SECONDS", 2.0)),
+                slow_call_rate=float(os.environ.get("CIRCUIT_BREAKER_SLOW_CALL_RATE", 0.5)),
+                open_duration=float(os.environ.get("CIRCUIT_BREAKER_OPEN_SECONDS", 30)),
+                half_open_calls=int(os.environ.get("CIRCUIT_BREAKER_HALF_OPEN_CALLS", 3)),
+            )
+        return _breakers[name]
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every breaker created in this process"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
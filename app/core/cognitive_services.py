@@ -5,32 +5,403 @@ for natural language processing capabilities.
 """
 
 import os
+import time
 import requests
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from app.core import deadline
+from app.core.admission import AdmissionRejectedError, admission_controller, text_records
+from app.core.answer_cache import mark_degraded
+from app.core.cache import create_cache, normalize_text
+from app.core.circuit_breaker import OPEN, CircuitOpenError, get_breaker
+from app.core.metrics import AZURE_REQUESTS, STAGE_SECONDS
+from app.core.tracing import TRACEPARENT_HEADER, tracer
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Any, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Text Analytics API version used for every request
+API_VERSION = "v3.1"
+
+# Status codes that are worth retrying: throttling and transient server errors
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Name of the metrics stage timing each operation
+STAGE_NAMES = {"languages": "language", "keyPhrases": "key_phrases", "sentiment": "sentiment"}
+
+# Maximum number of documents a synchronous v3.1 request accepts, per operation
+MAX_DOCUMENTS_PER_REQUEST = {
+    "languages": 1000,
+    "keyPhrases": 10,
+    "sentiment": 10,
+}
+
+
+@dataclass
+class TextAnalysis:
+    """Combined result of the Text Analytics operations run on a single text"""
+
+    language: str = "en"
+    language_confidence: float = 1.0
+    key_phrases: List[str] = field(default_factory=list)
+    sentiment: str = "neutral"
+    sentiment_score: float = 0.5
+    degraded: bool = False  # True if any operation fell back because Azure failed
+
+
+def parse_language(document: Dict[str, Any]) -> Tuple[str, float]:
+    """Extract (language_name, confidence_score) from a languages result document"""
+    detected_language = document['detectedLanguage']
+    return (detected_language['name'], detected_language['confidenceScore'])
+
+
+def parse_sentiment(document: Dict[str, Any]) -> Tuple[str, float]:
+    """Extract (sentiment, confidence_score) from a sentiment result document"""
+    sentiment = document['sentiment']
+    score = max(document['confidenceScores'][sentiment], 0.5)  # Use the confidence of the detected sentiment
+    return (sentiment, score)
+
+
+def parse_key_phrases(document: Dict[str, Any]) -> List[str]:
+    """Extract the key phrases from a keyPhrases result document"""
+    return document['keyPhrases']
+
+
+# Result parser of each operation, keyed by operation path
+PARSERS = {
+    "languages": parse_language,
+    "keyPhrases": parse_key_phrases,
+    "sentiment": parse_sentiment,
+}
+
+
+def fallback_result(operation: str, text: str) -> Any:
+    """The value an operation reports for a text when Azure could not analyze it"""
+    if operation == "languages":
+        return ("en", 0.0)  # Default to English with zero confidence
+    if operation == "keyPhrases":
+        return [text]  # The original text as a single phrase
+    return ("neutral", 0.5)  # Default to neutral
+
+
+# A multi-document request of a batch: operation, documents, and text indexes by document id
+BatchChunk = Tuple[str, List[Dict[str, str]], Dict[str, List[int]]]
+
+
+def plan_batch(texts: List[str], cache=None) -> Tuple[Dict[str, List[Any]], List[BatchChunk]]:
+    """
+    Split the texts of a batch into the multi-document requests to send
+
+    Texts are looked up in the cache first and deduplicated, and the remaining
+    documents are split into chunks of MAX_DOCUMENTS_PER_REQUEST per operation.
+
+    Args:
+        texts: The texts to analyze
+        cache: AnalysisCache to look results up in, if any
+
+    Returns:
+        The results found so far per operation (None where still missing), and
+        the chunks to send
+    """
+    results = {operation: [None] * len(texts) for operation in MAX_DOCUMENTS_PER_REQUEST}
+    chunks = []
+    for operation, operation_results in results.items():
+        # Group identical texts so each is sent once
+        groups: Dict[str, List[int]] = {}
+        for index, text in enumerate(texts):
+            cached = cache.get(operation, text) if cache else None
+            if cached is not None:
+                operation_results[index] = cached
+            else:
+                groups.setdefault(normalize_text(text), []).append(index)
+
+        indexes_by_id = {str(number): indexes for number, indexes in enumerate(groups.values())}
+        documents = [{"id": doc_id, "text": texts[indexes[0]]} for doc_id, indexes in indexes_by_id.items()]
+        size = MAX_DOCUMENTS_PER_REQUEST[operation]
+        for start in range(0, len(documents), size):
+            chunks.append((operation, documents[start:start + size], indexes_by_id))
+    return results, chunks
+
+
+def batch_records(chunks: List[BatchChunk]) -> int:
+    """Billable text records of the chunks planned by plan_batch"""
+    return sum(text_records(document["text"] for document in documents) for _, documents, _ in chunks)
+
+
+def merge_batch(texts: List[str], results: Dict[str, List[Any]], chunks: List[BatchChunk],
+                responses: Iterable[Optional[Dict[str, Any]]], cache=None) -> List[TextAnalysis]:
+    """
+    Fan the responses to the chunks planned by plan_batch back out to the texts
+
+    Documents that Azure rejected or that belong to a failed request (a None
+    response) get the same fallback values as the single-text methods, and
+    their analyses are marked degraded.
+
+    Returns:
+        One TextAnalysis per text, in the same order
+    """
+    for (operation, documents, indexes_by_id), result in zip(chunks, responses):
+        if result is None:
+            continue
+        for document in result.get('documents', []):
+            indexes = indexes_by_id[document['id']]
+            value = PARSERS[operation](document)
+            for index in indexes:
+                results[operation][index] = value
+            if cache:
+                cache.set(operation, texts[indexes[0]], value)
+        for error in result.get('errors', []):
+            logger.warning(f"Text Analytics {operation} rejected document {error.get('id')}: {error.get('error')}")
+
+    # Anything still missing was rejected or lost with a failed request
+    degraded = set()
+    for operation, operation_results in results.items():
+        for index, value in enumerate(operation_results):
+            if value is None:
+                operation_results[index] = fallback_result(operation, texts[index])
+                degraded.add(index)
+
+    analyses = []
+    for index, (language, key_phrases, sentiment) in enumerate(
+            zip(results["languages"], results["keyPhrases"], results["sentiment"])):
+        analyses.append(TextAnalysis(
+            language=language[0],
+            language_confidence=language[1],
+            key_phrases=key_phrases,
+            sentiment=sentiment[0],
+            sentiment_score=sentiment[1],
+            degraded=index in degraded,
+        ))
+    return analyses
+
+
+def circuit_open() -> bool:
+    """
+    Check whether any operation's circuit breaker is open. The breakers are
+    process-wide and shared by the synchronous and asynchronous clients.
+
+    Returns:
+        True if Azure is currently being bypassed for at least one operation
+    """
+    return any(get_breaker(operation).state == OPEN for operation in MAX_DOCUMENTS_PER_REQUEST)
+
+
+class _CappedRetry(Retry):
+    """
+    Retry policy that never sleeps longer than backoff_max, even if Retry-After
+    asks for more, nor past the deadline of the request being answered
+    """
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return deadline.bound(min(retry_after, self.backoff_max))
+
+    def get_backoff_time(self):
+        return deadline.bound(super().get_backoff_time())
+
+    def is_exhausted(self):
+        # Retries run on the calling thread, so they see the caller's deadline
+        return super().is_exhausted() or deadline.expired()
+
+
 class CognitiveServicesClient:
     """Client for interacting with Azure Cognitive Services"""
     
-    def __init__(self, api_key=None, endpoint=None):
+    def __init__(self, api_key=None, endpoint=None, pool_size=None, connect_timeout=None,
+                 read_timeout=None, max_retries=None, backoff_factor=None, cache=None, admission=None):
         """
         Initialize the Azure Cognitive Services client
         
         Args:
             api_key: The Azure Cognitive Services API key
             endpoint: The Azure Cognitive Services endpoint URL
+            pool_size: Maximum number of keep-alive connections kept to the endpoint
+            connect_timeout: Seconds to wait for a connection to be established
+            read_timeout: Seconds to wait for Azure to send a response
+            max_retries: Retries for throttled (429) and 5xx responses and connection errors
+            backoff_factor: Base delay in seconds for the jittered exponential backoff
+            cache: AnalysisCache for results; built from the CACHE_TYPE setting by default
+            admission: AdmissionController pacing calls to the Azure quota; the process-wide one by default
         """
         # Use parameters or fall back to environment variables
         self.api_key = api_key or os.environ.get('AZURE_API_KEY')
         self.endpoint = endpoint or os.environ.get('AZURE_ENDPOINT')
+        self.pool_size = pool_size or int(os.environ.get('AZURE_POOL_SIZE', 10))
+        self.connect_timeout = connect_timeout or float(os.environ.get('AZURE_CONNECT_TIMEOUT', 3.05))
+        self.read_timeout = read_timeout or float(os.environ.get('AZURE_READ_TIMEOUT', 10))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get('AZURE_MAX_RETRIES', 2))
+        self.backoff_factor = backoff_factor if backoff_factor is not None else float(os.environ.get('AZURE_BACKOFF_FACTOR', 0.25))
         
         if not self.api_key or not self.endpoint:
             logger.warning("Azure Cognitive Services credentials not configured")
         else:
             logger.info(f"Azure Cognitive Services client initialized with endpoint: {self.endpoint}")
-            
+
+        # Keep-alive connection pool shared by every call made through this client
+        self.session = self._create_session()
+
+        # Results of previous analyses, keyed on normalized text, operation and API version
+        self.cache = cache if cache is not None else create_cache(namespace=API_VERSION)
+
+        # Token bucket and budget shared with every other client of this process
+        self.admission = admission if admission is not None else admission_controller
+
+        # Worker threads used to dispatch independent requests concurrently, sized
+        # to the connection pool (threads are only started on first use)
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="cognitive")
+
+    def _create_session(self) -> requests.Session:
+        """
+        Build a pooled HTTP session with bounded, jittered retries
+
+        Returns:
+            A requests.Session whose adapter reuses connections to the endpoint
+        """
+        retry = _CappedRetry(
+            total=self.max_retries,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["GET", "POST"]),  # Text Analytics POSTs are idempotent
+            backoff_factor=self.backoff_factor,
+            backoff_jitter=self.backoff_factor,
+            backoff_max=5,
+            respect_retry_after_header=True,
+            raise_on_status=False,  # Let raise_for_status report the final response
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
+            "Ocp-Apim-Subscription-Key": self.api_key or "",
+            "Content-Type": "application/json"
+        })
+        return session
+
+    def reset_session(self):
+        """
+        Replace the HTTP session with a fresh connection pool
+
+        Sockets must not be shared across processes, so this is called in
+        worker processes that were forked after the client was created.
+        The dispatch threads do not survive a fork either, so the executor
+        is replaced too.
+        """
+        self.session.close()
+        self.session = self._create_session()
+        self._executor.shutdown(wait=False)
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="cognitive")
+
+    def warm_up(self):
+        """
+        Open a pooled connection to the endpoint and to the analysis cache, so
+        the first question does not pay for the TCP and TLS handshakes. The
+        request made is not a Text Analytics operation and is not billed.
+        Failures are only logged; the first question will connect instead.
+        """
+        if self.cache is not None:
+            try:
+                self.cache.backend.get("warm-up")
+            except Exception as e:
+                logger.warning(f"Analysis cache warm-up failed: {e}")
+        if not self.api_key or not self.endpoint:
+            return
+        try:
+            self.session.head(self.endpoint, timeout=(self.connect_timeout, 5))
+        except Exception as e:
+            logger.warning(f"Azure Cognitive Services warm-up failed: {e}")
+
+    def _url(self, operation: str) -> str:
+        """Build the full URL of a Text Analytics operation"""
+        return f"{self.endpoint.rstrip('/')}/text/analytics/{API_VERSION}/{operation}"
+
+    def _post(self, operation: str, documents: List[Dict[str, str]], admitted: bool = False) -> Dict[str, Any]:
+        """
+        Send documents to a Text Analytics operation over the pooled session
+
+        The call first waits for quota from the admission controller, which
+        may shed it with AdmissionRejectedError. The operation's circuit
+        breaker is consulted next: while it is open the call fails
+        immediately with CircuitOpenError instead of waiting on Azure.
+
+        The connect and read timeouts are cut to the time left before the
+        request's deadline, and no call is started once it has passed.
+
+        Args:
+            operation: The operation path, e.g. "languages"
+            documents: The documents to analyze, each with an "id" and a "text"
+            admitted: True if the caller already acquired quota for this call
+
+        Returns:
+            The decoded JSON response
+
+        Raises:
+            DeadlineExceeded: If the deadline passed before or during the call
+        """
+        deadline.check(operation)
+        if not admitted:
+            self.admission.acquire(records=text_records(document["text"] for document in documents))
+
+        breaker = get_breaker(operation)
+        if not breaker.allow():
+            AZURE_REQUESTS.labels(operation=operation, status="circuit_open").inc()
+            raise CircuitOpenError(operation)
+
+        # Every exit records an outcome with the breaker or releases the call, so a
+        # half-open probe cut short by the deadline cannot hold its slot forever
+        settled = False
+        try:
+            with tracer.start_span(f"cognitive_services.{operation}", kind="client",
+                                   attributes={"documents": len(documents)}) as span:
+                # Pass the trace on so Azure-side diagnostics can be correlated
+                headers = {TRACEPARENT_HEADER: span.traceparent} if span.sampled else None
+                start = time.monotonic()
+                try:
+                    response = self.session.post(
+                        self._url(operation),
+                        json={"documents": documents},
+                        headers=headers,
+                        timeout=(deadline.bound(self.connect_timeout), deadline.bound(self.read_timeout))
+                    )
+                except Exception:
+                    AZURE_REQUESTS.labels(operation=operation, status="error").inc()
+                    # A call cut short by the request's deadline says nothing about Azure's health
+                    if deadline.expired():
+                        deadline.exceeded(operation)
+                    settled = True
+                    breaker.record_failure(time.monotonic() - start)
+                    raise
+                AZURE_REQUESTS.labels(operation=operation, status=response.status_code).inc()
+                span.set_attribute("http.status_code", response.status_code)
+
+                # Throttling and server errors that survived the retries count against the breaker
+                settled = True
+                if response.status_code in RETRY_STATUS_CODES:
+                    breaker.record_failure(time.monotonic() - start)
+                else:
+                    breaker.record_success(time.monotonic() - start)
+
+                response.raise_for_status()  # Raise exception for HTTP errors
+                return response.json()
+        finally:
+            if not settled:
+                breaker.release()
+
+    def circuit_open(self) -> bool:
+        """
+        Check whether any operation's circuit breaker is open
+
+        Returns:
+            True if Azure is currently being bypassed for at least one operation
+        """
+        return circuit_open()
+
     def is_available(self) -> str:
         """
         Check if the Azure Cognitive Services API is available
@@ -43,14 +414,9 @@ class CognitiveServicesClient:
             
         try:
             # Simple ping to the API
-            headers = {
-                "Ocp-Apim-Subscription-Key": self.api_key,
-                "Content-Type": "application/json"
-            }
-            response = requests.get(
-                f"{self.endpoint}/text/analytics/v3.1/languages",
-                headers=headers,
-                timeout=5
+            response = self.session.get(
+                self._url("languages"),
+                timeout=(self.connect_timeout, 5)
             )
             
             # Check if we got a valid response
@@ -63,6 +429,7 @@ class CognitiveServicesClient:
             logger.error(f"Error checking Azure Cognitive Services availability: {e}")
             return "down"
 
+    @STAGE_SECONDS.labels(stage="language").time()
     def detect_language(self, text: str) -> Tuple[str, float]:
         """
         Detect the language of the provided text
@@ -72,42 +439,38 @@ class CognitiveServicesClient:
             
         Returns:
             A tuple containing (language_name, confidence_score)
+
+        Raises:
+            AdmissionRejectedError: If the call was shed to protect the Azure quota or budget
         """
         if not self.api_key or not self.endpoint:
             logger.warning("Azure Cognitive Services not configured, skipping language detection")
             return ("en", 1.0)  # Default to English
             
+        cached = self.cache.get("languages", text) if self.cache else None
+        if cached is not None:
+            return tuple(cached)
+            
         try:
-            # Construct the request
-            url = f"{self.endpoint}text/analytics/v3.1/languages"
-            headers = {
-                "Ocp-Apim-Subscription-Key": self.api_key,
-                "Content-Type": "application/json"
-            }
-            data = {
-                "documents": [
-                    {
-                        "id": "1",
-                        "text": text
-                    }
-                ]
-            }
-            
-            # Send the request
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()  # Raise exception for HTTP errors
+            # Send the request over the pooled session
+            result = self._post("languages", [{"id": "1", "text": text}])
             
             # Process the response
-            result = response.json()
-            detected_language = result['documents'][0]['detectedLanguage']
+            language, confidence = parse_language(result['documents'][0])
             
-            logger.debug(f"Detected language: {detected_language['name']} with confidence {detected_language['confidenceScore']}")
-            return (detected_language['name'], detected_language['confidenceScore'])
+            logger.debug("Detected language: %s with confidence %s", language, confidence)
+            if self.cache:
+                self.cache.set("languages", text, [language, confidence])
+            return (language, confidence)
             
+        except AdmissionRejectedError:
+            raise  # Shed calls are answered by the agent's local fallback
         except Exception as e:
             logger.error(f"Error detecting language: {str(e)}")
+            mark_degraded()
             return ("en", 0.0)  # Default to English with zero confidence on error
 
+    @STAGE_SECONDS.labels(stage="sentiment").time()
     def analyze_sentiment(self, text: str) -> Tuple[str, float]:
         """
         Analyze the sentiment of the provided text
@@ -118,44 +481,38 @@ class CognitiveServicesClient:
         Returns:
             A tuple containing (sentiment, confidence_score)
             sentiment is one of: positive, neutral, negative
+
+        Raises:
+            AdmissionRejectedError: If the call was shed to protect the Azure quota or budget
         """
         if not self.api_key or not self.endpoint:
             logger.warning("Azure Cognitive Services not configured, skipping sentiment analysis")
             return ("neutral", 0.5)  # Default to neutral
             
+        cached = self.cache.get("sentiment", text) if self.cache else None
+        if cached is not None:
+            return tuple(cached)
+            
         try:
-            # Construct the request
-            url = f"{self.endpoint}text/analytics/v3.1/sentiment"
-            headers = {
-                "Ocp-Apim-Subscription-Key": self.api_key,
-                "Content-Type": "application/json"
-            }
-            data = {
-                "documents": [
-                    {
-                        "id": "1",
-                        "text": text
-                    }
-                ]
-            }
-            
-            # Send the request
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()  # Raise exception for HTTP errors
+            # Send the request over the pooled session
+            result = self._post("sentiment", [{"id": "1", "text": text}])
             
             # Process the response
-            result = response.json()
-            document = result['documents'][0]
-            sentiment = document['sentiment']
-            score = max(document['confidenceScores'][sentiment], 0.5)  # Use the confidence of the detected sentiment
+            sentiment, score = parse_sentiment(result['documents'][0])
             
-            logger.debug(f"Detected sentiment: {sentiment} with confidence {score}")
+            logger.debug("Detected sentiment: %s with confidence %s", sentiment, score)
+            if self.cache:
+                self.cache.set("sentiment", text, [sentiment, score])
             return (sentiment, score)
             
+        except AdmissionRejectedError:
+            raise  # Shed calls are answered by the agent's local fallback
         except Exception as e:
             logger.error(f"Error analyzing sentiment: {str(e)}")
+            mark_degraded()
             return ("neutral", 0.5)  # Default to neutral on error
     
+    @STAGE_SECONDS.labels(stage="key_phrases").time()
     def extract_key_phrases(self, text: str) -> List[str]:
         """
         Extract key phrases from the provided text
@@ -165,38 +522,120 @@ class CognitiveServicesClient:
             
         Returns:
             A list of key phrases
+
+        Raises:
+            AdmissionRejectedError: If the call was shed to protect the Azure quota or budget
         """
         if not self.api_key or not self.endpoint:
             logger.warning("Azure Cognitive Services not configured, skipping key phrase extraction")
             return [text]  # Return the original text as a single phrase
             
+        cached = self.cache.get("keyPhrases", text) if self.cache else None
+        if cached is not None:
+            return cached
+            
         try:
-            # Construct the request
-            url = f"{self.endpoint}text/analytics/v3.1/keyPhrases"
-            headers = {
-                "Ocp-Apim-Subscription-Key": self.api_key,
-                "Content-Type": "application/json"
-            }
-            data = {
-                "documents": [
-                    {
-                        "id": "1",
-                        "text": text
-                    }
-                ]
-            }
-            
-            # Send the request
-            response = requests.post(url, headers=headers, json=data)
-            response.raise_for_status()  # Raise exception for HTTP errors
+            # Send the request over the pooled session
+            result = self._post("keyPhrases", [{"id": "1", "text": text}])
             
             # Process the response
-            result = response.json()
-            key_phrases = result['documents'][0]['keyPhrases']
+            key_phrases = parse_key_phrases(result['documents'][0])
             
-            logger.debug(f"Extracted key phrases: {key_phrases}")
+            logger.debug("Extracted key phrases: %s", key_phrases)
+            if self.cache:
+                self.cache.set("keyPhrases", text, key_phrases)
             return key_phrases
             
+        except AdmissionRejectedError:
+            raise  # Shed calls are answered by the agent's local fallback
         except Exception as e:
             logger.error(f"Error extracting key phrases: {str(e)}")
+            mark_degraded()
             return [text]  # Return the original text on error
+
+    def analyze(self, text: str) -> TextAnalysis:
+        """
+        Run language detection, key phrase extraction and sentiment analysis
+        on the provided text in a single concurrent exchange
+
+        The three operations are dispatched in parallel so the total latency
+        is that of the slowest call rather than the sum of all three. Each
+        operation keeps its own fallback value if it fails.
+
+        Args:
+            text: The text to analyze
+
+        Returns:
+            A TextAnalysis holding the results of all three operations
+
+        Raises:
+            AdmissionRejectedError: If any of the calls was shed
+        """
+        if not self.api_key or not self.endpoint:
+            # No network involved, so there is nothing to parallelize
+            language, language_confidence = self.detect_language(text)
+            sentiment, sentiment_score = self.analyze_sentiment(text)
+            return TextAnalysis(
+                language=language,
+                language_confidence=language_confidence,
+                key_phrases=self.extract_key_phrases(text),
+                sentiment=sentiment,
+                sentiment_score=sentiment_score,
+            )
+
+        # Each call runs in a copy of the caller's context so its spans join the caller's trace
+        language_future = self._executor.submit(contextvars.copy_context().run, self.detect_language, text)
+        key_phrases_future = self._executor.submit(contextvars.copy_context().run, self.extract_key_phrases, text)
+        sentiment_future = self._executor.submit(contextvars.copy_context().run, self.analyze_sentiment, text)
+
+        language, language_confidence = language_future.result()
+        sentiment, sentiment_score = sentiment_future.result()
+        return TextAnalysis(
+            language=language,
+            language_confidence=language_confidence,
+            key_phrases=key_phrases_future.result(),
+            sentiment=sentiment,
+            sentiment_score=sentiment_score,
+        )
+
+    def _post_quietly(self, operation: str, documents: List[Dict[str, str]], admitted: bool = False) -> Optional[Dict[str, Any]]:
+        """Like _post, but log failures and return None so one bad chunk cannot sink a batch"""
+        try:
+            with STAGE_SECONDS.labels(stage=STAGE_NAMES[operation]).time():
+                return self._post(operation, documents, admitted=admitted)
+        except Exception as e:
+            logger.error(f"Error calling Text Analytics {operation} for {len(documents)} documents: {str(e)}")
+            return None
+
+    def analyze_batch(self, texts: List[str]) -> List[TextAnalysis]:
+        """
+        Analyze many texts, packing them into as few multi-document requests as possible
+
+        Texts are deduplicated and looked up in the cache first. The remaining
+        documents are split into chunks of MAX_DOCUMENTS_PER_REQUEST for each
+        operation, all chunks are sent concurrently, and the results are fanned
+        back out by document id. Documents that Azure rejects or that belong to
+        a failed request get the same fallback values as the single-text methods.
+
+        Args:
+            texts: The texts to analyze
+
+        Returns:
+            One TextAnalysis per text, in the same order
+
+        Raises:
+            AdmissionRejectedError: If the exchange was shed to protect the Azure quota or budget
+        """
+        if not self.api_key or not self.endpoint:
+            return [self.analyze(text) for text in texts]
+
+        results, chunks = plan_batch(texts, self.cache)
+
+        # The whole exchange is admitted or shed as one, so a batch never ends up half analyzed
+        if chunks:
+            self.admission.acquire(cost=len(chunks), records=batch_records(chunks))
+
+        contexts = [contextvars.copy_context() for _ in chunks]  # one per thread, for tracing
+        responses = self._executor.map(
+            lambda chunk, context: context.run(self._post_quietly, chunk[0], chunk[1], True), chunks, contexts)
+        return merge_batch(texts, results, chunks, responses, self.cache)
@@ -0,0 +1,115 @@
+"""
+Request deadlines for Urban Copilot
+Each question gets a time budget when it arrives: the client's
+X-Request-Timeout header, capped at REQUEST_TIMEOUT_MAX, or REQUEST_TIMEOUT.
+The deadline is carried in a context variable, so it follows the question
+into worker threads and tasks started with a copy of the caller's context.
+
+Every Azure call takes the time left as its timeout, and a stage that would
+start after the deadline is skipped with DeadlineExceeded. The agent then
+answers with what it has, so a client that gives up is not left behind by
+a server still working on its question.
+"""
+
+import os
+import time
+import contextlib
+import contextvars
+from typing import Iterator, Optional
+
+from app.core.metrics import DEADLINE_EXCEEDED
+
+# Header in which a client sends the seconds it will wait for an answer
+DEADLINE_HEADER = "X-Request-Timeout"
+
+# Shortest timeout handed to a network call, so a nearly spent budget never becomes "no timeout"
+MIN_TIMEOUT = 0.001
+
+_deadline: "contextvars.ContextVar[Optional[float]]" = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting, or while waiting on, work the request no longer has time for"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded at {stage}")
+        self.stage = stage
+
+
+def request_budget(header: Optional[str] = None) -> float:
+    """
+    Seconds a request may take
+
+    Args:
+        header: Value of the client's X-Request-Timeout header, if any
+
+    Returns:
+        The header's value if it is a positive number, capped at REQUEST_TIMEOUT_MAX,
+        otherwise REQUEST_TIMEOUT
+    """
+    default = float(os.environ.get("REQUEST_TIMEOUT", 25))
+    try:
+        seconds = float(header) if header else default
+    except ValueError:
+        seconds = default
+    if not 0 < seconds < float("inf"):
+        seconds = default
+    return min(seconds, float(os.environ.get("REQUEST_TIMEOUT_MAX", 60)))
+
+
+@contextlib.contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Give the work done inside the block, including on copied contexts, at most
+    'seconds'. An enclosing deadline that falls earlier still applies; None
+    leaves the current deadline as it is.
+    """
+    if seconds is None:
+        yield
+        return
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        try:
+            _deadline.reset(token)
+        except ValueError:
+            pass  # Closed from another context, e.g. an abandoned streaming generator
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline of the running code, or None if it has none"""
+    at = _deadline.get()
+    return None if at is None else max(0.0, at - time.monotonic())
+
+
+def expired() -> bool:
+    """Whether the running code is past its deadline"""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(stage: str):
+    """
+    Make sure there is time left to start a stage
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed
+    """
+    if expired():
+        exceeded(stage)
+
+
+def exceeded(stage: str):
+    """Count a stage skipped or cut short by the deadline and raise DeadlineExceeded for it"""
+    DEADLINE_EXCEEDED.labels(stage=stage).inc()
+    raise DeadlineExceeded(stage)
+
+
+def bound(seconds: float) -> float:
+    """A timeout of at most 'seconds' that also ends at the deadline"""
+    left = remaining()
+    return seconds if left is None else max(min(seconds, left), MIN_TIMEOUT)
+
@@ -0,0 +1,83 @@
+"""
+Background dependency probing for Urban Copilot
+Dependency checks run on a daemon thread at a fixed interval, and health
+endpoints serve the last snapshot instead of calling the dependencies on
+every probe.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class HealthProber:
+    """Runs dependency checks periodically and caches their results"""
+
+    def __init__(self, checks: Dict[str, Callable[[], str]], interval: Optional[float] = None):
+        """
+        Args:
+            checks: Callables returning "up" or "down", keyed by service name
+            interval: Seconds between two rounds of checks; defaults to HEALTH_CHECK_INTERVAL
+        """
+        self.checks = checks
+        self.interval = interval if interval is not None else float(os.environ.get("HEALTH_CHECK_INTERVAL", 30))
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the probing thread if it is not running (safe to call after a worker fork)"""
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            self.probe()
+            time.sleep(self.interval)
+
+    def probe(self):
+        """Run every check once and store the results"""
+        for name, check in self.checks.items():
+            start = time.perf_counter()
+            try:
+                status = check()
+            except Exception as e:
+                logger.error(f"Health check {name} failed: {e}")
+                status = "down"
+            result = {
+                "status": status,
+                "checked_at": datetime.now(timezone.utc).isoformat(),
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            }
+            with self._lock:
+                self._results[name] = result
+        self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        """True once every check has completed at least once"""
+        return self._ready.is_set()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        The latest result of each check, without running any check
+
+        Returns:
+            {name: {"status", "checked_at", "latency_ms"}}; checks that have not
+            run yet report status "unknown"
+        """
+        self.start()
+        with self._lock:
+            results = dict(self._results)
+        for name in self.checks:
+            results.setdefault(name, {"status": "unknown", "checked_at": None, "latency_ms": None})
+        return results
@@ -0,0 +1,276 @@
+"""
+Local text analysis for Urban Copilot
+A lightweight, in-process stand-in for the three Text Analytics operations:
+character-trigram language identification, a lexicon sentiment scorer and a
+rule-based key phrase extractor. Confident results are served locally in
+microseconds; anything else is escalated to Azure.
+"""
+
+import os
+import re
+import math
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.core.cognitive_services import TextAnalysis
+from app.core.metrics import ANALYSIS_PATH, STAGE_SECONDS
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Sample text used to build each language's trigram profile
+LANGUAGE_SAMPLES = {
+    "English": (
+        "the city is working to improve public transit and reduce traffic in the downtown area. "
+        "where can i find parking near the park? what are the opening hours of the library this weekend? "
+        "how do i report a broken street light or a pothole on my road? there is a lot of noise at night. "
+        "what are smart cities and how will they help people who live and work here with their daily life?"
+    ),
+    "Spanish": (
+        "la ciudad trabaja para mejorar el transporte público y reducir el tráfico en el centro. "
+        "dónde puedo encontrar estacionamiento cerca del parque? cuál es el horario de la biblioteca este fin de semana? "
+        "cómo puedo reportar una farola rota o un bache en mi calle? hay mucho ruido por la noche. "
+        "qué son las ciudades inteligentes y cómo ayudan a las personas que viven y trabajan aquí?"
+    ),
+    "French": (
+        "la ville travaille pour améliorer les transports publics et réduire la circulation dans le centre. "
+        "où puis-je trouver un parking près du parc? quels sont les horaires de la bibliothèque ce week-end? "
+        "comment signaler un lampadaire cassé ou un nid de poule dans ma rue? il y a beaucoup de bruit la nuit. "
+        "que sont les villes intelligentes et comment aident-elles les gens qui vivent et travaillent ici?"
+    ),
+    "German": (
+        "die stadt arbeitet daran, den öffentlichen nahverkehr zu verbessern und den verkehr in der innenstadt zu verringern. "
+        "wo kann ich einen parkplatz in der nähe des parks finden? wann hat die bibliothek am wochenende geöffnet? "
+        "wie melde ich eine kaputte straßenlaterne oder ein schlagloch in meiner straße? nachts ist es sehr laut. "
+        "was sind intelligente städte und wie helfen sie den menschen, die hier leben und arbeiten?"
+    ),
+    "Italian": (
+        "la città lavora per migliorare il trasporto pubblico e ridurre il traffico nel centro. "
+        "dove posso trovare un parcheggio vicino al parco? quali sono gli orari della biblioteca questo fine settimana? "
+        "come posso segnalare un lampione rotto o una buca nella mia strada? c'è molto rumore di notte. "
+        "cosa sono le città intelligenti e come aiutano le persone che vivono e lavorano qui?"
+    ),
+    "Portuguese": (
+        "a cidade trabalha para melhorar o transporte público e reduzir o trânsito no centro. "
+        "onde posso encontrar estacionamento perto do parque? qual é o horário da biblioteca neste fim de semana? "
+        "como posso informar um poste de luz quebrado ou um buraco na minha rua? há muito barulho à noite. "
+        "o que são cidades inteligentes e como elas ajudam as pessoas que vivem e trabalham aqui?"
+    ),
+}
+
+POSITIVE_WORDS = frozenset("""
+    good great excellent amazing awesome wonderful fantastic nice love loved like enjoy enjoyed happy glad
+    thanks thank grateful appreciate beautiful clean safe helpful friendly fast quick easy convenient
+    improve improved better best perfect pleased impressed recommend efficient reliable
+""".split())
+
+NEGATIVE_WORDS = frozenset("""
+    bad terrible awful horrible poor worst worse hate hated angry annoyed frustrated frustrating upset
+    dirty broken dangerous unsafe slow late delayed delay noisy noise crowded expensive problem problems
+    complaint complain issue issues pothole potholes crime trash garbage stuck fail failed failing useless
+    ridiculous disappointed disappointing unacceptable confusing rude
+""".split())
+
+NEGATIONS = frozenset("not no never none nobody nothing neither nor cannot without".split())
+
+# Words that separate key phrase candidates (question words and verbs carry no topic)
+STOP_WORDS = frozenset("""
+    a an the and or but if then so of to in on at by for with from about as into over under near
+    is are was were be been being am do does did doing have has had having will would can could
+    should shall may might must i me my we our you your he she it its they them their this that
+    these those there here what which who whom whose when where why how all any some each every
+    not no never very too also just please tell know find get need want like show give let
+    much many more most lot lots today tonight now any anything something
+""".split())
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)?|\d+|[^\w\s]", re.UNICODE)
+
+
+def _trigrams(text: str) -> Counter:
+    """Count the character trigrams of a text, with word boundaries marked by spaces"""
+    padded = f"  {' '.join(text.lower().split())}  "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(left: Counter, right: Dict[str, float], right_norm: float) -> float:
+    dot = sum(count * right.get(gram, 0.0) for gram, count in left.items())
+    left_norm = math.sqrt(sum(count * count for count in left.values()))
+    if not left_norm or not right_norm:
+        return 0.0
+    return dot / (left_norm * right_norm)
+
+
+class LocalAnalyzer:
+    """In-process heuristic analyzer returning TextAnalysis results with a confidence"""
+
+    def __init__(self):
+        self._profiles = {}
+        for language, sample in LANGUAGE_SAMPLES.items():
+            profile = _trigrams(sample)
+            self._profiles[language] = (profile, math.sqrt(sum(c * c for c in profile.values())))
+
+    def detect_language(self, text: str) -> Tuple[str, float]:
+        """
+        Identify the language of a text by trigram similarity
+
+        Returns:
+            A tuple containing (language_name, confidence_score); the confidence
+            reflects how far ahead the best language is of the runner-up
+        """
+        grams = _trigrams(text)
+        scores = sorted(
+            ((_cosine(grams, profile, norm), language) for language, (profile, norm) in self._profiles.items()),
+            reverse=True,
+        )
+        (best_score, best_language), (second_score, _) = scores[0], scores[1]
+        if best_score <= 0:
+            return ("en", 0.0)
+        # Relative lead of the winner over the runner-up; a lead of 70% or more counts as certain
+        margin = (best_score - second_score) / best_score
+        return (best_language, round(min(1.0, 0.3 + margin), 4))
+
+    def analyze_sentiment(self, text: str) -> Tuple[str, float]:
+        """
+        Score sentiment with a word lexicon; a negation flips the next three words
+
+        Returns:
+            A tuple containing (sentiment, confidence_score)
+        """
+        positive = negative = 0
+        negate_for = 0
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            if token in NEGATIONS or token.endswith("n't"):
+                negate_for = 3
+                continue
+            polarity = 1 if token in POSITIVE_WORDS else -1 if token in NEGATIVE_WORDS else 0
+            if negate_for:
+                polarity = -polarity
+                negate_for -= 1
+            if polarity > 0:
+                positive += 1
+            elif polarity < 0:
+                negative += 1
+
+        hits = positive + negative
+        if hits == 0:
+            return ("neutral", 0.9)  # Plain questions carry no sentiment words
+        if positive == negative:
+            return ("neutral", 0.5)
+        agreement = abs(positive - negative) / hits
+        confidence = 0.6 + 0.4 * agreement * min(1.0, hits / 2)
+        return ("positive" if positive > negative else "negative", round(confidence, 4))
+
+    def extract_key_phrases(self, text: str) -> List[str]:
+        """
+        Extract key phrases as runs of content words between stop words and punctuation
+
+        Returns:
+            The key phrases in order of appearance, without duplicates
+        """
+        phrases = []
+        current = []
+        for token in TOKEN_PATTERN.findall(text):
+            lowered = token.lower()
+            if lowered in STOP_WORDS or not token[0].isalnum() or len(token) < 2:
+                if current:
+                    phrases.append(" ".join(current))
+                    current = []
+            else:
+                current.append(token)
+        if current:
+            phrases.append(" ".join(current))
+        return list(dict.fromkeys(phrases))
+
+    def analyze(self, text: str) -> Tuple[TextAnalysis, float]:
+        """
+        Run all three local analyses
+
+        Returns:
+            The TextAnalysis and an overall confidence, the weakest of its parts
+        """
+        language, language_confidence = self.detect_language(text)
+        sentiment, sentiment_score = self.analyze_sentiment(text)
+        key_phrases = self.extract_key_phrases(text)
+        analysis = TextAnalysis(
+            language=language,
+            language_confidence=language_confidence,
+            key_phrases=key_phrases,
+            sentiment=sentiment,
+            sentiment_score=sentiment_score,
+        )
+        confidence = min(language_confidence, sentiment_score) if key_phrases else 0.0
+        if language != "English":
+            # The lexicon and stop words are English, so other languages are only half trusted
+            confidence /= 2
+        return analysis, confidence
+
+
+class LocalFastPath:
+    """
+    Decides, per text, whether the local analysis is good enough or Azure is needed.
+
+    Modes:
+    - "remote": always use Azure (the local analyzer is only used as a fallback)
+    - "local": never call Azure
+    - "hybrid": use the local result when its confidence reaches the threshold,
+      escalate to Azure otherwise
+    """
+
+    MODES = ("local", "remote", "hybrid")
+
+    def __init__(self, mode: Optional[str] = None, threshold: Optional[float] = None, analyzer: Optional[LocalAnalyzer] = None):
+        """
+        Args:
+            mode: "local", "remote" or "hybrid"; defaults to the ANALYZER_MODE setting
+            threshold: Minimum local confidence in hybrid mode; defaults to LOCAL_CONFIDENCE_THRESHOLD
+            analyzer: The local analyzer to use
+        """
+        self.mode = (mode or os.environ.get("ANALYZER_MODE", "remote")).lower()
+        if self.mode not in self.MODES:
+            raise ValueError(f"Unsupported ANALYZER_MODE: {self.mode}")
+        self.threshold = threshold if threshold is not None else float(os.environ.get("LOCAL_CONFIDENCE_THRESHOLD", 0.85))
+        self.analyzer = analyzer or LocalAnalyzer()
+        self._lock = threading.Lock()
+        self.counts = {"local": 0, "remote": 0, "escalated": 0}
+
+    def _count(self, path: str):
+        with self._lock:
+            self.counts[path] += 1
+        ANALYSIS_PATH.labels(path=path).inc()
+
+    def try_local(self, text: str) -> Optional[TextAnalysis]:
+        """
+        Answer locally if the mode and confidence allow it
+
+        Args:
+            text: The text to analyze
+
+        Returns:
+            The local TextAnalysis, or None if the text must go to Azure
+        """
+        if self.mode == "remote":
+            self._count("remote")
+            return None
+
+        with STAGE_SECONDS.labels(stage="local_analysis").time(), tracer.start_span("local_analysis") as span:
+            analysis, confidence = self.analyzer.analyze(text)
+            span.set_attribute("confidence", confidence)
+        if self.mode == "local" or confidence >= self.threshold:
+            self._count("local")
+            return analysis
+
+        self._count("escalated")
+        return None
+
+    def fallback(self, text: str) -> TextAnalysis:
+        """The local analysis of a text, whatever its confidence, for when Azure fails"""
+        analysis, _ = self.analyzer.analyze(text)
+        return analysis
+
+    def stats(self) -> Dict[str, object]:
+        """How often each path was taken"""
+        with self._lock:
+            counts = dict(self.counts)
+        return {"mode": self.mode, "threshold": self.threshold, **counts}
@@ -0,0 +1,489 @@
+"""
+Prometheus-style metrics for Urban Copilot
+Counters, gauges and histograms rendered in the Prometheus text exposition
+format, without depending on prometheus_client.
+
+Under gunicorn every worker process keeps its own values. When
+METRICS_MULTIPROC_DIR is set, each worker also writes its values to a file
+in that directory every METRICS_FLUSH_INTERVAL seconds, and a scrape served
+by any worker adds up the files of all workers. When a worker exits, e.g.
+recycled after max_requests, the gunicorn master folds its counters and
+histograms into one archive file and deletes its file, so the directory
+does not grow with every worker ever started. The directory should be
+emptied before the server starts.
+"""
+
+import os
+import json
+import time
+import atexit
+import bisect
+import asyncio
+import functools
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds for whole requests and for single stages
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# File in METRICS_MULTIPROC_DIR holding the values of exited workers
+ARCHIVE_FILE = "metrics_archive.json"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Timer:
+    """Observes the elapsed time into a histogram; usable as context manager or decorator (sync or async)"""
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._child.observe(time.perf_counter() - self._start)
+
+    def __call__(self, func):
+        child = self._child
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with _Timer(child):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(child):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dump(self) -> float:
+        return self.value
+
+    def reset(self):
+        with self._lock:
+            self.value = 0.0
+
+
+class _GaugeChild(_CounterChild):
+    def __init__(self):
+        super().__init__()
+        self.updated = 0.0  # wall-clock time of the last change, to find the latest value across processes
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+            self.updated = time.time()
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = float(value)
+            self.updated = time.time()
+
+    def reset(self):
+        with self._lock:
+            self.value = 0.0
+            self.updated = 0.0
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Time a block or function and observe the duration in seconds"""
+        return _Timer(self)
+
+    def dump(self) -> List[Any]:
+        with self._lock:
+            return [list(self.counts), self.sum]
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.sum = 0.0
+
+
+class _Metric:
+    """A named family of samples, one child per combination of label values"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), registry: "Optional[MetricsRegistry]" = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        """Return the child holding the samples of one combination of label values"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def dump(self) -> Dict[Tuple[str, ...], Any]:
+        """Current value of every child, keyed by label values"""
+        with self._lock:
+            children = list(self._children.items())
+        return {key: child.dump() for key, child in children}
+
+    def reset(self):
+        """Zero every child in place, so children held by callers stay valid"""
+        with self._lock:
+            children = list(self._children.values())
+        for child in children:
+            child.reset()
+
+
+class Counter(_Metric):
+    """Monotonically increasing count; summed across worker processes"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down. Across live worker processes it is summed, or
+    with multiprocess_mode "latest", the value set most recently by any of them
+    is reported: for values every worker reads from a shared source.
+    """
+
+    kind = "gauge"
+    MULTIPROCESS_MODES = ("sum", "latest")
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 registry: "Optional[MetricsRegistry]" = None, multiprocess_mode: str = "sum"):
+        if multiprocess_mode not in self.MULTIPROCESS_MODES:
+            raise ValueError(f"Unknown multiprocess mode: {multiprocess_mode}")
+        self.multiprocess_mode = multiprocess_mode
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def dump(self) -> Dict[Tuple[str, ...], Any]:
+        """Current value of every child, with the time it was set in "latest" mode"""
+        if self.multiprocess_mode == "sum":
+            return super().dump()
+        with self._lock:
+            children = list(self._children.items())
+        return {key: [child.value, child.updated] for key, child in children}
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS, registry: "Optional[MetricsRegistry]" = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """Holds the metrics of a process and renders them, aggregated across workers if configured"""
+
+    def __init__(self, multiproc_dir: Optional[str] = None, flush_interval: Optional[float] = None):
+        """
+        Args:
+            multiproc_dir: Directory shared by all worker processes; defaults to METRICS_MULTIPROC_DIR
+            flush_interval: Seconds between two writes of this process's values; defaults to METRICS_FLUSH_INTERVAL
+        """
+        self.multiproc_dir = multiproc_dir if multiproc_dir is not None else os.environ.get("METRICS_MULTIPROC_DIR", "")
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.environ.get("METRICS_FLUSH_INTERVAL", 1))
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def start(self):
+        """
+        Prepare the registry for the current process; cheap enough to call on every request
+
+        In a freshly forked worker the values inherited from the parent are
+        dropped, and in multiprocess mode the flushing thread is started.
+        """
+        pid = os.getpid()
+        if pid == self._pid and (not self.multiproc_dir or (self._thread is not None and self._thread.is_alive())):
+            return
+        with self._lock:
+            if pid != self._pid:
+                for metric in self._metrics.values():
+                    metric.reset()
+                self._pid = pid
+            if self.multiproc_dir and (self._thread is None or not self._thread.is_alive()):
+                os.makedirs(self.multiproc_dir, exist_ok=True)
+                self._thread = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning(f"Failed to write metrics to {self.multiproc_dir}: {e}")
+
+    def _dump(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: {json.dumps(list(key)): value for key, value in metric.dump().items()} for metric in metrics}
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.multiproc_dir, f"metrics_{pid}.json")
+
+    @staticmethod
+    def _write(path: str, values: Dict[str, Dict[str, Any]]):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(values, f)
+        os.replace(tmp_path, path)  # readers never see a half-written file
+
+    def flush(self):
+        """Write this process's values to its file in the shared directory"""
+        if not self.multiproc_dir:
+            return
+        self._write(self._path(os.getpid()), self._dump())
+
+    def mark_process_dead(self, pid: int):
+        """
+        Fold the counters and histograms of an exited worker into the archive
+        file and delete the worker's file. Call it from one process only, such
+        as the gunicorn master in its child_exit hook.
+        """
+        if not self.multiproc_dir:
+            return
+        path = self._path(pid)
+        try:
+            with open(path) as f:
+                dump = json.load(f)
+        except FileNotFoundError:
+            return  # the worker never flushed
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable metrics file of worker {pid}: {e}")
+            dump = {}
+        archive_path = os.path.join(self.multiproc_dir, ARCHIVE_FILE)
+        archive: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(archive_path) as f:
+                archive = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Replacing unreadable metrics archive: {e}")
+        self._merge(archive, dump, alive=False)
+        self._write(archive_path, archive)
+        os.remove(path)
+
+    def _collect(self) -> Dict[str, Dict[str, Any]]:
+        """Values of this process, plus those of the other workers in multiprocess mode"""
+        own_pid = os.getpid()
+        dumps = [(own_pid, self._dump())]
+        if self.multiproc_dir and os.path.isdir(self.multiproc_dir):
+            for filename in os.listdir(self.multiproc_dir):
+                if not (filename.startswith("metrics_") and filename.endswith(".json")):
+                    continue
+                name = filename[len("metrics_"):-len(".json")]
+                pid = int(name) if name.isdigit() else None  # None for the archive of exited workers
+                if pid == own_pid:
+                    continue
+                try:
+                    with open(os.path.join(self.multiproc_dir, filename)) as f:
+                        dumps.append((pid, json.load(f)))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable metrics file {filename}: {e}")
+
+        merged: Dict[str, Dict[str, Any]] = {}
+        for pid, dump in dumps:
+            self._merge(merged, dump, alive=pid is not None and (pid == own_pid or _pid_alive(pid)))
+        return merged
+
+    def _merge(self, merged: Dict[str, Dict[str, Any]], dump: Dict[str, Dict[str, Any]], alive: bool):
+        """Add the values of one process, or of the archive, to 'merged'"""
+        for name, samples in dump.items():
+            metric = self._metrics.get(name)
+            if metric is None or (metric.kind == "gauge" and not alive):
+                continue  # gauges of exited workers no longer describe anything
+            target = merged.setdefault(name, {})
+            latest = metric.kind == "gauge" and metric.multiprocess_mode == "latest"
+            for key, value in samples.items():
+                if latest:
+                    value = value if isinstance(value, list) else [value, 0.0]
+                    if key not in target or value[1] >= target[key][1]:
+                        target[key] = value
+                elif metric.kind == "histogram":
+                    counts, total = target.get(key, [[0] * len(value[0]), 0.0])
+                    target[key] = [[a + b for a, b in zip(counts, value[0])], total + value[1]]
+                else:
+                    target[key] = target.get(key, 0.0) + value
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        merged = self._collect()
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for key, value in sorted(merged.get(metric.name, {}).items()):
+                label_values = json.loads(key)
+                labels = _format_labels(metric.labelnames, label_values)
+                if metric.kind == "gauge" and isinstance(value, list):
+                    value = value[0]  # "latest" mode: [value, time set]
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{labels} {_format_value(value)}")
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    bucket_labels = _format_labels(metric.labelnames + ("le",), label_values + [_format_value(bound)])
+                    lines.append(f"{metric.name}_bucket{bucket_labels} {_format_value(cumulative)}")
+                lines.append(f"{metric.name}_sum{labels} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{labels} {_format_value(cumulative)}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the application
+REGISTRY = MetricsRegistry()
+
+# HTTP traffic
+REQUESTS = Counter("urban_http_requests_total", "HTTP requests served", ("method", "route", "status"))
+REQUESTS_IN_PROGRESS = Gauge("urban_http_requests_in_progress", "HTTP requests being served", ("method", "route"))
+REQUEST_SECONDS = Histogram("urban_http_request_duration_seconds", "HTTP request latency in seconds", ("method", "route"))
+RATE_LIMITED = Counter("urban_rate_limited_requests_total", "Requests rejected by the rate limiter", ("route",))
+
+# Question answering
+STAGE_SECONDS = Histogram("urban_stage_duration_seconds", "Time spent in each stage of answering a question, in seconds",
+                          ("stage",), buckets=STAGE_BUCKETS)
+ANALYSIS_PATH = Counter("urban_analysis_path_total", "Analyses by path: local, remote or escalated to Azure", ("path",))
+STREAM_FIRST_EVENT_SECONDS = Histogram("urban_stream_first_event_seconds",
+                                       "Time from receiving a streamed question to its first event, in seconds")
+AGENT_REQUESTS = Counter("urban_agent_requests_total",
+                         "Questions handled per agent, by outcome: ok, error, timeout, busy or cancelled",
+                         ("agent", "outcome"))
+AGENT_SECONDS = Histogram("urban_agent_duration_seconds", "Time an agent took to answer, waiting included, in seconds",
+                          ("agent",))
+AGENT_IN_FLIGHT = Gauge("urban_agent_questions_in_flight", "Questions an agent is answering or has queued", ("agent",))
+DEADLINE_EXCEEDED = Counter("urban_deadline_exceeded_total",
+                            "Stages skipped or cut short because the request ran out of time", ("stage",))
+MICRO_BATCH_SIZE = Histogram("urban_micro_batch_size", "Texts per micro-batch sent to Azure",
+                             buckets=(1, 2, 3, 5, 8, 10, 25, 50, 100))
+
+# Dependencies
+AZURE_REQUESTS = Counter("urban_azure_requests_total", "Text Analytics calls by operation and HTTP status",
+                         ("operation", "status"))
+LOG_RECORDS_DROPPED = Counter("urban_log_records_dropped_total", "Log records dropped because the log queue was full")
+CACHE_REQUESTS = Counter("urban_analysis_cache_requests_total", "Analysis cache operations by result",
+                         ("operation", "result"))
+
+# Azure quota and budget (admission control)
+ADMISSION_DECISIONS = Counter("urban_admission_decisions_total",
+                              "Text Analytics exchanges admitted or shed, by priority and decision", ("priority", "decision"))
+ADMISSION_WAIT_SECONDS = Histogram("urban_admission_wait_seconds", "Time spent waiting for Azure quota, in seconds",
+                                   ("priority",), buckets=STAGE_BUCKETS)
+AZURE_TEXT_RECORDS = Counter("urban_azure_text_records_total", "Billable text records sent to Azure", ("priority",))
+# Summed over the workers' shares of the quota; create_admission_controller switches them to "latest"
+# when the workers share one quota through ADMISSION_STORAGE_URI and each reports the same cluster-wide value
+AZURE_QUOTA_TOKENS = Gauge("urban_azure_quota_tokens", "Azure transactions that may be sent right now without waiting")
+AZURE_RECORD_BUDGET_REMAINING = Gauge("urban_azure_record_budget_remaining",
+                                      "Text records left in today's budget, when AZURE_DAILY_RECORD_BUDGET is set")
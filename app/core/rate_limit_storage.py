@@ -0,0 +1,159 @@
+"""
+Shared rate limit storage for Urban Copilot
+A SQLite storage backend for the 'limits' package, so every gunicorn worker
+on a host counts against the same limits without running Redis. Importing
+this module registers the "sqlite://" storage scheme, e.g.
+
+    RATELIMIT_STORAGE_URI=sqlite:///var/run/urban-copilot/ratelimit.db
+
+Each check is a single SQLite transaction, for both the fixed-window and the
+moving-window strategies.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Tuple
+
+from limits.storage import MovingWindowSupport, Storage
+
+# Run a sweep of expired rows after this many writes
+PURGE_EVERY = 1000
+
+# Moving-window entries older than this are swept even if their key is never hit again (longest supported window)
+MAX_WINDOW_SECONDS = 86400
+
+
+class SQLiteStorage(Storage, MovingWindowSupport):
+    """Rate limit counters and moving windows kept in a SQLite database file"""
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        """
+        Args:
+            uri: "sqlite:///absolute/path.db" or "sqlite://relative/path.db"
+            wrap_exceptions: Whether to wrap SQLite errors in limits.errors.StorageError
+        """
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        self.path = uri[len("sqlite://"):]
+        if not self.path:
+            raise ValueError("The sqlite:// rate limit storage needs a database path")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._pid = None
+        self._connection = None
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection must not be shared with the parent process after a fork
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")  # counters need no fsync per hit
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_counters "
+                "(key TEXT PRIMARY KEY, value INTEGER, expires_at REAL)"
+            )
+            self._connection.execute("CREATE TABLE IF NOT EXISTS rate_limit_entries (key TEXT, at REAL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS rate_limit_entries_key ON rate_limit_entries (key, at)")
+        return self._connection
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _maybe_purge(self, connection: sqlite3.Connection, now: float):
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            connection.execute("DELETE FROM rate_limit_counters WHERE expires_at <= ?", (now,))
+            connection.execute("DELETE FROM rate_limit_entries WHERE at <= ?", (now - MAX_WINDOW_SECONDS,))
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        """Increment a fixed-window counter, starting a new window if the last one expired"""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            value = connection.execute(
+                "INSERT INTO rate_limit_counters (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET "
+                "value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END, "
+                "expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END "
+                "RETURNING value",
+                (key, amount, now + expiry, now, now),
+            ).fetchone()[0]
+            self._maybe_purge(connection, now)
+            return value
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM rate_limit_counters WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT expires_at FROM rate_limit_counters WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return row[0] if row else now
+
+    def acquire_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        """Record 'amount' hits in the moving window unless that would exceed the limit"""
+        if amount > limit:
+            return False
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            # BEGIN IMMEDIATE takes the write lock up front, so workers cannot interleave the count and insert
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.execute("DELETE FROM rate_limit_entries WHERE key = ? AND at <= ?", (key, now - expiry))
+                count = connection.execute("SELECT COUNT(*) FROM rate_limit_entries WHERE key = ?", (key,)).fetchone()[0]
+                acquired = count + amount <= limit
+                if acquired:
+                    connection.executemany("INSERT INTO rate_limit_entries VALUES (?, ?)", [(key, now)] * amount)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            self._maybe_purge(connection, now)
+        return acquired
+
+    def get_moving_window(self, key: str, limit: int, expiry: int) -> Tuple[float, int]:
+        """
+        Returns:
+            (time of the oldest entry in the window, number of entries in the window)
+        """
+        now = time.time()
+        with self._lock:
+            oldest, count = self._connect().execute(
+                "SELECT MIN(at), COUNT(*) FROM rate_limit_entries WHERE key = ? AND at > ?", (key, now - expiry)
+            ).fetchone()
+        return (oldest if count else now, count)
+
+    def check(self) -> bool:
+        try:
+            with self._lock:
+                self._connect().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        with self._lock:
+            connection = self._connect()
+            cleared = connection.execute("DELETE FROM rate_limit_counters").rowcount
+            cleared += connection.execute("DELETE FROM rate_limit_entries").rowcount
+        return cleared
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM rate_limit_counters WHERE key = ?", (key,))
+            connection.execute("DELETE FROM rate_limit_entries WHERE key = ?", (key,))
@@ -0,0 +1,49 @@
+"""
+Server-Sent Events for Urban Copilot
+Frames the staged events of a streamed answer (analysis results as each
+becomes ready, then the answer in chunks) in the text/event-stream format.
+"""
+
+import re
+import json
+from typing import Any, Dict, Iterator, List, Tuple
+
+from app.core.cognitive_services import TextAnalysis
+
+MEDIA_TYPE = "text/event-stream"
+
+# Headers that keep proxies from buffering or caching a stream
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Words per answer chunk
+CHUNK_WORDS = 8
+
+_WORDS = re.compile(r"\S+\s*")
+
+
+def format_event(event: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def chunk_text(text: str, words: int = CHUNK_WORDS) -> List[str]:
+    """Split text into chunks of a few words that concatenate back to the original"""
+    tokens = _WORDS.findall(text)
+    leading = text[:len(text) - len(text.lstrip())]
+    chunks = ["".join(tokens[start:start + words]) for start in range(0, len(tokens), words)]
+    if chunks:
+        chunks[0] = leading + chunks[0]
+    return chunks or [text]
+
+
+def analysis_events(analysis: TextAnalysis, source: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    The three analysis events of an analysis that is complete at once
+
+    Args:
+        analysis: Language, key phrases and sentiment of a question
+        source: Where the analysis came from: "azure", "local" or "fallback"
+    """
+    yield "language", {"language": analysis.language, "confidence": analysis.language_confidence, "source": source}
+    yield "key_phrases", {"key_phrases": analysis.key_phrases, "source": source}
+    yield "sentiment", {"sentiment": analysis.sentiment, "score": analysis.sentiment_score, "source": source}
@@ -0,0 +1,219 @@
+"""
+Topic matching for Urban Copilot
+Compiles the topic table into an Aho-Corasick automaton once, so matching
+key phrases costs time proportional to the phrase length however many topics
+and synonyms the table holds. The table is loaded from a JSON data file and
+reloaded automatically when the file changes.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Runs of characters that separate words, for whole-word matching
+WORD_SEPARATORS = re.compile(r"\W+")
+
+# Topic table shipped with the application
+DEFAULT_TOPICS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "topics.json")
+
+
+@dataclass(frozen=True)
+class Topic:
+    """A topic, the patterns (name and synonyms) that select it, and its canned response"""
+
+    name: str
+    response: str
+    patterns: List[str] = field(default_factory=list)
+
+
+class TopicIndex:
+    """
+    Immutable multi-pattern matcher over a topic table.
+
+    A phrase matches a topic when any of the topic's patterns occurs in the
+    lowercased phrase, or with whole_words, occurs there as whole words. When
+    several topics match, the one listed first in the table wins.
+    """
+
+    def __init__(self, topics: Iterable[Topic], version: str = "", whole_words: bool = False):
+        """
+        Args:
+            topics: Topics in priority order
+            version: Identifier of the table content, e.g. a hash of the data file
+            whole_words: Only match patterns starting and ending at word boundaries, so "bus" is not found in "business"
+        """
+        self.topics = list(topics)
+        self.version = version
+        self.whole_words = whole_words
+
+        # Trie transitions, failure links, and the best (lowest) topic priority ending at each state
+        self._goto = [{}]
+        self._fail = [0]
+        self._best: List[Optional[int]] = [None]
+
+        for priority, topic in enumerate(self.topics):
+            for pattern in topic.patterns or [topic.name]:
+                state = 0
+                for char in self._normalize(pattern):
+                    next_state = self._goto[state].get(char)
+                    if next_state is None:
+                        next_state = len(self._goto)
+                        self._goto.append({})
+                        self._fail.append(0)
+                        self._best.append(None)
+                        self._goto[state][char] = next_state
+                    state = next_state
+                if self._best[state] is None:
+                    self._best[state] = priority
+
+        # Breadth-first pass to set failure links and inherit matches from suffixes
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self._goto[state].items():
+                pending.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                inherited = self._best[self._fail[next_state]]
+                if inherited is not None and (self._best[next_state] is None or inherited < self._best[next_state]):
+                    self._best[next_state] = inherited
+
+    def _normalize(self, text: str) -> str:
+        """
+        Lowercase a pattern or phrase; for whole-word matching, also turn each run
+        of separators into one space and pad the text with spaces, so that every
+        word, including the first and the last, is delimited by spaces
+        """
+        text = text.lower()
+        if self.whole_words:
+            text = f" {WORD_SEPARATORS.sub(' ', text).strip()} "
+        return text
+
+    @classmethod
+    def from_file(cls, path: str) -> "TopicIndex":
+        """
+        Compile the topic table stored in a JSON file
+
+        Args:
+            path: File holding {"topics": [{"name", "response", "patterns"}]}
+
+        Returns:
+            The compiled TopicIndex, versioned by a hash of the file content
+        """
+        with open(path, "rb") as f:
+            content = f.read()
+        data = json.loads(content)
+        topics = [
+            Topic(name=item["name"], response=item["response"], patterns=item.get("patterns", [item["name"]]))
+            for item in data["topics"]
+        ]
+        return cls(topics, version=hashlib.sha256(content).hexdigest()[:12])
+
+    def match_phrase(self, phrase: str) -> Optional[Topic]:
+        """Return the highest-priority topic occurring in a phrase, if any"""
+        goto, fail, best_at = self._goto, self._fail, self._best
+        state = 0
+        best = None
+        for char in self._normalize(phrase):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            priority = best_at[state]
+            if priority is not None and (best is None or priority < best):
+                best = priority
+                if best == 0:
+                    break
+        return self.topics[best] if best is not None else None
+
+    def match(self, phrases: Iterable[str]) -> Optional[Topic]:
+        """Return the topic of the first phrase that matches any topic"""
+        for phrase in phrases:
+            topic = self.match_phrase(phrase)
+            if topic is not None:
+                return topic
+        return None
+
+
+class TopicTable:
+    """
+    Reloadable holder of the compiled TopicIndex.
+
+    Every worker process checks the data file's modification time at most
+    once per check_interval and swaps in a freshly compiled index when it
+    changes, so topic updates need no restart.
+    """
+
+    def __init__(self, path: Optional[str] = None, check_interval: Optional[float] = None):
+        """
+        Args:
+            path: Topic data file; defaults to TOPICS_FILE or the bundled table
+            check_interval: Seconds between file modification checks; defaults to TOPICS_RELOAD_INTERVAL
+        """
+        self.path = path or os.environ.get("TOPICS_FILE", DEFAULT_TOPICS_FILE)
+        self.check_interval = check_interval if check_interval is not None else float(os.environ.get("TOPICS_RELOAD_INTERVAL", 5))
+        self._lock = threading.Lock()
+        self._mtime = os.path.getmtime(self.path)
+        self._index = TopicIndex.from_file(self.path)
+        self._checked_at = time.monotonic()
+        self._listeners: List[Callable[[TopicIndex], None]] = []
+        logger.info(f"Loaded {len(self._index.topics)} topics from {self.path}")
+
+    @property
+    def index(self) -> TopicIndex:
+        """The current compiled index, reloaded first if the data file changed"""
+        if self.check_interval >= 0 and time.monotonic() - self._checked_at >= self.check_interval:
+            self._check_for_changes()
+        return self._index
+
+    @property
+    def version(self) -> str:
+        """Identifier of the current table content"""
+        return self.index.version
+
+    def add_reload_listener(self, callback: Callable[[TopicIndex], None]):
+        """Call back with the new index every time the table is reloaded, e.g. to drop cached answers"""
+        self._listeners.append(callback)
+
+    def _check_for_changes(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError as e:
+                logger.warning(f"Cannot stat topic file {self.path}: {e}")
+                return
+            if mtime != self._mtime:
+                self._reload_locked(mtime)
+
+    def reload(self) -> TopicIndex:
+        """Recompile the index from the data file now"""
+        with self._lock:
+            self._reload_locked(os.path.getmtime(self.path))
+        return self._index
+
+    def _reload_locked(self, mtime: float):
+        try:
+            index = TopicIndex.from_file(self.path)
+        except (OSError, ValueError, KeyError) as e:
+            # Keep serving the previous table if the new file is broken
+            logger.error(f"Failed to reload topics from {self.path}: {e}")
+            return
+        self._index = index
+        self._mtime = mtime
+        logger.info(f"Reloaded {len(index.topics)} topics from {self.path} (version {index.version})")
+        for callback in self._listeners:
+            try:
+                callback(index)
+            except Exception as e:
+                logger.error(f"Topic reload listener failed: {e}")
@@ -0,0 +1,380 @@
+"""
+Lightweight request tracing for Urban Copilot
+Spans record where the time of a request went: the web framework, the
+agent, each Text Analytics call and response generation. Trace context is
+read from and passed on in W3C 'traceparent' headers, and sampled spans are
+exported in the background to a JSON lines file or to an OTLP/HTTP
+collector.
+
+Only a TRACE_SAMPLE_RATIO share of the requests that arrive without a
+sampling decision is recorded; the others get a trace id for their
+response header and nothing else.
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+from typing import Any, Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = "traceparent"
+TRACE_ID_HEADER = "X-Trace-Id"
+
+# OTLP span kinds
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("current_span", default=None)
+
+
+def _new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+def parse_traceparent(header: Optional[str]):
+    """
+    Parse a W3C traceparent header
+
+    Returns:
+        (trace_id, parent_span_id, sampled), or None if the header is missing or malformed
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class Span:
+    """A timed operation within a trace; used as a context manager that makes it the current span"""
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 kind: str = "internal", attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.attributes = dict(attributes or {}) if sampled else {}
+        self.status = "ok"
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        self._token = None
+
+    @property
+    def traceparent(self) -> str:
+        """This span as a W3C traceparent header value"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException):
+        self.status = "error"
+        self.set_attribute("exception.type", type(exc).__name__)
+        self.set_attribute("exception.message", str(exc))
+
+    def end(self):
+        if self.end_time is None:
+            self.end_time = time.time_ns()
+            if self.sampled:
+                self.tracer.on_end(self)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_exception(exc)
+        self.end()
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": round((self.end_time - self.start_time) / 1e6, 3) if self.end_time else None,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stand-in for the children of unsampled spans; costs next to nothing"""
+
+    sampled = False
+    trace_id = ""
+    span_id = ""
+    traceparent = ""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class FileExporter:
+    """Appends spans to a file, one JSON object per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict()) + "\n")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPExporter:
+    """Sends spans to an OpenTelemetry collector using OTLP over HTTP with JSON encoding"""
+
+    def __init__(self, endpoint: str, service_name: str = "urban-copilot", timeout: float = 5.0):
+        """
+        Args:
+            endpoint: The collector's traces URL, e.g. http://localhost:4318/v1/traces
+            service_name: Reported as the service.name resource attribute
+            timeout: Seconds to wait for the collector
+        """
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def export(self, spans: List[Span]):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "app.core.tracing"},
+                "spans": [{
+                    "traceId": span.trace_id,
+                    "spanId": span.span_id,
+                    "parentSpanId": span.parent_id or "",
+                    "name": span.name,
+                    "kind": SPAN_KINDS.get(span.kind, 1),
+                    "startTimeUnixNano": str(span.start_time),
+                    "endTimeUnixNano": str(span.end_time),
+                    "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+                    "status": {"code": 2 if span.status == "error" else 1},
+                } for span in spans],
+            }],
+        }]}
+        response = self.session.post(self.endpoint, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class BatchSpanProcessor:
+    """Queues finished spans and exports them in batches from a background thread"""
+
+    def __init__(self, exporter, max_queue_size: int = 2048, max_batch_size: int = 512, schedule_delay: float = 1.0):
+        """
+        Args:
+            exporter: Object with an export(spans) method
+            max_queue_size: Spans waiting for export beyond this are dropped
+            max_batch_size: Largest number of spans passed to one export call
+            schedule_delay: Longest time in seconds a span waits before export
+        """
+        self.exporter = exporter
+        self.max_batch_size = max_batch_size
+        self.schedule_delay = schedule_delay
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.dropped_spans = 0
+
+    def on_end(self, span: Span):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped_spans += 1  # never block a request on tracing
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.schedule_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._export(batch)
+
+    def _export(self, batch: List[Span]):
+        with self._export_lock:
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                logger.warning(f"Failed to export {len(batch)} spans: {e}")
+
+    def force_flush(self):
+        """Export every queued span now, on the calling thread"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._export(batch)
+
+
+class Tracer:
+    """Creates spans, decides which traces are sampled and hands finished spans to the processor"""
+
+    def __init__(self, processor: Optional[BatchSpanProcessor] = None, sample_ratio: float = 1.0):
+        """
+        Args:
+            processor: Where sampled spans go; None disables recording (trace ids still propagate)
+            sample_ratio: Share of new traces that are recorded, from 0.0 to 1.0
+        """
+        self.processor = processor
+        self.sample_ratio = sample_ratio
+
+    def on_end(self, span: Span):
+        if self.processor is not None:
+            self.processor.on_end(span)
+
+    def start_span(self, name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None,
+                   traceparent: Optional[str] = None):
+        """
+        Start a span as a child of the current span, or as a new root
+
+        Args:
+            name: What the span measures, e.g. "process_urban_question"
+            kind: "internal", "server" or "client"
+            attributes: Details recorded with the span if it is sampled
+            traceparent: Incoming header continuing a trace from another service; only used for roots
+
+        Returns:
+            The span; use it in a with statement to make it current and end it
+        """
+        parent = _current_span.get()
+        if parent is not None:
+            if not parent.sampled:
+                return NOOP_SPAN
+            return Span(self, name, parent.trace_id, parent.span_id, True, kind, attributes)
+
+        context = parse_traceparent(traceparent)
+        if context is not None:
+            trace_id, parent_id, sampled = context  # the caller made the sampling decision
+        else:
+            trace_id, parent_id = _new_trace_id(), None
+            sampled = random.random() < self.sample_ratio
+        return Span(self, name, trace_id, parent_id, sampled and self.processor is not None, kind, attributes)
+
+    def traced(self, name: str, kind: str = "internal"):
+        """Decorator running a function (sync or async) inside a span"""
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.start_span(name, kind):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.start_span(name, kind):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def current_span():
+    """The span of the running code, or None outside any trace"""
+    return _current_span.get()
+
+
+def create_tracer() -> Tracer:
+    """
+    Build the tracer selected by the TRACE_* settings
+
+    TRACE_EXPORTER is "none" (default), "file" (TRACE_FILE) or "otlp"
+    (TRACE_OTLP_ENDPOINT); TRACE_SAMPLE_RATIO sets the share of new traces
+    that are recorded.
+    """
+    exporter_type = os.environ.get("TRACE_EXPORTER", "none").lower()
+    sample_ratio = float(os.environ.get("TRACE_SAMPLE_RATIO", 0.1))
+
+    if exporter_type == "file":
+        exporter = FileExporter(os.environ.get("TRACE_FILE", "logs/traces.jsonl"))
+    elif exporter_type == "otlp":
+        exporter = OTLPExporter(os.environ.get("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"))
+    elif exporter_type in ("none", ""):
+        return Tracer(None, sample_ratio)
+    else:
+        raise ValueError(f"Unsupported TRACE_EXPORTER: {exporter_type}")
+    return Tracer(BatchSpanProcessor(exporter), sample_ratio)
+
+
+# Process-wide tracer used by the application
+tracer = create_tracer()
@@ -1,17 +1,30 @@
 """
 Rate limiting configuration for Urban Copilot API.
 This prevents abuse and ensures fair usage of the API.
+
+Limits, strategy and storage come from the environment. Use a shared
+storage (redis:// across hosts, sqlite:// on a single host) so that every
+gunicorn worker and replica counts against the same limits.
 """
 
+import os
 from flask import request
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from app.core import rate_limit_storage  # noqa: F401  (registers the sqlite:// storage scheme)
+
+# Limit of the question endpoints, e.g. "10 per minute"
+ASK_LIMIT = os.environ.get("RATELIMIT_ASK", "10 per minute")
+ASK_BATCH_LIMIT = os.environ.get("RATELIMIT_ASK_BATCH", "30 per minute")
 
 # Initialize the rate limiter
 limiter = Limiter(
     key_func=get_remote_address,  # Rate limit by IP address
-    default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://",  # In-memory storage for development
+    default_limits=[os.environ.get("RATELIMIT_DEFAULT", "200 per day;50 per hour")],
+    storage_uri=os.environ.get("RATELIMIT_STORAGE_URI", "memory://"),  # Per-process memory unless a shared storage is set
+    strategy=os.environ.get("RATELIMIT_STRATEGY", "moving-window"),  # No burst of twice the limit at window edges
+    swallow_errors=True,  # A storage outage lets requests through instead of failing them
+    in_memory_fallback_enabled=True,  # ...and falls back to per-process limits until the storage is back
 )
 
 def configure_limiter(app):
@@ -23,8 +36,15 @@ def configure_limiter(app):
     """
     limiter.init_app(app)
     
-    # Apply specific rate limits to endpoints that are resource-intensive
-    limiter.limit("10 per minute")(app.view_functions['urban.ask_urban_question'])
+    # Apply specific rate limits to endpoints that are resource-intensive.
+    # A route with its own limit is not checked against the default limits, so each
+    # question costs a single storage operation (one round trip with Redis).
+    # The decorated function performs the check, so it must replace the registered view.
+    for endpoint, limit in (('urban.ask_urban_question', ASK_LIMIT), ('urban.ask_urban_questions_batch', ASK_BATCH_LIMIT)):
+        app.view_functions[endpoint] = limiter.limit(limit)(app.view_functions[endpoint])
     
     # The health check and docs endpoints don't need strict rate limiting
     limiter.exempt(app.view_functions['urban.health_check'])
+    limiter.exempt(app.view_functions['urban.liveness_check'])
+    limiter.exempt(app.view_functions['urban.readiness_check'])
+    limiter.exempt(app.view_functions['metrics'])
@@ -1,70 +1,285 @@
 """
 Logging configuration for Urban Copilot application.
 Centralizes logging setup for consistent logging across the application.
+
+By default records are handed to a bounded in-memory queue and written by a
+background thread, so request threads never wait on stdout or disk. Records
+are only formatted by that thread, as JSON objects unless LOG_FORMAT is
+"text". When the queue is full, records are dropped according to
+LOG_QUEUE_DROP_POLICY and counted instead of blocking.
 """
 
 import os
+import json
+import time
+import queue
+import atexit
+import random
 import logging
 import logging.handlers
-import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
 from flask import request, g
 
-def setup_logging(app):
+from app.core.metrics import LOG_RECORDS_DROPPED
+from app.core.tracing import current_span
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed in 'extra'
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'trace_id'}
+
+# Paths whose requests are not logged
+QUIET_PATHS = ('/api/health', '/api/health/live', '/api/health/ready', '/metrics')
+
+# Handlers and listener installed by the last setup_logging call
+_installed_handlers = []
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including fields passed in 'extra'"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'trace_id', None):
+            entry['trace_id'] = record.trace_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TraceContextFilter(logging.Filter):
+    """Tags each record with the trace id of the current span, on the thread that logged it"""
+
+    def filter(self, record):
+        span = current_span()
+        record.trace_id = span.trace_id if span is not None else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
     """
-    Configure application logging.
-    
-    Args:
-        app: The Flask application instance
+    Keeps only a share of the records below WARNING for selected loggers.
+
+    Rates apply to a logger and its children, the most specific name winning,
+    e.g. {"app.agents": 0.1} keeps one in ten records of app.agents.urban_agent.
     """
-    # Configure logging format
-    log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    formatter = logging.Formatter(log_format)
-    
-    # Get log level from environment or default to INFO
-    log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
-    
-    # Configure root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, log_level))
-    
-    # Console handler
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._rate_by_logger: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._rate_by_logger.get(name)
+        if rate is None:
+            rate = 1.0
+            candidate = name
+            while candidate:
+                if candidate in self.rates:
+                    rate = self.rates[candidate]
+                    break
+                candidate = candidate.rpartition('.')[0]
+            self._rate_by_logger[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that neither formats nor blocks.
+
+    Records are queued as they are, so message arguments are only
+    interpolated by the writer thread. When the queue is full, "drop_new"
+    discards the incoming record and "drop_old" discards the oldest queued
+    one to make room.
+    """
+
+    def __init__(self, log_queue: queue.Queue, drop_policy: str = 'drop_new'):
+        super().__init__(log_queue)
+        if drop_policy not in ('drop_new', 'drop_old'):
+            raise ValueError(f"Unsupported LOG_QUEUE_DROP_POLICY: {drop_policy}")
+        self.drop_policy = drop_policy
+        self.dropped_records = 0
+
+    def prepare(self, record):
+        return record
+
+    def _drop(self):
+        self.dropped_records += 1
+        LOG_RECORDS_DROPPED.inc()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if self.drop_policy == 'drop_new':
+                self._drop()
+                return
+            try:
+                self.queue.get_nowait()
+                self._drop()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self._drop()
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """
+    Parse LOG_SAMPLING, e.g. "app.agents=0.1,app.core.cognitive_services=0.5"
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, rate = item.partition('=')
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def _create_handlers(formatter):
+    """The console handler, plus a rotating file handler in production"""
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
-    
+    handlers = [console_handler]
+
     # File handler (if in production)
     if os.environ.get('FLASK_ENV') == 'production':
         log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
         os.makedirs(log_dir, exist_ok=True)
-        
+
         file_handler = logging.handlers.RotatingFileHandler(
             os.path.join(log_dir, 'urban-copilot.log'),
             maxBytes=10485760,  # 10 MB
             backupCount=5
         )
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
-    
+        handlers.append(file_handler)
+    return handlers
+
+
+def dropped_records() -> int:
+    """Records dropped because the log queue was full"""
+    return sum(getattr(handler, 'dropped_records', 0) for handler in _installed_handlers)
+
+
+def _stop_listener():
+    """Write out whatever is still queued and stop the writer thread"""
+    if _listener is not None and _listener._thread is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            pass  # no room for the stop signal; the daemon thread dies with the process
+
+atexit.register(_stop_listener)
+
+
+def _restart_listener_in_child():
+    """Give a forked worker its own queue and writer thread; the parent's thread does not survive the fork"""
+    global _listener
+    if _listener is None:
+        return
+    writers = _listener.handlers
+    for handler in _installed_handlers:
+        if isinstance(handler, AsyncQueueHandler):
+            handler.queue = queue.Queue(maxsize=handler.queue.maxsize)
+            _listener = logging.handlers.QueueListener(handler.queue, *writers, respect_handler_level=True)
+            _listener.start()
+
+os.register_at_fork(after_in_child=_restart_listener_in_child)
+
+
+def configure_root_logger():
+    """
+    Install the application's handlers on the root logger, replacing those of an earlier call.
+
+    Returns:
+        The root logger
+    """
+    global _listener
+
+    # Get log level and output settings from environment
+    log_level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    formatter = logging.Formatter(TEXT_FORMAT) if os.environ.get('LOG_FORMAT', 'json') == 'text' else JsonFormatter()
+
+    # Configure root logger
+    root_logger = logging.getLogger()
+    root_logger.setLevel(getattr(logging, log_level))
+
+    # Calling create_app again (e.g. in tests) must not duplicate output
+    for handler in _installed_handlers:
+        root_logger.removeHandler(handler)
+    _installed_handlers.clear()
+    _stop_listener()
+    _listener = None
+
+    handlers = _create_handlers(formatter)
+    if os.environ.get('LOG_ASYNC', 'True') == 'True':
+        # Request threads only enqueue; a background thread formats and writes
+        queue_handler = AsyncQueueHandler(
+            queue.Queue(maxsize=int(os.environ.get('LOG_QUEUE_SIZE', 10000))),
+            drop_policy=os.environ.get('LOG_QUEUE_DROP_POLICY', 'drop_new'),
+        )
+        _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        handlers = [queue_handler]
+
+    # Filters run on the logging thread, before the record is queued
+    sampling = parse_sampling(os.environ.get('LOG_SAMPLING', ''))
+    for handler in handlers:
+        if sampling:
+            handler.addFilter(SamplingFilter(sampling))
+        handler.addFilter(TraceContextFilter())
+        root_logger.addHandler(handler)
+        _installed_handlers.append(handler)
+
+    return root_logger
+
+
+def setup_logging(app):
+    """
+    Configure application logging.
+
+    Args:
+        app: The Flask application instance
+    """
+    root_logger = configure_root_logger()
+
     # Setup request logging
     @app.before_request
     def start_timer():
-        g.start = time.time()
-    
+        g.start = time.perf_counter()
+
     @app.after_request
     def log_request(response):
-        if request.path != '/api/health':  # Don't log health checks
-            now = time.time()
-            duration = round(now - g.start, 2)
-            log_data = {
-                'method': request.method,
-                'path': request.path,
-                'status': response.status_code,
-                'duration': duration,
-                'ip': request.remote_addr,
-            }
-            
-            app.logger.info(f"Request: {log_data}")
-        
+        if request.path not in QUIET_PATHS and 'start' in g:  # Don't log health checks and scrapes
+            duration_ms = (time.perf_counter() - g.start) * 1000
+            app.logger.info(
+                "%s %s %s %.1fms", request.method, request.path, response.status_code, duration_ms,
+                extra={
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                    'duration_ms': round(duration_ms, 2),
+                    'ip': request.remote_addr,
+                },
+            )
+
         return response
-    
+
     return root_logger
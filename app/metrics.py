@@ -0,0 +1,56 @@
+"""
+Metrics configuration for Urban Copilot API.
+Records request counts, in-flight requests and latencies per route, and
+serves every metric at /metrics in the Prometheus text format.
+"""
+
+import time
+from flask import Response, g, request
+from app.core.metrics import (
+    CONTENT_TYPE,
+    RATE_LIMITED,
+    REGISTRY,
+    REQUESTS,
+    REQUESTS_IN_PROGRESS,
+    REQUEST_SECONDS,
+)
+
+def _route():
+    """The matched URL rule, so that path parameters don't multiply the series"""
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+def configure_metrics(app):
+    """
+    Configure request metrics and the /metrics endpoint for the Flask application.
+
+    Args:
+        app: The Flask application instance
+    """
+    @app.before_request
+    def start_request_metrics():
+        REGISTRY.start()  # Resets inherited values and starts flushing in a forked worker
+        g.metrics_start = time.perf_counter()
+        g.metrics_labels = {'method': request.method, 'route': _route()}
+        REQUESTS_IN_PROGRESS.labels(**g.metrics_labels).inc()
+
+    @app.after_request
+    def record_request_metrics(response):
+        labels = g.get('metrics_labels')
+        if labels is not None:
+            REQUESTS.labels(status=response.status_code, **labels).inc()
+            REQUEST_SECONDS.labels(**labels).observe(time.perf_counter() - g.metrics_start)
+            if response.status_code == 429:
+                RATE_LIMITED.labels(route=labels['route']).inc()
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        # Runs even when the request failed, so the in-flight gauge never leaks
+        labels = g.pop('metrics_labels', None)
+        if labels is not None:
+            REQUESTS_IN_PROGRESS.labels(**labels).dec()
+
+    @app.route('/metrics')
+    def metrics():
+        """Every metric, aggregated across worker processes when METRICS_MULTIPROC_DIR is set"""
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
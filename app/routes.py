@@ -1,19 +1,113 @@
-from flask import Blueprint, request, jsonify
-from app.agents.urban_agent import UrbanAgent
+import os
+import time
+import logging
+import threading
+from typing import Any, Optional
+from flask import Blueprint, current_app, request, jsonify
+from app.core.agent_router import create_agent_router
+from app.core.answer_cache import CachedAnswer, answer_headers, create_answer_cache, etag_matches, make_etag, track_degraded
+from app.core.circuit_breaker import CLOSED, breaker_states
+from app.core.deadline import DEADLINE_HEADER, deadline, request_budget
+from app.core.health import HealthProber
+from app.core.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
 
 # Create a Blueprint for urban planning routes
 urban_bp = Blueprint('urban', __name__)
 
-# Initialize the urban agent
-urban_agent = UrbanAgent()
 
-@urban_bp.route('/api/ask', methods=['POST'])
+def _build_urban_agent():
+    from app.agents.urban_agent import UrbanAgent
+    return UrbanAgent()
+
+
+# Components built on first use, or by warm_up before the worker takes traffic,
+# so importing the application stays cheap. Each is read as a module attribute
+# (routes.urban_agent) and built by the module __getattr__ below.
+_COMPONENTS = {
+    # The urban agent
+    'urban_agent': _build_urban_agent,
+    # Sends each question to the agent chosen for it, each with its own pool and timeout
+    'agent_router': lambda: create_agent_router(get_component('urban_agent')),
+    # Dependencies are probed in the background; health endpoints serve the last results.
+    # The checks look the client up when they run, so building the prober builds no Azure client.
+    'health_prober': lambda: HealthProber({
+        "cognitive_services": lambda: get_component('urban_agent').cognitive_client.is_available()
+    }),
+    # Whole answers to repeated questions, cleared when the topic table is reloaded
+    'answer_cache': lambda: create_answer_cache(get_component('urban_agent').topics),
+}
+_components_lock = threading.RLock()
+
+
+def get_component(name: str) -> Any:
+    """Return a lazily built component of the routes, building it on first use"""
+    try:
+        return globals()[name]
+    except KeyError:
+        with _components_lock:
+            if name not in globals():
+                globals()[name] = _COMPONENTS[name]()
+            return globals()[name]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _COMPONENTS:
+        return get_component(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def warm_up(connect: bool = True):
+    """
+    Build the agent, health prober and answer cache, and prime the agent's
+    clients, so the first request pays for none of them.
+
+    Args:
+        connect: Also open connections to Azure and the caches; only worth it in
+            the process that serves traffic, since connections do not survive a fork
+    """
+    start = time.perf_counter()
+    for name in _COMPONENTS:
+        get_component(name)
+    get_component('urban_agent').warm_up(connect=connect)
+    logger.info(f"Warmed up in {time.perf_counter() - start:.3f}s (connect={connect})")
+
+# Seconds clients and CDNs may reuse an answer before revalidating it
+ANSWER_MAX_AGE = int(os.environ.get('ANSWER_CACHE_MAX_AGE', 60))
+
+# Largest number of questions accepted by one batch request
+MAX_BATCH_QUESTIONS = int(os.environ.get('MAX_BATCH_QUESTIONS', 100))
+
+def request_deadline():
+    """
+    Bound the work done for the current request by its X-Request-Timeout
+    header or REQUEST_TIMEOUT. WSGI cannot tell when a client disconnects,
+    so the deadline is what stops work for a client that gave up.
+    """
+    return deadline(request_budget(request.headers.get(DEADLINE_HEADER)))
+
+def send_answer(body: bytes, etag: Optional[str]):
+    """
+    Serve an answer with its caching headers, or no body at all if the
+    client's If-None-Match shows it already holds this answer: 304 on GET,
+    412 on POST, as RFC 9110 requires for other methods.
+    """
+    headers = answer_headers(etag, ANSWER_MAX_AGE)
+    if etag is not None and etag_matches(request.headers.get('If-None-Match'), etag):
+        return current_app.response_class(status=304 if request.method == 'GET' else 412, headers=headers)
+    return current_app.response_class(body, mimetype=current_app.json.mimetype, headers=headers)
+
+@urban_bp.route('/api/ask', methods=['GET', 'POST'])
 def ask_urban_question():
     """
     Endpoint to ask urban planning questions.
-    Expects a JSON payload with a 'question' field.
+    Expects a JSON payload with a 'question' field, or 'question' and
+    'context' query parameters on GET, which browsers and CDNs can cache.
+    Repeated questions are answered from the answer cache without running
+    the agent.
     """
-    data = request.get_json()
+    data = request.args if request.method == 'GET' else request.get_json()
     
     if not data or 'question' not in data:
         return jsonify({'error': 'Question is required'}), 400
@@ -21,32 +115,106 @@ def ask_urban_question():
     question = data['question']
     context = data.get('context', '')  # Optional context information
     
-    response = urban_agent.generate_enhanced_response(question, context)
+    urban_agent, answer_cache = get_component('urban_agent'), get_component('answer_cache')
+    version = urban_agent.topics.version
+    answer = answer_cache.get(question, context, version) if answer_cache else None
+    if answer is not None:
+        return send_answer(answer.body.encode('utf-8'), answer.etag)
+    
+    with request_deadline(), track_degraded() as outcome:
+        response = get_component('agent_router').run(question)
+    
+    with STAGE_SECONDS.labels(stage="serialization").time():
+        body = current_app.json.response({'response': response}).get_data()
+    
+    # Fallback answers are served as they are, never stored
+    if outcome.degraded:
+        return send_answer(body, None)
+    answer = CachedAnswer(body.decode('utf-8'), make_etag(body))
+    if answer_cache:
+        answer_cache.set(question, context, version, answer)
+    return send_answer(body, answer.etag)
+
+@urban_bp.route('/api/ask/batch', methods=['POST'])
+def ask_urban_questions_batch():
+    """
+    Endpoint to ask many urban planning questions at once.
+    Expects a JSON payload with a 'questions' list of strings and returns one
+    result per question, in order, holding either a 'response' or an 'error'.
+    """
+    data = request.get_json(silent=True)
+    
+    if not data or not isinstance(data.get('questions'), list) or not data['questions']:
+        return jsonify({'error': 'A non-empty list of questions is required'}), 400
+    
+    questions = data['questions']
+    if len(questions) > MAX_BATCH_QUESTIONS:
+        return jsonify({'error': f'At most {MAX_BATCH_QUESTIONS} questions are accepted per batch'}), 400
+    
+    # Validate each item; only valid questions are sent to Azure
+    results = []
+    valid = []
+    for index, question in enumerate(questions):
+        if not isinstance(question, str) or not question.strip():
+            results.append({'index': index, 'error': 'Question must be a non-empty string'})
+        else:
+            results.append({'index': index})
+            valid.append(index)
     
-    return jsonify(response)
+    with request_deadline():
+        responses = get_component('agent_router').run_batch([questions[index] for index in valid])
+    for index, response in zip(valid, responses):
+        results[index]['response'] = response
+    
+    with STAGE_SECONDS.labels(stage="serialization").time():
+        return jsonify({'results': results})
 
 @urban_bp.route('/api/health', methods=['GET'])
 def health_check():
     """
-    Health check endpoint for monitoring and Docker HEALTHCHECK.
-    Returns status of the application and its dependencies.
+    Health check endpoint for monitoring.
+    Returns status of the application and its dependencies from the last
+    background check, so it never waits on Azure.
     """
-    # Check if essential services are available
+    checks = get_component('health_prober').snapshot()
     health_status = {
         "status": "healthy",
         "version": "1.0.0",
         "services": {
             "api": "up",
-            "cognitive_services": urban_agent.cognitive_client.is_available()
-        }
+            **{name: check["status"] for name, check in checks.items()}
+        },
+        "checks": checks,
+        "circuit_breakers": breaker_states(),
+        "agents": get_component('agent_router').stats()
     }
     
-    # If any critical service is down, return unhealthy status
-    if not all(status == "up" for service, status in health_status["services"].items()):
+    # If any critical service is down or being bypassed, return degraded status
+    breakers_closed = all(breaker["state"] == CLOSED for breaker in health_status["circuit_breakers"].values())
+    if not breakers_closed or not all(status == "up" for service, status in health_status["services"].items()):
         health_status["status"] = "degraded"
         return jsonify(health_status), 200
         
     return jsonify(health_status)
 
+@urban_bp.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """
+    Liveness probe for Docker HEALTHCHECK and orchestrators.
+    Only tells whether the process answers requests; it checks no dependency.
+    """
+    return jsonify({"status": "alive"})
 
-
+@urban_bp.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness probe for load balancers.
+    Returns 503 until the first background dependency check has completed.
+    Azure being down does not make the app unready, since answers degrade
+    to the local fallback instead of failing.
+    """
+    health_prober = get_component('health_prober')
+    health_prober.start()
+    if not health_prober.ready:
+        return jsonify({"status": "starting"}), 503
+    return jsonify({"status": "ready"})
@@ -0,0 +1,41 @@
+"""
+Tracing configuration for Urban Copilot API.
+Opens a span per request, continuing the caller's trace when a W3C
+'traceparent' header is present, and returns the trace id in the
+X-Trace-Id response header.
+"""
+
+from flask import g, request
+from app.core.tracing import TRACEPARENT_HEADER, TRACE_ID_HEADER, tracer
+
+def configure_tracing(app):
+    """
+    Configure request spans for the Flask application.
+    
+    Args:
+        app: The Flask application instance
+    """
+    @app.before_request
+    def start_request_span():
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        span = tracer.start_span(
+            f"{request.method} {route}",
+            kind="server",
+            attributes={'http.method': request.method, 'http.route': route, 'http.target': request.path},
+            traceparent=request.headers.get(TRACEPARENT_HEADER),
+        )
+        g.trace_span = span.__enter__()
+
+    @app.after_request
+    def add_trace_header(response):
+        span = g.get('trace_span')
+        if span is not None:
+            span.set_attribute('http.status_code', response.status_code)
+            response.headers[TRACE_ID_HEADER] = span.trace_id
+        return response
+
+    @app.teardown_request
+    def end_request_span(exc):
+        span = g.pop('trace_span', None)
+        if span is not None:
+            span.__exit__(type(exc) if exc else None, exc, None)
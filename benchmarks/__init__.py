@@ -0,0 +1,6 @@
+"""
+Benchmark suite for Urban Copilot
+Microbenchmarks of the in-process hot path and end-to-end benchmarks through
+the Flask test client against a local mock of Azure Text Analytics. Run it
+with "python -m benchmarks" (or "make bench").
+"""
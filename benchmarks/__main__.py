@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Run the Urban Copilot benchmark suite
+
+    python -m benchmarks                                # micro and end-to-end, saved to benchmarks/results/latest.json
+    python -m benchmarks --suite micro --output base.json
+    python -m benchmarks --compare base.json            # exit status 1 if any benchmark slowed down past --threshold
+"""
+
+import os
+import sys
+import argparse
+
+# Run from anywhere: the suite imports the application package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import harness
+from benchmarks.mock_azure import LatencyDistribution
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "latest.json")
+
+
+def main():
+    """Parse arguments, run the selected suites and save or compare the results."""
+    parser = argparse.ArgumentParser(description="Benchmark suite for Urban Copilot")
+    parser.add_argument("--suite", choices=["micro", "e2e", "all"], default="all",
+                        help="Benchmarks to run (default: all)")
+    parser.add_argument("--samples", type=int, default=30, help="Timed samples per benchmark (default: 30)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON results file (default: %(default)s)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Results file of an earlier run to compare against")
+    parser.add_argument("--metric", default="p50", help="Statistic compared with --compare (default: p50)")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slow-down reported as a regression (default: 0.10)")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mock Azure latency per call (default: 50)")
+    parser.add_argument("--latency", type=LatencyDistribution.parse, default=None,
+                        help="Mock Azure latency distribution, e.g. lognormal:50:0.5 (overrides --latency-ms)")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra mock latency (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of failing mock Azure calls in the error scenario (default: 0, skipped)")
+    parser.add_argument("--cache", action="store_true", help="Keep the analysis cache on in end-to-end runs")
+    args = parser.parse_args()
+
+    results = {}
+    # End-to-end first: the application reads its settings when it is first imported
+    if args.suite in ("e2e", "all"):
+        from benchmarks import e2e
+        e2e_results = e2e.run(args.samples, args.latency_ms, args.jitter_ms, args.error_rate, args.cache,
+                              latency=args.latency)
+        results.update({f"e2e.{name}": stats for name, stats in e2e_results.items()})
+    if args.suite in ("micro", "all"):
+        from benchmarks import micro
+        results.update({f"micro.{name}": stats for name, stats in micro.run(args.samples).items()})
+
+    harness.print_table(results)
+    settings = {
+        "suite": args.suite,
+        "samples": args.samples,
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "latency": str(args.latency) if args.latency else None,
+        "error_rate": args.error_rate,
+        "cache": args.cache,
+    }
+    harness.save_results(results, args.output, settings)
+    print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        rows = harness.compare(harness.load_results(args.compare), harness.load_results(args.output),
+                               args.metric, args.threshold)
+        print(f"\nChange in {args.metric} against {args.compare}:")
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"  {row['name']}: {harness.format_seconds(row['baseline'])} -> "
+                  f"{harness.format_seconds(row['current'])} ({row['change']:+.1%}){flag}")
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+End-to-end benchmarks through the Flask test client
+Questions go through the whole request path (logging, tracing, metrics,
+rate limiting, the agent and the pooled Azure client) to a local mock of
+Text Analytics. Each scenario runs once with no injected Azure latency, which
+measures the application's own overhead, and once with the configured
+latency, so the two can be told apart.
+"""
+
+import os
+import sys
+import itertools
+from typing import Any, Dict, Optional
+
+from benchmarks.harness import measure
+from benchmarks.mock_azure import LatencyDistribution, MockAzureServer
+
+QUESTIONS = [
+    "Where can I find parking downtown?",
+    "Why is the bus always late on my route?",
+    "What events are happening in the city this weekend?",
+    "How do I report a broken street light?",
+    "What is the weather like today?",
+    "Are there any road closures because of construction?",
+    "When is garbage collection in my neighborhood?",
+    "What are smart cities?",
+]
+
+BATCH_SIZE = 10
+
+
+def _configure_environment(endpoint: str, cache: bool):
+    """Point the application at the mock before it is imported"""
+    os.environ["AZURE_ENDPOINT"] = endpoint
+    os.environ["AZURE_API_KEY"] = "benchmark"
+    os.environ["CACHE_TYPE"] = "simple" if cache else "null"  # without a cache every question reaches the mock
+    os.environ.setdefault("LOG_LEVEL", "WARNING")  # a log line per request would be measured too
+    os.environ.setdefault("RATELIMIT_ASK", "1000000 per minute")
+    os.environ.setdefault("RATELIMIT_ASK_BATCH", "1000000 per minute")
+
+
+def _ask(client, questions):
+    question = next(questions)
+    response = client.post("/api/ask", json={"question": question})
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/ask returned {response.status_code}")
+
+
+def _ask_batch(client, questions):
+    batch = [next(questions) for _ in range(BATCH_SIZE)]
+    response = client.post("/api/ask/batch", json={"questions": batch})
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/ask/batch returned {response.status_code}")
+
+
+def run(samples: int = 30, latency_ms: float = 50.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+        cache: bool = False, seed: Optional[int] = 0,
+        latency: Optional[LatencyDistribution] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Run every end-to-end benchmark against a mock Azure started for the run
+
+    Args:
+        samples: Requests timed per scenario
+        latency_ms: Latency the mock adds to each Azure call
+        jitter_ms: Random extra latency, up to this value
+        error_rate: Share of Azure calls failing, for the error scenario; 0 skips it
+        cache: Keep the analysis cache on; repeated questions then skip the mock
+        seed: Seed of the mock's latency and error draws
+        latency: Distribution of the mock's latency; replaces latency_ms and jitter_ms
+
+    Returns:
+        Statistics per benchmark name, in seconds per request
+    """
+    if "app.routes" in sys.modules:
+        raise RuntimeError("The end-to-end benchmarks must run before the application is imported")
+
+    with MockAzureServer(seed=seed) as mock:
+        _configure_environment(mock.endpoint, cache)
+        from app import create_app
+
+        client = create_app().test_client()
+        questions = itertools.cycle(QUESTIONS)
+        results = {}
+
+        def scenario(name, func, warmup):
+            # Azure calls per request show whether the cache or batching spared any
+            before = mock.stats()["requests"]
+            results[name] = measure(lambda: func(client, questions), samples, warmup=warmup, number=1)
+            results[name]["azure_calls_per_request"] = (mock.stats()["requests"] - before) / (samples + warmup)
+
+        mock.set_latency(0.0)
+        scenario("ask.overhead", _ask, warmup=3)
+        scenario("ask_batch.overhead", _ask_batch, warmup=1)
+
+        mock.set_latency(latency_ms, jitter_ms)
+        if latency is not None:
+            mock.latency = latency
+        scenario("ask", _ask, warmup=1)
+        scenario("ask_batch", _ask_batch, warmup=1)
+
+        # Last, since failures may open the circuit breakers for the rest of the process
+        if error_rate:
+            mock.error_rate = error_rate
+            scenario("ask.errors", _ask, warmup=0)
+        return results
@@ -0,0 +1,193 @@
+"""
+Timing, statistics and result files for the Urban Copilot benchmarks
+Each benchmark is timed over repeated samples after a warm-up, summarized
+with nearest-rank percentiles and written to a JSON file together with the
+commit and machine it ran on, so two runs can be compared.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+# Version of the result file layout
+SCHEMA_VERSION = 1
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile of already sorted values
+
+    The p-th percentile is the smallest value that at least p percent of the
+    values are less than or equal to, so the 99th percentile of 100 values is
+    the 99th value, not the 100th.
+    """
+    if not sorted_values:
+        raise ValueError("percentile of an empty sample")
+    rank = math.ceil(p / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Statistics of per-operation times in seconds"""
+    ordered = sorted(samples)
+    return {
+        "samples": len(ordered),
+        "min": ordered[0],
+        "max": ordered[-1],
+        "mean": statistics.fmean(ordered),
+        "stdev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "p50": percentile(ordered, 50),
+        "p90": percentile(ordered, 90),
+        "p99": percentile(ordered, 99),
+    }
+
+
+def _calibrate(func: Callable[[], Any], min_sample_time: float) -> int:
+    """Number of calls per sample so that one sample takes at least min_sample_time"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= min_sample_time or number >= 1_000_000:
+            return number
+        number *= 2
+
+
+def measure(func: Callable[[], Any], samples: int = 30, warmup: int = 3, number: Optional[int] = None,
+            min_sample_time: float = 0.005) -> Dict[str, Any]:
+    """
+    Time a function
+
+    Fast functions are called many times per sample so that timer resolution
+    does not dominate; the reported times are per call.
+
+    Args:
+        func: The code to time, called without arguments
+        samples: Number of samples to take
+        warmup: Samples run and discarded first
+        number: Calls per sample; calibrated from min_sample_time by default
+        min_sample_time: Shortest duration of a calibrated sample, in seconds
+
+    Returns:
+        The summary statistics in seconds per call, plus "number" and "ops_per_second"
+    """
+    number = number or _calibrate(func, min_sample_time)
+    times = []
+    for index in range(warmup + samples):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = (time.perf_counter() - start) / number
+        if index >= warmup:
+            times.append(elapsed)
+    result = summarize(times)
+    result["number"] = number
+    result["ops_per_second"] = 1 / result["mean"] if result["mean"] else float("inf")
+    return result
+
+
+def environment() -> Dict[str, Any]:
+    """Where the benchmarks ran: commit, interpreter and machine"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                    capture_output=True, text=True, timeout=10).stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        commit, dirty = None, None
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def save_results(results: Dict[str, Dict[str, Any]], path: str, settings: Optional[Dict[str, Any]] = None):
+    """
+    Write benchmark results and their environment to a JSON file
+
+    Args:
+        results: Statistics per benchmark name
+        path: Output file
+        settings: Parameters of the run, e.g. the mock Azure latency
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    document = {
+        "schema": SCHEMA_VERSION,
+        "environment": environment(),
+        "settings": settings or {},
+        "benchmarks": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], metric: str = "p50",
+            threshold: float = 0.10) -> List[Dict[str, Any]]:
+    """
+    Compare two result files benchmark by benchmark
+
+    Args:
+        baseline: Loaded result file of the reference commit
+        current: Loaded result file of the commit under test
+        metric: Statistic compared, e.g. "p50" or "mean"
+        threshold: Relative slow-down that counts as a regression, e.g. 0.10 for 10%
+
+    Returns:
+        One entry per benchmark present in both files, with the relative change and a regression flag
+    """
+    rows = []
+    for name, stats in sorted(current["benchmarks"].items()):
+        reference = baseline["benchmarks"].get(name)
+        if reference is None or metric not in stats or metric not in reference or not reference[metric]:
+            continue
+        change = stats[metric] / reference[metric] - 1
+        rows.append({
+            "name": name,
+            "baseline": reference[metric],
+            "current": stats[metric],
+            "change": change,
+            "regression": change > threshold,
+        })
+    return rows
+
+
+def format_seconds(value: float) -> str:
+    """Human-readable duration"""
+    if value < 1e-6:
+        return f"{value * 1e9:.0f} ns"
+    if value < 1e-3:
+        return f"{value * 1e6:.2f} µs"
+    if value < 1:
+        return f"{value * 1e3:.2f} ms"
+    return f"{value:.3f} s"
+
+
+def print_table(results: Dict[str, Dict[str, Any]], stream=sys.stdout):
+    """Print the median, p99 and throughput of each benchmark"""
+    width = max((len(name) for name in results), default=10)
+    print(f"{'benchmark':<{width}}  {'p50':>10}  {'p99':>10}  {'ops/s':>12}", file=stream)
+    for name, stats in results.items():
+        print(f"{name:<{width}}  {format_seconds(stats['p50']):>10}  {format_seconds(stats['p99']):>10}  "
+              f"{stats['ops_per_second']:>12.1f}", file=stream)
@@ -0,0 +1,141 @@
+"""
+HDR-style latency histogram
+Records latencies into log-linear buckets with a fixed number of
+significant digits, like HdrHistogram. Memory is constant however many
+values are recorded, every value is kept to three significant digits from
+a microsecond up to an hour, and high percentiles such as p99.9 come out
+right instead of being lost to sampling.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional
+
+# Percentiles reported by default
+DEFAULT_PERCENTILES = (50, 75, 90, 95, 99, 99.9, 99.99, 100)
+
+
+class LatencyHistogram:
+    """Histogram of integer microsecond values with bounded relative error"""
+
+    def __init__(self, lowest: int = 1, highest: int = 3_600_000_000, significant_figures: int = 3):
+        """
+        Args:
+            lowest: Smallest value told apart from zero, in microseconds
+            highest: Largest trackable value; larger values are clamped to it
+            significant_figures: Decimal digits of precision kept for every value, 1 to 5
+        """
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+        self.lowest = lowest
+        self.highest = highest
+        self.significant_figures = significant_figures
+
+        sub_bucket_count_magnitude = math.ceil(math.log2(2 * 10 ** significant_figures))
+        self._sub_bucket_half_count_magnitude = sub_bucket_count_magnitude - 1
+        self._unit_magnitude = int(math.floor(math.log2(lowest)))
+        self._sub_bucket_count = 1 << sub_bucket_count_magnitude
+        self._sub_bucket_half_count = self._sub_bucket_count // 2
+        self._sub_bucket_mask = (self._sub_bucket_count - 1) << self._unit_magnitude
+
+        # Each bucket covers twice the range of the previous one with the same number of sub-buckets
+        smallest_untrackable = self._sub_bucket_count << self._unit_magnitude
+        bucket_count = 1
+        while smallest_untrackable <= highest:
+            smallest_untrackable <<= 1
+            bucket_count += 1
+        self._counts = [0] * ((bucket_count + 1) * self._sub_bucket_half_count)
+
+        self.count = 0
+        self.clamped = 0
+        self._total = 0
+        self._min: Optional[int] = None
+        self._max = 0
+
+    def _index(self, value: int) -> int:
+        bucket = (value | self._sub_bucket_mask).bit_length() - self._unit_magnitude - (self._sub_bucket_half_count_magnitude + 1)
+        sub_bucket = value >> (bucket + self._unit_magnitude)
+        return ((bucket + 1) << self._sub_bucket_half_count_magnitude) + sub_bucket - self._sub_bucket_half_count
+
+    def _highest_equivalent(self, index: int) -> int:
+        """Largest value counted at an index"""
+        bucket = (index >> self._sub_bucket_half_count_magnitude) - 1
+        sub_bucket = (index & (self._sub_bucket_half_count - 1)) + self._sub_bucket_half_count
+        if bucket < 0:
+            sub_bucket -= self._sub_bucket_half_count
+            bucket = 0
+        lowest = sub_bucket << (bucket + self._unit_magnitude)
+        return lowest + (1 << (bucket + self._unit_magnitude)) - 1
+
+    def record(self, value: int, count: int = 1):
+        """Record a value in microseconds"""
+        value = max(int(value), 0)
+        if value > self.highest:
+            value = self.highest
+            self.clamped += count
+        self._counts[self._index(value)] += count
+        self.count += count
+        self._total += value * count
+        self._min = value if self._min is None else min(self._min, value)
+        self._max = max(self._max, value)
+
+    def record_seconds(self, seconds: float):
+        """Record a duration in seconds"""
+        self.record(round(seconds * 1_000_000))
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add the values of a histogram with the same settings"""
+        if (other.lowest, other.highest, other.significant_figures) != (self.lowest, self.highest, self.significant_figures):
+            raise ValueError("Histograms with different settings cannot be merged")
+        for index, count in enumerate(other._counts):
+            if count:
+                self._counts[index] += count
+        self.count += other.count
+        self.clamped += other.clamped
+        self._total += other._total
+        if other._min is not None:
+            self._min = other._min if self._min is None else min(self._min, other._min)
+        self._max = max(self._max, other._max)
+
+    @property
+    def min(self) -> int:
+        return self._min or 0
+
+    @property
+    def max(self) -> int:
+        return self._max
+
+    @property
+    def mean(self) -> float:
+        return self._total / self.count if self.count else 0.0
+
+    def value_at_percentile(self, p: float) -> int:
+        """
+        Nearest-rank percentile in microseconds
+
+        The value returned is the top of the bucket holding the value of rank
+        ceil(p / 100 * count), so it overstates that value by less than one
+        part in 10 ** significant_figures, and never exceeds the recorded maximum.
+        """
+        if not self.count:
+            return 0
+        rank = min(max(math.ceil(p / 100 * self.count), 1), self.count)
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return min(self._highest_equivalent(index), self._max)
+        return self._max
+
+    def percentiles(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, int]:
+        """Values at several percentiles, keyed like "p99.9" """
+        return {f"p{p:g}": self.value_at_percentile(p) for p in percentiles}
+
+    def to_dict(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        """Summary in microseconds, for JSON reports"""
+        return {"count": self.count, "min": self.min, "mean": round(self.mean, 1), "max": self.max,
+                "clamped": self.clamped, **self.percentiles(percentiles)}
+
+    def distribution(self) -> List[Dict[str, float]]:
+        """Non-empty buckets as (upper value, count) rows, e.g. for plotting"""
+        return [{"value": self._highest_equivalent(index), "count": count}
+                for index, count in enumerate(self._counts) if count]
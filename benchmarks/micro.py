@@ -0,0 +1,51 @@
+"""
+Microbenchmarks of the in-process hot path
+Time the pieces of answering a question that never leave the process:
+topic matching, response generation, local analysis and serializing the
+JSON response.
+"""
+
+from typing import Any, Dict
+
+from flask import Flask
+
+from benchmarks.harness import measure
+
+# Key phrases as Text Analytics returns them: one that hits a topic late in the list, one that hits none
+MATCHING_PHRASES = ["city", "opening hours", "public library", "weekend"]
+MISSING_PHRASES = ["smart cities", "quality of life", "infrastructure", "technology"]
+
+QUESTION = "Where can I find parking near the public library this weekend?"
+
+
+def run(samples: int = 30) -> Dict[str, Dict[str, Any]]:
+    """
+    Run every microbenchmark
+
+    Args:
+        samples: Timed samples per benchmark
+
+    Returns:
+        Statistics per benchmark name, in seconds per call
+    """
+    from app.agents.urban_agent import UrbanAgent
+    from app.core.local_nlp import LocalAnalyzer
+
+    agent = UrbanAgent()
+    index = agent.topics.index
+    analyzer = LocalAnalyzer()
+    answer = agent.generate_enhanced_response(QUESTION, MATCHING_PHRASES, "neutral")
+
+    app = Flask(__name__)  # only its JSON provider is used, as jsonify does in the routes
+
+    results = {}
+    results["topic_match.hit"] = measure(lambda: index.match(MATCHING_PHRASES), samples)
+    results["topic_match.miss"] = measure(lambda: index.match(MISSING_PHRASES), samples)
+    results["generate_enhanced_response.topic"] = measure(
+        lambda: agent.generate_enhanced_response(QUESTION, MATCHING_PHRASES, "neutral"), samples)
+    results["generate_enhanced_response.general"] = measure(
+        lambda: agent.generate_enhanced_response(QUESTION, MISSING_PHRASES, "negative"), samples)
+    results["local_analysis"] = measure(lambda: analyzer.analyze(QUESTION), samples)
+    with app.app_context():
+        results["json_serialization"] = measure(lambda: app.json.response({"response": answer}), samples)
+    return results
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Azure Text Analytics
+Implements the v3.1 languages, keyPhrases and sentiment contracts over HTTP
+with deterministic results, so CognitiveServicesClient can be tested and
+benchmarked offline, without paying for or being throttled by Azure.
+
+Requests are validated the way Azure validates them (batch size limits,
+unique document ids, empty or oversized documents). Each response can be
+delayed by a latency distribution, or replaced by an injected 500 error or
+a 429 with Retry-After. A quota in text records per second can be enforced,
+like the one on an Azure pricing tier.
+
+    python -m benchmarks.mock_azure --port 8081 --latency lognormal:40:0.5 --throttle-rate 0.01
+    python -m benchmarks.mock_azure --port 8081 --latency-ms 40 --tps 100 --error-rate 0.01
+    AZURE_ENDPOINT=http://127.0.0.1:8081/ AZURE_API_KEY=mock make run
+"""
+
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+API_PREFIX = "/text/analytics/v3.1/"
+
+# Largest batch each operation accepts, and longest document in characters, as in Azure v3.1
+MAX_DOCUMENTS = {"languages": 1000, "keyPhrases": 10, "sentiment": 10}
+MAX_DOCUMENT_CHARACTERS = 5120
+
+# Characters billed as one text record (transaction)
+CHARACTERS_PER_RECORD = 1000
+
+MODEL_VERSION = "mock-2021-06-01"
+
+# Words that make the mock sentiment positive or negative
+POSITIVE_WORDS = {"good", "great", "love", "nice", "clean", "safe", "thanks", "happy", "best", "beautiful"}
+NEGATIVE_WORDS = {"bad", "slow", "late", "dirty", "broken", "unsafe", "worst", "noisy", "delay", "delays", "terrible"}
+
+STOP_WORDS = {"what", "when", "where", "which", "there", "their", "about", "with", "this", "that",
+              "from", "have", "does", "into", "your", "today", "some", "many", "much"}
+
+# Short, frequent words that tell the languages the mock knows apart; anything else is English
+LANGUAGE_MARKERS = {
+    ("Spanish", "es"): {"el", "la", "los", "las", "es", "donde", "dónde", "qué", "por", "una", "hay"},
+    ("French", "fr"): {"le", "les", "est", "où", "une", "des", "pour", "je", "dans", "quels", "quelle"},
+    ("German", "de"): {"der", "die", "das", "ist", "wo", "und", "ich", "nicht", "ein", "eine", "wann"},
+}
+
+_WORD = re.compile(r"[^\W\d_]+")
+_SENTENCE = re.compile(r"[^.!?]+[.!?]*")
+
+
+class LatencyDistribution:
+    """
+    Random delay in milliseconds, parsed from specs such as:
+
+        fixed:40              always 40 ms
+        uniform:20:80         between 20 and 80 ms
+        normal:50:10          mean 50 ms, standard deviation 10 ms
+        lognormal:40:0.5      median 40 ms, sigma 0.5; a long right tail, like real services
+        exponential:50        mean 50 ms
+    """
+
+    PARAMETERS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+
+    def __init__(self, kind: str = "fixed", *params: float):
+        if self.PARAMETERS.get(kind) != len(params):
+            raise ValueError(f"Unsupported latency distribution: {kind} with {len(params)} parameter(s)")
+        self.kind = kind
+        self.params = tuple(float(param) for param in params)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, *params = spec.strip().split(":")
+        return cls(kind, *(float(param) for param in params))
+
+    def sample(self, rng: random.Random) -> float:
+        """One delay in milliseconds, never negative"""
+        if self.kind == "fixed":
+            value = self.params[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(*self.params)
+        elif self.kind == "normal":
+            value = rng.gauss(*self.params)
+        elif self.kind == "lognormal":
+            median, sigma = self.params
+            value = rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        else:
+            value = rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        return max(value, 0.0)
+
+    def __str__(self):
+        return ":".join([self.kind, *(f"{param:g}" for param in self.params)])
+
+
+def detect_language(text: str) -> Dict[str, Any]:
+    """The language whose marker words the text uses most, English by default"""
+    words = set(_WORD.findall(text.lower()))
+    best, hits = ("English", "en"), 0
+    for language, markers in LANGUAGE_MARKERS.items():
+        found = len(words & markers)
+        if found > hits:
+            best, hits = language, found
+    confidence = 1.0 if hits == 0 else min(0.6 + 0.1 * hits, 1.0)
+    return {"name": best[0], "iso6391Name": best[1], "confidenceScore": round(confidence, 2)}
+
+
+def key_phrases(text: str) -> List[str]:
+    """Distinct longer words of the text, in order, like a very simple phrase extractor"""
+    phrases = []
+    for word in _WORD.findall(text.lower()):
+        if len(word) > 3 and word not in STOP_WORDS and word not in phrases:
+            phrases.append(word)
+    return phrases[:5] or [text]
+
+
+def _score(text: str) -> Tuple[str, Dict[str, float]]:
+    words = set(_WORD.findall(text.lower()))
+    score = len(words & POSITIVE_WORDS) - len(words & NEGATIVE_WORDS)
+    label = "positive" if score > 0 else "negative" if score < 0 else "neutral"
+    scores = {"positive": 0.05, "neutral": 0.05, "negative": 0.05}
+    scores[label] = 0.9
+    return label, scores
+
+
+def sentiment(text: str) -> Dict[str, Any]:
+    """Document and sentence sentiment; "mixed" when sentences disagree"""
+    sentences = []
+    for match in _SENTENCE.finditer(text):
+        sentence = match.group().strip()
+        if not sentence:
+            continue
+        label, scores = _score(sentence)
+        offset = match.start() + match.group().index(sentence)
+        sentences.append({"text": sentence, "sentiment": label, "confidenceScores": scores,
+                          "offset": offset, "length": len(sentence)})
+    if len({sentence["sentiment"] for sentence in sentences} - {"neutral"}) > 1:
+        label, scores = "mixed", {"positive": 0.45, "neutral": 0.1, "negative": 0.45}
+    else:
+        label, scores = _score(text)
+    return {"sentiment": label, "confidenceScores": scores, "sentences": sentences}
+
+
+def analyze_document(operation: str, document: Dict[str, str]) -> Dict[str, Any]:
+    """The result document Azure would return for one valid input document"""
+    text = document.get("text", "")
+    if operation == "languages":
+        return {"id": document["id"], "detectedLanguage": detect_language(text), "warnings": []}
+    if operation == "keyPhrases":
+        return {"id": document["id"], "keyPhrases": key_phrases(text), "warnings": []}
+    return {"id": document["id"], **sentiment(text), "warnings": []}
+
+
+def text_records(text: str) -> int:
+    """Text records billed for a document"""
+    return max(1, math.ceil(len(text) / CHARACTERS_PER_RECORD))
+
+
+def error_body(code: str, message: str, inner_code: Optional[str] = None) -> Dict[str, Any]:
+    """Error object in the shape Azure uses, with an optional inner error code"""
+    error = {"code": code, "message": message}
+    if inner_code:
+        error["innererror"] = {"code": inner_code, "message": message}
+    return {"error": error}
+
+
+def validate(operation: str, body: bytes) -> Tuple[Optional[List[Dict[str, Any]]], Optional[Dict[str, Any]]]:
+    """
+    Check a request body like Azure does before analyzing anything
+
+    Returns:
+        (documents, None) for a valid batch, or (None, error) for a request to reject with 400
+    """
+    try:
+        payload = json.loads(body or b"null")
+    except ValueError:
+        return None, error_body("InvalidRequest", "Request body is not valid JSON.", "InvalidRequestBodyFormat")
+    documents = payload.get("documents") if isinstance(payload, dict) else None
+    if not isinstance(documents, list) or not documents:
+        return None, error_body("InvalidRequest", "Request body must contain a non-empty documents list.",
+                                "InvalidRequestBodyFormat")
+    limit = MAX_DOCUMENTS[operation]
+    if len(documents) > limit:
+        return None, error_body("InvalidRequest",
+                                f"Batch request contains too many records. Max {limit} records are permitted.",
+                                "InvalidDocumentBatch")
+    ids = [document.get("id") if isinstance(document, dict) else None for document in documents]
+    if not all(isinstance(doc_id, str) and doc_id for doc_id in ids):
+        return None, error_body("InvalidRequest", "Every document must have a string id.", "InvalidRequestBodyFormat")
+    if len(set(ids)) != len(ids):
+        return None, error_body("InvalidRequest",
+                                "Request contains duplicated Ids. Make sure each document has a unique Id.",
+                                "InvalidDocument")
+    return documents, None
+
+
+class MockAzureServer:
+    """Threaded HTTP server answering Text Analytics requests on a local port"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0, seed: Optional[int] = None,
+                 latency: Optional[LatencyDistribution] = None, per_document_ms: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: int = 1, tps: float = 0.0,
+                 api_key: Optional[str] = None):
+        """
+        Args:
+            latency_ms: Delay added to every request, unless a latency distribution is given
+            jitter_ms: Extra delay drawn uniformly between 0 and this value
+            error_rate: Share of requests answered with a 500 error
+            host: Interface to listen on
+            port: Port to listen on; 0 picks a free one
+            seed: Seed of the random source, for repeatable runs
+            latency: Distribution of the delay of each request; replaces latency_ms and jitter_ms
+            per_document_ms: Extra delay per document, so larger batches take longer
+            throttle_rate: Share of requests answered with 429
+            retry_after: Seconds announced in the Retry-After header of injected 429s
+            tps: Text records per second allowed before answering 429, like a pricing tier; 0 for no quota
+            api_key: Subscription key requests must carry; None accepts any
+        """
+        self.latency = latency or LatencyDistribution("uniform", latency_ms, latency_ms + jitter_ms)
+        self.per_document_ms = per_document_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.tps = tps
+        self.api_key = api_key
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._quota_tokens = tps
+        self._quota_updated = time.monotonic()
+        self.reset_stats()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        """Base URL to use as AZURE_ENDPOINT"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def set_latency(self, latency_ms: float, jitter_ms: float = 0.0):
+        """Switch to a fixed delay plus uniform jitter, e.g. between benchmark scenarios"""
+        self.latency = LatencyDistribution("uniform", latency_ms, latency_ms + jitter_ms)
+
+    def start(self) -> "MockAzureServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-azure", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted"""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.throttled = 0
+            self.rejected = 0
+            self.documents = 0
+            self.operations: Dict[str, int] = {}
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests received, injected errors, 429s, 400s and documents analyzed"""
+        with self._lock:
+            return {"requests": self.requests, "errors": self.errors, "throttled": self.throttled,
+                    "rejected": self.rejected, "documents": self.documents, "operations": dict(self.operations)}
+
+    def _draw(self, documents: int) -> Tuple[float, Optional[str]]:
+        """The delay in seconds and the injected fault ("error", "throttle" or None) for one request"""
+        with self._random_lock:
+            delay = self.latency.sample(self._random) + self.per_document_ms * documents
+            draw = self._random.random()
+        if draw < self.error_rate:
+            return delay / 1000, "error"
+        if draw < self.error_rate + self.throttle_rate:
+            return delay / 1000, "throttle"
+        return delay / 1000, None
+
+    def _take_quota(self, records: int) -> Optional[float]:
+        """Spend quota on a request; returns the seconds until it would fit if the quota is exhausted"""
+        if self.tps <= 0:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            self._quota_tokens = min(self.tps, self._quota_tokens + (now - self._quota_updated) * self.tps)
+            self._quota_updated = now
+            if self._quota_tokens < records:
+                return (records - self._quota_tokens) / self.tps
+            self._quota_tokens -= records
+            return None
+
+    def respond(self, operation: str, body: bytes, headers, query: Dict[str, List[str]]):
+        """
+        Answer one POST to an operation
+
+        Returns:
+            (status, payload, extra response headers)
+        """
+        with self._lock:
+            self.requests += 1
+            self.operations[operation] = self.operations.get(operation, 0) + 1
+
+        if self.api_key is not None and headers.get("Ocp-Apim-Subscription-Key") != self.api_key:
+            with self._lock:
+                self.rejected += 1
+            return 401, error_body("401", "Access denied due to invalid subscription key or wrong API endpoint."), {}
+
+        documents, error = validate(operation, body)
+        delay, fault = self._draw(len(documents or []))
+        if delay:
+            time.sleep(delay)
+        if error is not None:
+            with self._lock:
+                self.rejected += 1
+            return 400, error, {}
+        if fault == "error":
+            with self._lock:
+                self.errors += 1
+            return 500, error_body("InternalServerError", "Injected failure"), {}
+
+        records = sum(text_records(document.get("text") or "") for document in documents)
+        wait = self.retry_after if fault == "throttle" else self._take_quota(records)
+        if wait is not None:
+            with self._lock:
+                self.throttled += 1
+            return (429, error_body("429", "Rate limit is exceeded. Try again later."),
+                    {"Retry-After": str(math.ceil(wait))})
+
+        show_stats = query.get("showStats", ["false"])[0].lower() == "true"
+        results, errors = [], []
+        for document in documents:
+            text = document.get("text")
+            if not isinstance(text, str) or not text.strip():
+                errors.append({"id": document["id"], **error_body(
+                    "InvalidArgument", "Document text is empty.", "InvalidDocument")})
+            elif len(text) > MAX_DOCUMENT_CHARACTERS:
+                errors.append({"id": document["id"], **error_body(
+                    "InvalidArgument", "A document within the request was too large to be processed. "
+                    f"Limit document size to: {MAX_DOCUMENT_CHARACTERS} text elements.", "InvalidDocument")})
+            else:
+                result = analyze_document(operation, document)
+                if show_stats:
+                    result["statistics"] = {"charactersCount": len(text), "transactionsCount": text_records(text)}
+                results.append(result)
+        with self._lock:
+            self.documents += len(results)
+
+        payload = {"documents": results, "errors": errors, "modelVersion": MODEL_VERSION}
+        if show_stats:
+            payload["statistics"] = {
+                "documentsCount": len(documents),
+                "validDocumentsCount": len(results),
+                "erroneousDocumentsCount": len(errors),
+                "transactionsCount": records,
+            }
+        return 200, payload, {}
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like Azure
+            disable_nagle_algorithm = True  # headers and body are separate writes; don't wait for a delayed ACK
+
+            def log_message(self, format, *args):
+                pass  # a line per request would dominate the benchmark
+
+            def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _operation(self) -> Optional[str]:
+                path = urlsplit(self.path).path
+                operation = path[len(API_PREFIX):].strip("/") if path.startswith(API_PREFIX) else None
+                return operation if operation in MAX_DOCUMENTS else None
+
+            def do_GET(self):
+                # Availability probes only need a quick answer
+                if self._operation() is None:
+                    self._send(404, error_body("404", "Resource not found"))
+                else:
+                    self._send(200, {"status": "ok"})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                operation = self._operation()
+                if operation is None:
+                    self._send(404, error_body("404", "Resource not found"))
+                    return
+                self._send(*mock.respond(operation, body, self.headers, parse_qs(urlsplit(self.path).query)))
+
+        return Handler
+
+
+def main():
+    """Parse arguments and serve until interrupted."""
+    parser = argparse.ArgumentParser(description="Local mock of Azure Text Analytics v3.1")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8081, help="Port to listen on (default: 8081)")
+    parser.add_argument("--latency", type=LatencyDistribution.parse, default=None,
+                        help="Latency distribution: fixed:MS, uniform:LOW:HIGH, normal:MEAN:SD, "
+                             "lognormal:MEDIAN:SIGMA or exponential:MEAN (overrides --latency-ms)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra delay, up to this value")
+    parser.add_argument("--per-document-ms", type=float, default=0.0, help="Extra delay per document of a request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds of injected 429s (default: 1)")
+    parser.add_argument("--tps", type=float, default=0.0,
+                        help="Text records per second before answering 429 (default: no quota)")
+    parser.add_argument("--api-key", default=None, help="Subscription key to require (default: accept any)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for repeatable latency and faults")
+    args = parser.parse_args()
+
+    server = MockAzureServer(
+        args.latency_ms, args.jitter_ms, args.error_rate, args.host, args.port, args.seed,
+        latency=args.latency, per_document_ms=args.per_document_ms, throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after, tps=args.tps, api_key=args.api_key,
+    )
+    print(f"Mock Azure Text Analytics listening on {server.endpoint} (latency {server.latency} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    main()
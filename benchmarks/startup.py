@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Startup-time profile of Urban Copilot
+Imports an entry point in a fresh interpreter under `python -X importtime`
+and reports how long the import, building the application's components and
+the first request took, with the modules that cost the most to import. Each
+phase runs in its own process, so nothing is already imported or built.
+
+    python -m benchmarks.startup                      # the WSGI app (wsgi.py)
+    python -m benchmarks.startup --target app.asgi    # the ASGI app
+    python -m benchmarks.startup --output startup.json --top 30
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child interpreter: import the target, warm it up, serve one request
+_PHASES_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import {target}
+imported = time.perf_counter()
+if {target!r} == "app.asgi":
+    from starlette.testclient import TestClient
+    with TestClient({target}.app) as client:
+        warmed = time.perf_counter()
+        client.get("/api/health/live")
+else:
+    from app import routes
+    routes.warm_up(connect=False)
+    warmed = time.perf_counter()
+    {target}.app.test_client().get("/api/health/live")
+served = time.perf_counter()
+print(json.dumps({{"import": imported - start, "warm_up": warmed - imported, "first_request": served - warmed}}))
+"""
+
+
+def parse_importtime(output: str) -> List[Dict[str, Any]]:
+    """
+    Parse the report `python -X importtime` writes to stderr
+
+    Returns:
+        One entry per imported module, in import order, with its own import time
+        ("self") and the time including its imports ("cumulative"), in seconds
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|", 2)
+        modules.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self": int(own) / 1e6,
+            "cumulative": int(cumulative) / 1e6,
+        })
+    return modules
+
+
+def profile(target: str = "wsgi", top: int = 20) -> Dict[str, Any]:
+    """
+    Profile the startup of an entry point
+
+    Args:
+        target: Module to import: "wsgi" or "app.asgi"
+        top: Number of modules listed by import time
+
+    Returns:
+        Phase timings in seconds, the most expensive modules by own and by
+        cumulative import time, and the cumulative time of each app.* module
+    """
+    environment = dict(os.environ, PYTHONPATH=ROOT, LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"))
+
+    imports = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {target}"],
+                             cwd=ROOT, env=environment, capture_output=True, text=True)
+    if imports.returncode != 0:
+        raise RuntimeError(f"Importing {target} failed:\n{imports.stderr[-2000:]}")
+    modules = parse_importtime(imports.stderr)
+
+    phases = subprocess.run([sys.executable, "-c", _PHASES_SCRIPT.format(target=target)],
+                            cwd=ROOT, env=environment, capture_output=True, text=True)
+    if phases.returncode != 0:
+        raise RuntimeError(f"Starting {target} failed:\n{phases.stderr[-2000:]}")
+
+    return {
+        "target": target,
+        "phases": json.loads(phases.stdout.strip().splitlines()[-1]),
+        "modules_imported": len(modules),
+        "by_self": sorted(modules, key=lambda entry: entry["self"], reverse=True)[:top],
+        "by_cumulative": sorted(modules, key=lambda entry: entry["cumulative"], reverse=True)[:top],
+        "app_modules": {entry["module"]: entry["cumulative"] for entry in modules
+                        if entry["module"] == "app" or entry["module"].startswith("app.")},
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    """Print a startup profile as tables"""
+    print(f"Startup of {report['target']} ({report['modules_imported']} modules imported)")
+    for phase, seconds in report["phases"].items():
+        print(f"  {phase:<16} {seconds * 1000:9.1f} ms")
+    for title, key in (("Own import time", "by_self"), ("Cumulative import time", "by_cumulative")):
+        print(f"\n{title}:")
+        for entry in report[key]:
+            print(f"  {entry[key[3:]] * 1000:9.1f} ms  {entry['module']}")
+    print("\nApplication modules (cumulative):")
+    for module, seconds in sorted(report["app_modules"].items(), key=lambda item: item[1], reverse=True):
+        print(f"  {seconds * 1000:9.1f} ms  {module}")
+
+
+def main():
+    """Parse arguments, profile the startup and print or save the report."""
+    parser = argparse.ArgumentParser(description="Startup-time profile of Urban Copilot")
+    parser.add_argument("--target", choices=["wsgi", "app.asgi"], default="wsgi",
+                        help="Entry point to import (default: wsgi)")
+    parser.add_argument("--top", type=int, default=20, help="Modules listed by import time (default: 20)")
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = profile(args.target, args.top)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Gunicorn configuration for Urban Copilot
+A question spends most of its time waiting on Azure, so workers serve
+several requests at once: gthread workers run a pool of threads each, and
+gevent workers run greenlets. Worker and thread counts follow the CPUs the
+container may use and can be overridden through GUNICORN_* variables.
+
+The application is preloaded in the master, so UrbanAgent and its topic
+tables are built once and shared copy-on-write by the forked workers;
+post_fork gives each worker its own connection pools to Azure, and
+post_worker_init opens them before the worker accepts requests. child_exit
+folds the metrics file of each exited worker into the archive of
+METRICS_MULTIPROC_DIR.
+"""
+
+import gc
+import os
+import sys
+import math
+import multiprocessing
+
+
+def cpu_count() -> int:
+    """CPUs this process may use: the cgroup CPU quota if one is set, else the CPUs it may run on"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+
+cpus = cpu_count()
+
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '80')}")
+
+# "gthread" (threads), "gevent" (greenlets; needs the gevent package) or "sync"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+
+if worker_class == "gevent":
+    try:
+        from gevent import monkey
+    except ImportError:
+        raise ImportError("GUNICORN_WORKER_CLASS=gevent requires the gevent package: pip install gevent")
+    # Patch before the preloaded application opens sockets or creates locks
+    monkey.patch_all()
+
+# Concurrent workers only need a process per CPU; sync workers follow gunicorn's 2 x CPUs + 1
+workers = int(os.environ.get("GUNICORN_WORKERS", 2 * cpus + 1 if worker_class == "sync" else cpus + 1))
+# Tells the preloaded app how many processes share the Azure quota when it has no shared storage
+os.environ["WEB_CONCURRENCY"] = str(workers)
+threads = int(os.environ.get("GUNICORN_THREADS", 8 if worker_class == "gthread" else 1))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 200))  # Greenlets per gevent worker
+
+# Build the application once in the master and fork it into the workers
+preload_app = os.environ.get("GUNICORN_PRELOAD", "True") == "True"
+
+# Recycle workers now and then, staggered so they do not all restart at once
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# A question waits at most AZURE_READ_TIMEOUT per call plus retries; give it room before killing the worker
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Build the agent and open connections to Azure before a worker takes traffic
+warm_up = os.environ.get("GUNICORN_WARM_UP", "True") == "True"
+
+# Heartbeat files on tmpfs, so a slow container filesystem cannot stall workers
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+
+def when_ready(server):
+    """
+    Build the agent and its tables in the master, so the workers share them,
+    then move them out of the collector's reach, so collections in workers do
+    not copy their pages.
+    """
+    if preload_app:
+        routes = sys.modules.get("app.routes")
+        if warm_up and routes is not None:
+            routes.warm_up(connect=False)
+        gc.freeze()
+    server.log.info(f"Urban Copilot ready with {workers} {worker_class} workers x {threads} threads")
+
+
+def post_fork(server, worker):
+    """Give the worker its own connection pools; sockets opened by the master must not be shared"""
+    routes = sys.modules.get("app.routes")
+    agent = vars(routes).get("urban_agent") if routes is not None else None
+    if agent is not None:
+        agent.reset_connections()
+
+
+def post_worker_init(worker):
+    """Open the worker's connections to Azure and the caches before it accepts requests"""
+    routes = sys.modules.get("app.routes")
+    if warm_up and routes is not None:
+        routes.warm_up(connect=True)
+
+
+def child_exit(server, worker):
+    """Fold the metrics of an exited worker, e.g. one recycled after max_requests, into the archive"""
+    if os.environ.get("METRICS_MULTIPROC_DIR"):
+        from app.core.metrics import REGISTRY
+        try:
+            REGISTRY.mark_process_dead(worker.pid)
+        except OSError as e:
+            server.log.warning(f"Failed to archive the metrics of worker {worker.pid}: {e}")
@@ -1,12 +1,33 @@
 #!/usr/bin/env python3
+"""
+Load testing tool for the Urban Copilot API
+
+Two modes:
+
+- closed (default): N workers each send a request and wait for its response
+  before sending the next one. Simple, but the load drops as soon as the
+  server slows down, which hides queueing delays (coordinated omission).
+- open: requests are sent at a target arrival rate, fixed or ramped,
+  whatever the server does, and each latency is measured from the moment
+  the request was due. This reproduces production arrival patterns and
+  finds the rate at which the server saturates.
+
+    ./load_test.py --requests 200 --concurrency 20
+    ./load_test.py --mode open --rps 20 --duration 30
+    ./load_test.py --mode open --rps 5 --rps-end 100 --duration 60 --payloads requests.jsonl --output run.json
+"""
 import requests
 import time
+import asyncio
 import concurrent.futures
 import argparse
-import statistics
+import itertools
+import random
 import json
 from colorama import init, Fore, Style
 
+from benchmarks.histogram import LatencyHistogram
+
 # Initialize colorama for cross-platform colored output
 init()
 
@@ -17,6 +38,15 @@ DEFAULT_METHOD = "POST"
 DEFAULT_NUM_REQUESTS = 50
 DEFAULT_CONCURRENCY = 10
 DEFAULT_DATA = {"question": "What are smart cities?"}
+DEFAULT_RPS = 10.0
+DEFAULT_DURATION = 30.0
+DEFAULT_TIMEOUT = 30.0
+
+# Percentiles reported for latencies
+PERCENTILES = (50, 90, 95, 99, 99.9, 99.99)
+
+# Fields of a JSONL line that can serve as the question
+QUESTION_FIELDS = ("question", "body", "title", "text")
 
 def print_header(message):
     """Print a header with box drawing characters."""
@@ -24,31 +54,60 @@ def print_header(message):
     print(f"╔{'═' * width}╗")
     print(f"║  {message}  ║")
     print(f"╚{'═' * width}╝")
-    
+
 def print_colored(message, color=Fore.GREEN, prefix=""):
     """Print a colored message with optional prefix."""
     print(f"{color}{prefix}{message}{Style.RESET_ALL}")
 
+def load_payloads(path, endpoint, method):
+    """
+    Read request payloads from a JSONL file.
+
+    Each line is either a full request ({"endpoint", "method", "data"}), a
+    request body holding "question" or "questions", or any object with a text
+    field ("body", "title" or "text"), such as the repo's requests.jsonl,
+    which is asked as the question.
+    """
+    payloads = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "data" in item or "endpoint" in item:
+                payloads.append((item.get("endpoint", endpoint), item.get("method", method), item.get("data")))
+            elif "question" in item or "questions" in item:
+                payloads.append((endpoint, method, item))
+            else:
+                text = next((item[field] for field in QUESTION_FIELDS if isinstance(item.get(field), str)), None)
+                if text is None:
+                    raise ValueError(f"{path}:{line_number}: no question, body, title or text field")
+                payloads.append((endpoint, method, {"question": text}))
+    if not payloads:
+        raise ValueError(f"{path} holds no payloads")
+    return payloads
+
 def make_request(endpoint, method="POST", data=None, request_num=0):
     """Make a single request to the API and return performance metrics."""
     url = f"{BASE_URL}{endpoint}"
-    
+
     try:
-        start_time = time.time()
-        
+        start_time = time.perf_counter()
+
         if method == "GET":
             response = requests.get(url, timeout=10)
         elif method == "POST":
-            response = requests.post(url, json=data, timeout=30)
+            response = requests.post(url, json=data, timeout=DEFAULT_TIMEOUT,
+                                     headers={"X-Request-Timeout": str(DEFAULT_TIMEOUT)})
         else:
             return {
                 "request_num": request_num,
                 "success": False,
                 "error": f"Unsupported method: {method}"
             }
-        
-        elapsed_time = time.time() - start_time
-        
+
+        elapsed_time = time.perf_counter() - start_time
+
         return {
             "request_num": request_num,
             "success": response.status_code == 200,
@@ -63,115 +122,327 @@ def make_request(endpoint, method="POST", data=None, request_num=0):
             "error": str(e)
         }
 
-def run_load_test(endpoint, method, data, num_requests, concurrency):
-    """Run a load test with specified parameters."""
+def run_load_test(payloads, num_requests, concurrency):
+    """Run a closed-loop load test with specified parameters."""
+    endpoint, method, data = payloads[0]
     print_header("URBAN COPILOT LOAD TEST")
     print_colored(f"Target: {method} {BASE_URL}{endpoint}", Fore.BLUE)
     print_colored(f"Requests: {num_requests}, Concurrency: {concurrency}", Fore.BLUE)
-    print_colored(f"Request data: {json.dumps(data)}\n", Fore.BLUE)
-    
+    if len(payloads) == 1:
+        print_colored(f"Request data: {json.dumps(data)}\n", Fore.BLUE)
+    else:
+        print_colored(f"Replaying {len(payloads)} payloads\n", Fore.BLUE)
+
     results = []
-    start_time = time.time()
-    
+    start_time = time.perf_counter()
+
     with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
         # Submit all requests
         futures = [
-            executor.submit(make_request, endpoint, method, data, i)
-            for i in range(num_requests)
+            executor.submit(make_request, *payload, i)
+            for i, payload in zip(range(num_requests), itertools.cycle(payloads))
         ]
-        
+
         # Process results as they complete
         for i, future in enumerate(concurrent.futures.as_completed(futures)):
             result = future.result()
             results.append(result)
-            
+
             # Print progress every 10% of requests
             if (i + 1) % max(1, num_requests // 10) == 0:
                 print_colored(f"Completed {i + 1}/{num_requests} requests " +
-                             f"({(i + 1) / num_requests * 100:.1f}%)", 
+                             f"({(i + 1) / num_requests * 100:.1f}%)",
                              Fore.YELLOW)
-    
-    total_time = time.time() - start_time
-    
+
+    total_time = time.perf_counter() - start_time
+
     # Analyze and print results
-    print_results(results, total_time)
+    return print_results(results, total_time)
+
+def failure_key(result):
+    """Group failures by error or status code."""
+    if "error" in result:
+        return str(result["error"])
+    return f"Status {result['status_code']}"
+
+def print_failures(results):
+    """Print how many requests failed, grouped by cause."""
+    failure_types = {}
+    for result in results:
+        if not result.get("success", False):
+            key = failure_key(result)
+            failure_types[key] = failure_types.get(key, 0) + 1
+
+    if failure_types:
+        print_colored("\nFailure breakdown:", Fore.RED)
+        for error, count in sorted(failure_types.items(), key=lambda item: -item[1]):
+            print_colored(f"  - {error}: {count} requests", Fore.RED)
+    return failure_types
+
+def print_percentiles(histogram, title):
+    """Print latency percentiles from a histogram of microseconds."""
+    print(f"\n{title}:")
+    for p in PERCENTILES:
+        print(f"  {p:g}th percentile: {histogram.value_at_percentile(p) / 1e6:.3f} seconds")
+    print(f"  Max: {histogram.max / 1e6:.3f} seconds")
 
 def print_results(results, total_time):
-    """Analyze and print load test results."""
+    """Analyze and print closed-loop load test results."""
     successful_results = [r for r in results if r.get("success", False)]
     failed_results = [r for r in results if not r.get("success", False)]
-    
+
     print_header("RESULTS")
     print_colored(f"Total requests: {len(results)}", Fore.BLUE)
     print_colored(f"Successful: {len(successful_results)} " +
-                 f"({len(successful_results) / len(results) * 100:.1f}%)", 
+                 f"({len(successful_results) / len(results) * 100:.1f}%)",
                  Fore.GREEN if len(successful_results) == len(results) else Fore.YELLOW)
-    
+
     if failed_results:
         print_colored(f"Failed: {len(failed_results)} " +
-                     f"({len(failed_results) / len(results) * 100:.1f}%)", 
+                     f"({len(failed_results) / len(results) * 100:.1f}%)",
                      Fore.RED)
-        
-        # Group failures by error or status code
-        failure_types = {}
-        for result in failed_results:
-            if "error" in result:
-                key = str(result["error"])
-            else:
-                key = f"Status {result['status_code']}"
-                
-            if key not in failure_types:
-                failure_types[key] = 0
-            failure_types[key] += 1
-        
-        print_colored("\nFailure breakdown:", Fore.RED)
-        for error, count in failure_types.items():
-            print_colored(f"  - {error}: {count} requests", Fore.RED)
-    
+    failures = print_failures(results)
+
     # Performance statistics for successful requests
+    histogram = LatencyHistogram()
+    for result in successful_results:
+        histogram.record_seconds(result["elapsed_time"])
     if successful_results:
-        response_times = [r["elapsed_time"] for r in successful_results]
-        
         print_colored("\nPerformance metrics:", Fore.BLUE)
         print(f"  Total test duration: {total_time:.2f} seconds")
         print(f"  Requests per second: {len(successful_results) / total_time:.2f}")
-        print(f"  Average response time: {statistics.mean(response_times):.3f} seconds")
-        print(f"  Median response time: {statistics.median(response_times):.3f} seconds")
-        print(f"  Min response time: {min(response_times):.3f} seconds")
-        print(f"  Max response time: {max(response_times):.3f} seconds")
-        
-        # Calculate percentiles
-        percentiles = [50, 90, 95, 99]
-        sorted_times = sorted(response_times)
-        print("\nResponse time percentiles:")
-        for p in percentiles:
-            index = int(len(sorted_times) * p / 100)
-            print(f"  {p}th percentile: {sorted_times[index]:.3f} seconds")
+        print(f"  Average response time: {histogram.mean / 1e6:.3f} seconds")
+        print(f"  Min response time: {histogram.min / 1e6:.3f} seconds")
+        print_percentiles(histogram, "Response time percentiles")
+
+    return {
+        "mode": "closed",
+        "requests": len(results),
+        "successful": len(successful_results),
+        "duration": total_time,
+        "throughput": len(successful_results) / total_time if total_time else 0.0,
+        "failures": failures,
+        "latency_us": histogram.to_dict(PERCENTILES),
+    }
+
+def arrival_times(rps, rps_end, duration):
+    """
+    Scheduled send times, in seconds from the start, for a rate ramping
+    linearly from rps to rps_end over the duration (constant if equal).
+    """
+    times = []
+    t = 0.0
+    while t < duration:
+        times.append(t)
+        rate = rps + (rps_end - rps) * t / duration
+        t += 1.0 / max(rate, 1e-3)
+    return times
+
+async def send_scheduled(client, payload, start, offset, timeout):
+    """Send one request at its scheduled time and measure it from that time."""
+    endpoint, method, data = payload
+    loop = asyncio.get_running_loop()
+    delay = start + offset - loop.time()
+    if delay > 0:
+        await asyncio.sleep(delay)
+    sent = loop.time()
+    result = {"scheduled": offset, "send_lag": sent - (start + offset)}
+    try:
+        # Tell the server how long we wait, so it stops working on requests we gave up on
+        response = await client.request(method, f"{BASE_URL}{endpoint}", json=data if method != "GET" else None,
+                                        timeout=timeout, headers={"X-Request-Timeout": str(timeout)})
+        result["status_code"] = response.status_code
+        result["success"] = response.status_code == 200
+    except Exception as e:
+        result["success"] = False
+        result["error"] = type(e).__name__
+    done = loop.time()
+    result["completed"] = done - start
+    result["latency"] = done - (start + offset)  # includes any wait behind the schedule
+    result["service_time"] = done - sent
+    return result
+
+async def run_open_loop_async(payloads, rps, rps_end, duration, timeout, max_connections, shuffle):
+    """Send requests on the arrival schedule without waiting for responses."""
+    import httpx  # only needed in open mode
+
+    order = list(payloads)
+    if shuffle:
+        random.shuffle(order)
+    schedule = arrival_times(rps, rps_end, duration)
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    async with httpx.AsyncClient(limits=limits) as client:
+        start = asyncio.get_running_loop().time() + 0.1  # time to create the tasks first
+        tasks = [
+            asyncio.create_task(send_scheduled(client, payload, start, offset, timeout))
+            for offset, payload in zip(schedule, itertools.cycle(order))
+        ]
+        return await asyncio.gather(*tasks)
+
+def summarize_windows(results, window, slo_seconds):
+    """
+    Per-window offered rate, throughput, p99 and error rate, and the first
+    window where the server stopped keeping up.
+
+    A window is saturated when fewer than 90% of the offered requests
+    complete successfully within it, more than 5% of its requests fail, or
+    its p99 exceeds the latency objective.
+    """
+    windows = {}
+    for result in results:
+        windows.setdefault(int(result["scheduled"] // window), []).append(result)
+    completions = {}
+    for result in results:
+        if result.get("success"):
+            index = int(result["completed"] // window)
+            completions[index] = completions.get(index, 0) + 1
+
+    rows = []
+    saturation = None
+    for index in sorted(windows):
+        batch = windows[index]
+        histogram = LatencyHistogram()
+        for result in batch:
+            histogram.record_seconds(result["latency"])
+        errors = sum(1 for result in batch if not result.get("success"))
+        row = {
+            "start": index * window,
+            "offered_rps": len(batch) / window,
+            "throughput_rps": completions.get(index, 0) / window,
+            "error_rate": errors / len(batch),
+            "p99": histogram.value_at_percentile(99) / 1e6,
+        }
+        rows.append(row)
+        saturated = (row["throughput_rps"] < 0.9 * row["offered_rps"] or row["error_rate"] > 0.05
+                     or (slo_seconds is not None and row["p99"] > slo_seconds))
+        if saturated and saturation is None:
+            saturation = row
+    return rows, saturation
+
+def print_open_loop_results(results, duration, window, slo_seconds):
+    """Analyze and print open-loop load test results."""
+    successful = [r for r in results if r.get("success")]
+    total_time = max((r["completed"] for r in results), default=duration)
+
+    latency = LatencyHistogram()
+    service = LatencyHistogram()
+    for result in successful:
+        latency.record_seconds(result["latency"])
+        service.record_seconds(result["service_time"])
+
+    print_header("RESULTS")
+    print_colored(f"Total requests: {len(results)} over {duration:.1f} seconds "
+                  f"({len(results) / duration:.2f} offered per second)", Fore.BLUE)
+    print_colored(f"Successful: {len(successful)} ({len(successful) / len(results) * 100:.1f}%)",
+                  Fore.GREEN if len(successful) == len(results) else Fore.YELLOW)
+    print(f"  Throughput: {len(successful) / total_time:.2f} successful requests per second")
+    failures = print_failures(results)
+
+    if successful:
+        print_percentiles(latency, "Latency from scheduled send time (corrected for coordinated omission)")
+        print_percentiles(service, "Service time from actual send time")
+
+    rows, saturation = summarize_windows(results, window, slo_seconds)
+    print_colored("\nPer-window load:", Fore.BLUE)
+    print(f"  {'start':>7}  {'offered/s':>10}  {'done/s':>10}  {'errors':>7}  {'p99':>9}")
+    for row in rows:
+        print(f"  {row['start']:>6.0f}s  {row['offered_rps']:>10.1f}  {row['throughput_rps']:>10.1f}  "
+              f"{row['error_rate'] * 100:>6.1f}%  {row['p99']:>8.3f}s")
+    if saturation:
+        print_colored(f"\nSaturation point: about {saturation['offered_rps']:.1f} requests per second offered "
+                      f"(window starting at {saturation['start']:.0f}s)", Fore.RED)
+    else:
+        print_colored("\nSaturation point: not reached", Fore.GREEN)
+
+    return {
+        "mode": "open",
+        "requests": len(results),
+        "successful": len(successful),
+        "duration": duration,
+        "throughput": len(successful) / total_time if total_time else 0.0,
+        "failures": failures,
+        "latency_us": latency.to_dict(PERCENTILES),
+        "service_time_us": service.to_dict(PERCENTILES),
+        "windows": rows,
+        "saturation": saturation,
+    }
+
+def run_open_loop(payloads, rps, rps_end, duration, timeout, max_connections, window, slo_seconds, shuffle):
+    """Run an open-loop load test at a fixed or ramped arrival rate."""
+    endpoint, method, _ = payloads[0]
+    print_header("URBAN COPILOT OPEN-LOOP LOAD TEST")
+    print_colored(f"Target: {method} {BASE_URL}{endpoint}", Fore.BLUE)
+    if rps_end != rps:
+        print_colored(f"Arrival rate: {rps:g} ramping to {rps_end:g} requests per second over {duration:g} seconds", Fore.BLUE)
+    else:
+        print_colored(f"Arrival rate: {rps:g} requests per second for {duration:g} seconds", Fore.BLUE)
+    print_colored(f"Replaying {len(payloads)} payload(s)\n", Fore.BLUE)
+
+    results = asyncio.run(run_open_loop_async(payloads, rps, rps_end, duration, timeout, max_connections, shuffle))
+    return print_open_loop_results(results, duration, window, slo_seconds)
 
 def main():
     """Parse arguments and run load test."""
+    global BASE_URL
     parser = argparse.ArgumentParser(description="Load testing tool for Urban Copilot API")
-    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT, 
+    parser.add_argument("--url", default=BASE_URL, help=f"Base URL of the server (default: {BASE_URL})")
+    parser.add_argument("--mode", default="closed", choices=["closed", "open"],
+                        help="closed: fixed number of workers; open: fixed arrival rate (default: closed)")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT,
                         help=f"API endpoint to test (default: {DEFAULT_ENDPOINT})")
     parser.add_argument("--method", default=DEFAULT_METHOD, choices=["GET", "POST"],
                         help=f"HTTP method (default: {DEFAULT_METHOD})")
     parser.add_argument("--requests", type=int, default=DEFAULT_NUM_REQUESTS,
-                        help=f"Number of requests to send (default: {DEFAULT_NUM_REQUESTS})")
+                        help=f"Closed mode: number of requests to send (default: {DEFAULT_NUM_REQUESTS})")
     parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
-                        help=f"Number of concurrent requests (default: {DEFAULT_CONCURRENCY})")
+                        help=f"Closed mode: number of concurrent requests (default: {DEFAULT_CONCURRENCY})")
     parser.add_argument("--data", type=str, default=json.dumps(DEFAULT_DATA),
                         help="JSON data to send with POST requests")
-    
+    parser.add_argument("--payloads", help="JSONL file of payloads to replay in turn instead of --data")
+    parser.add_argument("--shuffle", action="store_true", help="Open mode: replay payloads in random order")
+    parser.add_argument("--rps", type=float, default=DEFAULT_RPS,
+                        help=f"Open mode: arrival rate in requests per second (default: {DEFAULT_RPS:g})")
+    parser.add_argument("--rps-end", type=float, default=None,
+                        help="Open mode: ramp the arrival rate linearly from --rps to this rate")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION,
+                        help=f"Open mode: seconds to send requests for (default: {DEFAULT_DURATION:g})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"Open mode: seconds before a request counts as failed (default: {DEFAULT_TIMEOUT:g})")
+    parser.add_argument("--max-connections", type=int, default=1000,
+                        help="Open mode: most connections opened to the server (default: 1000)")
+    parser.add_argument("--window", type=float, default=1.0,
+                        help="Open mode: seconds per window when looking for saturation (default: 1)")
+    parser.add_argument("--slo-ms", type=float, default=None,
+                        help="Open mode: p99 latency objective; a window above it counts as saturated")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+
     args = parser.parse_args()
-    
+    BASE_URL = args.url.rstrip("/")
+
     # Parse JSON data
     try:
-        data = json.loads(args.data)
-    except json.JSONDecodeError:
-        print_colored(f"Error: Invalid JSON data: {args.data}", Fore.RED)
+        if args.payloads:
+            payloads = load_payloads(args.payloads, args.endpoint, args.method)
+        else:
+            payloads = [(args.endpoint, args.method, json.loads(args.data))]
+    except json.JSONDecodeError as e:
+        print_colored(f"Error: Invalid JSON data: {e}", Fore.RED)
         return 1
-    
-    run_load_test(args.endpoint, args.method, data, args.requests, args.concurrency)
+    except (OSError, ValueError) as e:
+        print_colored(f"Error: {e}", Fore.RED)
+        return 1
+
+    if args.mode == "open":
+        summary = run_open_loop(payloads, args.rps, args.rps_end if args.rps_end is not None else args.rps,
+                                args.duration, args.timeout, args.max_connections, args.window,
+                                args.slo_ms / 1000 if args.slo_ms is not None else None, args.shuffle)
+    else:
+        summary = run_load_test(payloads, args.requests, args.concurrency)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print_colored(f"\nResults saved to {args.output}", Fore.BLUE)
     return 0
 
 if __name__ == "__main__":
@@ -48,6 +48,13 @@ else
     echo "WARNING: app directory not found!"
 fi
 
+# Drop metrics left by workers of a previous run
+if [ -n "$METRICS_MULTIPROC_DIR" ]; then
+    rm -rf "$METRICS_MULTIPROC_DIR"
+    mkdir -p "$METRICS_MULTIPROC_DIR"
+fi
+
 # Start the application
 echo "Starting the application on port $PORT..."
-gunicorn --bind 0.0.0.0:$PORT wsgi:app
+# Workers, threads and preloading are set in gunicorn.conf.py
+gunicorn --config gunicorn.conf.py wsgi:app
@@ -8,6 +8,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const submitButtonText = document.getElementById('submitButtonText');
     const loadingSpinner = document.getElementById('loadingSpinner');
     
+    // Whether to try /api/ask/stream; the WSGI server has no streaming endpoint
+    let streamingSupported = 'TextDecoderStream' in window;
+    
     // Event Listeners
     questionForm.addEventListener('submit', handleQuestionSubmit);
     
@@ -37,11 +40,14 @@ document.addEventListener('DOMContentLoaded', () => {
         setLoadingState(true);
         
         try {
-            // Send request to the API
-            const response = await fetchAnswer(question);
-            
-            // Display assistant message
-            displayAssistantMessage(response.response || response.message);
+            // Stream the answer when the server supports it, otherwise fetch it whole
+            const streamed = streamingSupported && await streamAnswer(question);
+            if (!streamed) {
+                const response = await fetchAnswer(question);
+                
+                // Display assistant message
+                displayAssistantMessage(response.response || response.message);
+            }
         } catch (error) {
             console.error('Error:', error);
             displayErrorMessage('Sorry, there was an error processing your request. Please try again.');
@@ -51,21 +57,124 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
     
+    // Longest question sent as a GET query string; longer ones are POSTed
+    const MAX_GET_QUESTION_LENGTH = 1000;
+    
     // Function to fetch answer from API
     async function fetchAnswer(question) {
-        const response = await fetch('/api/ask', {
+        // GET answers carry an ETag and Cache-Control, so the browser cache
+        // serves repeated questions and revalidates stale ones with If-None-Match
+        const response = question.length <= MAX_GET_QUESTION_LENGTH
+            ? await fetch(`/api/ask?${new URLSearchParams({ question })}`, {
+                headers: {
+                    'Accept': 'application/json',
+                },
+            })
+            : await fetch('/api/ask', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ question }),
+            });
+        
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        return await response.json();
+    }
+    
+    // Function to stream an answer as Server-Sent Events, rendering each stage as it arrives.
+    // Returns false if the server has no streaming endpoint.
+    async function streamAnswer(question) {
+        const response = await fetch('/api/ask/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                'Accept': 'text/event-stream',
             },
             body: JSON.stringify({ question }),
         });
         
+        if (response.status === 404 || response.status === 405) {
+            streamingSupported = false;
+            return false;
+        }
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         
-        return await response.json();
+        const message = createStreamingMessage();
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        try {
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) {
+                    break;
+                }
+                // Events are separated by a blank line
+                buffer += value;
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    renderStreamEvent(message, parseStreamEvent(buffer.slice(0, boundary)));
+                    buffer = buffer.slice(boundary + 2);
+                }
+            }
+        } catch (error) {
+            message.element.remove();
+            throw error;
+        }
+        return true;
+    }
+    
+    // Function to parse one Server-Sent Event into its name and JSON data
+    function parseStreamEvent(block) {
+        let event = 'message';
+        const data = [];
+        for (const line of block.split('\n')) {
+            if (line.startsWith('event:')) {
+                event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                data.push(line.slice(5).trimStart());
+            }
+        }
+        return { event, data: data.length ? JSON.parse(data.join('\n')) : {} };
+    }
+    
+    // Function to add an empty assistant message that streamed events fill in
+    function createStreamingMessage() {
+        const element = document.createElement('div');
+        element.className = 'assistant-message';
+        const details = document.createElement('p');
+        details.className = 'analysis-details d-none';
+        const text = document.createElement('p');
+        element.append(details, text);
+        chatContainer.appendChild(element);
+        scrollToBottom();
+        return { element, details, text, analysis: {} };
+    }
+    
+    // Function to render one streamed event: analysis results first, then the answer text
+    function renderStreamEvent(message, { event, data }) {
+        if (event === 'language') {
+            message.analysis.language = data.language;
+        } else if (event === 'key_phrases') {
+            message.analysis.keyPhrases = data.key_phrases.join(', ');
+        } else if (event === 'sentiment') {
+            message.analysis.sentiment = data.sentiment;
+        } else if (event === 'answer') {
+            message.text.textContent += data.text;
+        } else if (event === 'done') {
+            message.text.textContent = data.response;
+        }
+        
+        const { language, keyPhrases, sentiment } = message.analysis;
+        const parts = [language, sentiment, keyPhrases].filter(Boolean);
+        message.details.textContent = parts.join(' · ');
+        message.details.classList.toggle('d-none', !parts.length);
+        scrollToBottom();
     }
     
     // Function to display user message
@@ -7,6 +7,7 @@ the Azure Cognitive Services resource.
 
 import os
 import sys
+import argparse
 import requests
 import json
 from dotenv import load_dotenv
@@ -61,6 +62,16 @@ def test_text_analytics(api_key, endpoint):
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description="Test the connection to Azure Text Analytics")
+    parser.add_argument("--mock", action="store_true",
+                        help="Test against a local mock of Text Analytics instead of the configured endpoint")
+    args = parser.parse_args()
+
+    if args.mock:
+        from benchmarks.mock_azure import MockAzureServer
+        with MockAzureServer() as mock:
+            return 0 if test_text_analytics("mock", mock.endpoint) else 1
+
     # Load environment variables
     load_dotenv()
     
@@ -0,0 +1,42 @@
+import sys
+import os
+import pytest
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Pytest fixture that gives every test a fresh rate limit budget.
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """
+    Fixture to clear the rate limiter's counters after each test, since all test requests share one client address.
+    """
+    yield
+    from app.limiter import limiter
+    if limiter.initialized:
+        limiter.reset()
+
+
+# Pytest fixture that keeps answers cached by one test from answering the next.
+@pytest.fixture(autouse=True)
+def clear_answer_cache():
+    """
+    Fixture to empty the Flask routes' answer cache after each test, so every test runs the agent.
+    """
+    yield
+    routes = sys.modules.get("app.routes")
+    answer_cache = vars(routes).get("answer_cache") if routes is not None else None  # Only if already built
+    if answer_cache is not None:
+        answer_cache.clear()
+
+
+# Pytest fixture that serves a local mock of Azure Text Analytics.
+@pytest.fixture
+def mock_azure():
+    """
+    Fixture to start a mock Text Analytics server on a free port, with no latency or faults unless a test sets them.
+    """
+    from benchmarks.mock_azure import MockAzureServer
+    with MockAzureServer(seed=0) as server:
+        yield server
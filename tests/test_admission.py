@@ -0,0 +1,185 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+import pytest
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core import admission
+from app.core.admission import (
+    BATCH, INTERACTIVE, AdmissionController, AdmissionRejectedError, create_admission_controller, text_records)
+from app.core.rate_limit_storage import SQLiteStorage
+from app.core.cognitive_services import CognitiveServicesClient
+from app.core.metrics import AZURE_QUOTA_TOKENS, AZURE_RECORD_BUDGET_REMAINING
+from app.agents.urban_agent import UrbanAgent
+
+# Test that a full bucket admits a burst at once and paces the calls after it.
+def test_bucket_paces_calls_after_burst():
+    """
+    Calls within the burst should pass immediately; the next one should wait for a refill.
+    """
+    controller = AdmissionController(rate=20, burst=2, max_wait={INTERACTIVE: 1.0})
+    start = time.perf_counter()
+    controller.acquire()
+    controller.acquire()
+    assert time.perf_counter() - start < 0.02
+
+    controller.acquire()
+    assert 0.03 < time.perf_counter() - start < 0.2
+    assert controller.stats()["admitted"] == 3
+
+# Test that a call which cannot get quota within its longest wait is shed at once.
+def test_call_shed_when_wait_exceeds_deadline():
+    """
+    With an empty bucket refilling slowly, an interactive call should be rejected without waiting.
+    """
+    controller = AdmissionController(rate=1, burst=1, max_wait={INTERACTIVE: 0.1})
+    controller.acquire()
+
+    start = time.perf_counter()
+    with pytest.raises(AdmissionRejectedError) as error:
+        controller.acquire()
+    assert error.value.reason == "deadline"
+    assert time.perf_counter() - start < 0.05
+    assert controller.stats()["queued"] == 0
+
+# Test that interactive calls are served before batch calls that queued earlier.
+def test_interactive_calls_go_ahead_of_batch():
+    """
+    When tokens free up, a waiting interactive call should be admitted before an older batch call.
+    """
+    controller = AdmissionController(rate=10, burst=1, max_wait={INTERACTIVE: 1.0, BATCH: 1.0})
+    controller.acquire()
+    order = []
+
+    def call(priority):
+        controller.acquire(priority=priority)
+        order.append(priority)
+
+    batch = threading.Thread(target=call, args=(BATCH,))
+    batch.start()
+    time.sleep(0.01)
+    interactive = threading.Thread(target=call, args=(INTERACTIVE,))
+    interactive.start()
+    batch.join()
+    interactive.join()
+
+    assert order == [INTERACTIVE, BATCH]
+
+# Test that the daily text record budget sheds calls once it is spent.
+def test_record_budget_sheds_calls():
+    """
+    Calls should be admitted until the budget of text records is used up.
+    """
+    controller = AdmissionController(record_budget=3)
+    controller.acquire(records=text_records(["a" * 1500]))
+    with pytest.raises(AdmissionRejectedError) as error:
+        controller.acquire(records=text_records(["short", "also short"]))
+    assert error.value.reason == "budget"
+    assert controller.stats()["records_used"] == 2
+
+# Test that the asynchronous path waits on the event loop for the same bucket.
+def test_async_acquire_waits_for_tokens():
+    """
+    aacquire should sleep until a token is available and then admit the call.
+    """
+    controller = AdmissionController(rate=20, burst=1, max_wait={INTERACTIVE: 1.0})
+
+    async def run():
+        await controller.aacquire()
+        start = time.perf_counter()
+        await controller.aacquire()
+        return time.perf_counter() - start
+
+    assert 0.03 < asyncio.run(run()) < 0.2
+
+# Test that a cancelled wait leaves the queue.
+def test_cancelled_wait_leaves_queue():
+    """
+    A call cancelled while waiting for quota should leave the queue, so the calls
+    behind it are neither held up nor shed on its account.
+    """
+    controller = AdmissionController(rate=10, burst=1, max_wait={INTERACTIVE: 1.0, BATCH: 0.15})
+
+    async def run():
+        await controller.aacquire()
+        waiting = asyncio.ensure_future(controller.aacquire())
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert controller.stats()["queued"] == 0
+        await controller.aacquire(priority=BATCH)  # would need 0.2 s behind the cancelled call
+
+    asyncio.run(run())
+    assert controller.stats()["admitted"] == 2 and controller.stats()["shed"] == 0
+
+# Test that workers sharing a storage share one quota and one budget.
+def test_workers_share_quota_and_budget(tmp_path):
+    """
+    Tokens and records taken by one controller should be gone for another on the same storage.
+    """
+    def worker():
+        storage = SQLiteStorage(f"sqlite://{tmp_path / 'admission.db'}")
+        return AdmissionController(rate=2, max_wait={INTERACTIVE: 0.05}, record_budget=4, storage=storage)
+
+    first, second = worker(), worker()
+    first.acquire(cost=2, records=3)
+    with pytest.raises(AdmissionRejectedError) as error:
+        second.acquire(records=1)
+    assert error.value.reason == "deadline"
+    time.sleep(1.05)
+    with pytest.raises(AdmissionRejectedError) as error:
+        second.acquire(records=2)
+    assert error.value.reason == "budget"
+    second.acquire(records=1)
+    assert first.stats()["records_used"] == 3 and second.stats()["records_used"] == 4
+
+# Test that the quota gauges are not added up across workers sharing one quota.
+def test_shared_quota_gauges_report_latest(monkeypatch, tmp_path):
+    """
+    With a shared storage every worker reports the same values, so the gauges should take the latest, not the sum.
+    """
+    for gauge in (AZURE_QUOTA_TOKENS, AZURE_RECORD_BUDGET_REMAINING):
+        monkeypatch.setattr(gauge, "multiprocess_mode", gauge.multiprocess_mode)
+    monkeypatch.setenv("ADMISSION_STORAGE_URI", f"sqlite://{tmp_path / 'admission.db'}")
+    create_admission_controller()
+    assert AZURE_QUOTA_TOKENS.multiprocess_mode == AZURE_RECORD_BUDGET_REMAINING.multiprocess_mode == "latest"
+    monkeypatch.setenv("ADMISSION_STORAGE_URI", "memory://")
+    create_admission_controller()
+    assert AZURE_QUOTA_TOKENS.multiprocess_mode == "sum"
+
+# Test that without a shared storage each worker gets its share of the limits.
+def test_limits_split_between_workers(monkeypatch):
+    """
+    With memory:// the quota and the budget should be divided by WEB_CONCURRENCY.
+    """
+    monkeypatch.setenv("AZURE_QUOTA_TPS", "10")
+    monkeypatch.setenv("AZURE_DAILY_RECORD_BUDGET", "1000")
+    monkeypatch.setenv("ADMISSION_STORAGE_URI", "memory://")
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    controller = create_admission_controller()
+    assert (controller.rate, controller.capacity, controller.record_budget) == (2.5, 2.5, 250)
+    assert controller.storage is None
+
+# Test that a shed batch falls back to the local analyzer instead of failing.
+def test_agent_answers_shed_batch_locally(monkeypatch):
+    """
+    When the quota sheds a batch, every question should still get a locally analyzed answer.
+    """
+    agent = UrbanAgent()
+    agent.cognitive_client = CognitiveServicesClient(
+        api_key="key", endpoint="https://example.test/",
+        admission=AdmissionController(record_budget=1),
+    )
+    seen = []
+    original = agent.cognitive_client.admission.acquire
+    monkeypatch.setattr(agent.cognitive_client.admission, "acquire",
+                        lambda **kwargs: seen.append(admission.current_priority()) or original(**kwargs))
+
+    responses = agent.process_urban_questions(["Where can I park downtown?", "Is the bus late today?"])
+
+    assert seen == [BATCH]
+    assert len(responses) == 2 and all(responses)
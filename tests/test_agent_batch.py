@@ -0,0 +1,141 @@
+import sys
+import os
+import asyncio
+import httpx
+from starlette.testclient import TestClient
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.agents.urban_agent import UrbanAgent
+from app.asgi import create_asgi_app
+from app.core import cognitive_services
+from app.core.agent_base import AgentBase
+from app.core.agent_router import AgentRouter
+from app.core.async_cognitive_services import AsyncCognitiveServicesClient
+from app.core.cognitive_services import CognitiveServicesClient
+
+
+class ShoutAgent(AgentBase):
+    """Agent with only 'run', relying on the default adapters."""
+    name = "shout"
+    keywords = ("bus",)
+
+    def run(self, question):
+        return question.upper()
+
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def analyze_documents(operation, documents):
+    """Text Analytics payload answering every document of a request."""
+    results = []
+    for document in documents:
+        if operation == "languages":
+            results.append({"id": document["id"], "detectedLanguage": {"name": "English", "confidenceScore": 0.9}})
+        elif operation == "keyPhrases":
+            results.append({"id": document["id"], "keyPhrases": ["parking"]})
+        else:
+            results.append({"id": document["id"], "sentiment": "neutral",
+                            "confidenceScores": {"positive": 0.1, "neutral": 0.8, "negative": 0.1}})
+    return {"documents": results, "errors": []}
+
+
+def async_batch_agent(calls):
+    """An agent whose fake async Azure records (operation, documents) for each request."""
+    async def handler(request):
+        operation = request.url.path.rsplit("/", 1)[-1]
+        documents = httpx.Response(200, content=request.content).json()["documents"]
+        calls.append((operation, len(documents)))
+        return httpx.Response(200, json=analyze_documents(operation, documents))
+
+    agent = UrbanAgent()
+    agent.async_cognitive_client = AsyncCognitiveServicesClient(
+        api_key="key", endpoint="https://example.test/", transport=httpx.MockTransport(handler), cache=False)
+    return agent
+
+# Test the default asynchronous and batch adapters of AgentBase.
+def test_default_adapters_use_run():
+    """
+    An agent implementing only 'run' should answer through arun, run_batch and arun_batch, in order.
+    """
+    agent = ShoutAgent()
+    assert not agent.implements('arun') and UrbanAgent().implements('arun_batch')
+    assert asyncio.run(agent.arun("hi")) == "HI"
+    assert agent.run_batch(["a", "b"]) == ["A", "B"]
+    assert asyncio.run(agent.arun_batch(["c", "d"])) == ["C", "D"]
+
+# Test that UrbanAgent.run_batch shares one Azure request per operation.
+def test_run_batch_shares_one_round_trip(monkeypatch):
+    """
+    Three questions should be analyzed by three multi-document requests, and an empty one answered with an error.
+    """
+    calls = []
+
+    def fake_post(self, url, json=None, timeout=None, **kwargs):
+        operation = url.rsplit("/", 1)[-1]
+        calls.append((operation, len(json["documents"])))
+        return FakeResponse(analyze_documents(operation, json["documents"]))
+
+    monkeypatch.setattr(cognitive_services.requests.Session, "post", fake_post)
+    agent = UrbanAgent()
+    agent.cognitive_client = CognitiveServicesClient(api_key="key", endpoint="https://example.test/", cache=False)
+    responses = agent.run_batch(["Where can I park?", "", "Is parking free?", "Parking downtown?"])
+
+    assert sorted(calls) == [("keyPhrases", 3), ("languages", 3), ("sentiment", 3)]
+    assert responses[1] == "Error: Question cannot be empty"
+    assert all("parking" in response for response in responses[:1] + responses[2:])
+
+# Test the native asynchronous batch of UrbanAgent.
+def test_arun_batch_shares_one_round_trip():
+    """
+    arun_batch should send the same three multi-document requests on the event loop.
+    """
+    calls = []
+    agent = async_batch_agent(calls)
+    responses = asyncio.run(agent.arun_batch(["Where can I park?", "Is parking free?", "Parking downtown?"]))
+
+    assert sorted(calls) == [("keyPhrases", 3), ("languages", 3), ("sentiment", 3)]
+    assert len(responses) == 3 and all("parking" in response for response in responses)
+
+# Test that the router splits a batch between agents and keeps the order.
+def test_router_batches_per_agent():
+    """
+    Each agent should answer its share of the batch, and the answers should come back in question order.
+    """
+    calls = []
+    router = AgentRouter()
+    router.register(ShoutAgent())
+    router.register(async_batch_agent(calls), default=True)
+    questions = ["Where can I park?", "next bus?", "Is parking free?"]
+
+    responses = asyncio.run(router.arun_batch(questions))
+    assert responses[1] == "NEXT BUS?"
+    assert "parking" in responses[0] and "parking" in responses[2]
+    assert sorted(calls) == [("keyPhrases", 2), ("languages", 2), ("sentiment", 2)]
+    assert router.run_batch(["bus", "train"])[0] == "BUS"
+
+# Test the batch endpoint of the ASGI app.
+def test_asgi_batch_route():
+    """
+    /api/ask/batch on the ASGI app should answer valid questions in one batch and flag invalid ones.
+    """
+    calls = []
+    with TestClient(create_asgi_app(async_batch_agent(calls))) as client:
+        results = client.post('/api/ask/batch', json={'questions': ['Where can I park?', 3, 'Parking?']}).json()['results']
+        assert client.post('/api/ask/batch', json={'questions': []}).status_code == 400
+
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert 'error' in results[1] and 'response' in results[0] and 'response' in results[2]
+    assert ("languages", 2) in calls
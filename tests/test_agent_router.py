@@ -0,0 +1,176 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.agent_base import AgentBase
+from app.core.agent_router import BUSY_RESPONSE, TIMEOUT_RESPONSE, AgentRouter, create_agent_router
+from app.core.answer_cache import track_degraded
+from app.core.metrics import REGISTRY
+
+
+class TransitAgent(AgentBase):
+    """Agent answering transit questions after an optional delay."""
+    name = "transit"
+    keywords = ("bus", "train")
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.release = threading.Event()
+
+    def run(self, question):
+        if self.delay:
+            self.release.wait(self.delay)
+        return f"transit: {question}"
+
+
+class EchoAgent(AgentBase):
+    """Default agent echoing the question."""
+    name = "echo"
+
+    def run(self, question):
+        return f"echo: {question}"
+
+    async def arun(self, question):
+        return self.run(question)
+
+
+# Test that questions go to the agent whose keywords they mention.
+def test_classify_by_keywords():
+    """
+    A question mentioning a transit keyword should reach the transit agent, any other question the default agent.
+    """
+    router = AgentRouter()
+    router.register(TransitAgent())
+    router.register(EchoAgent(), default=True)
+
+    assert router.classify("When is the next BUS downtown?").name == "transit"
+    assert router.classify("Where can I park?").name == "echo"
+    # Keywords are whole words: "bus" is not in "business", nor "train" in "training"
+    assert router.classify("What are the business hours of the training center?").name == "echo"
+    assert router.classify("Last train, please.").name == "transit"
+    assert router.run("Is the train late?") == "transit: Is the train late?"
+    assert router.run("Hello") == "echo: Hello"
+    with pytest.raises(ValueError):
+        router.register(EchoAgent())
+
+# Test that a slow agent times out without holding up the other agents.
+def test_slow_agent_times_out_alone():
+    """
+    The slow agent's question should get the timeout apology, marked degraded, while the default agent answers at once.
+    """
+    slow = TransitAgent(delay=5)
+    router = AgentRouter()
+    router.register(slow, timeout=0.2)
+    router.register(EchoAgent(), default=True)
+
+    start = time.perf_counter()
+    with track_degraded() as outcome:
+        assert router.run("Where is my bus?") == TIMEOUT_RESPONSE
+    assert 0.2 <= time.perf_counter() - start < 1
+    assert outcome.degraded
+    assert router.run("Hello") == "echo: Hello"
+
+    slow.release.set()
+    assert 'urban_agent_requests_total{agent="transit",outcome="timeout"}' in REGISTRY.render()
+
+# Test that a saturated agent turns further questions away at once.
+def test_saturated_agent_rejects_questions():
+    """
+    With its one worker busy and no queue, the next transit question should be rejected without waiting.
+    """
+    slow = TransitAgent(delay=5)
+    router = AgentRouter()
+    router.register(slow, max_concurrency=1, max_queue=0, timeout=0.1)
+    router.register(EchoAgent(), default=True)
+
+    assert router.run("bus one") == TIMEOUT_RESPONSE  # still running, holding the only place
+    start = time.perf_counter()
+    assert router.run("bus two") == BUSY_RESPONSE
+    assert time.perf_counter() - start < 0.05
+    assert router.stats()["transit"]["in_flight"] == 1
+
+    slow.release.set()
+    time.sleep(0.05)
+    assert router.stats()["transit"]["in_flight"] == 0
+    assert router.run("bus three") == "transit: bus three"
+
+# Test the asynchronous path, including agents that only implement run.
+def test_arun_cancels_slow_agents():
+    """
+    An async agent overrunning its timeout should be cancelled, and a sync-only agent should still answer.
+    """
+    cancelled = []
+
+    class SlowAsyncAgent(EchoAgent):
+        name = "slow"
+        keywords = ("slow",)
+
+        async def arun(self, question):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(question)
+                raise
+
+    router = AgentRouter()
+    router.register(SlowAsyncAgent(), timeout=0.1)
+    router.register(TransitAgent())
+    router.register(EchoAgent(), default=True)
+
+    async def ask():
+        return await asyncio.gather(router.arun("slow one"), router.arun("bus"), router.arun("hi"))
+
+    assert asyncio.run(ask()) == [TIMEOUT_RESPONSE, "transit: bus", "echo: hi"]
+    assert cancelled == ["slow one"]
+
+# Test that a stuck sync-only agent cannot delay the others on the asynchronous path.
+def test_stuck_sync_agent_keeps_to_its_pool():
+    """
+    Sync-only agents should run on their own pools, so one stuck agent leaves the loop's
+    default pool, here a single thread, free and the other agent answers at once.
+    """
+    class ParkingAgent(TransitAgent):
+        name = "parking"
+        keywords = ("parking",)
+
+    stuck = TransitAgent(delay=5)
+    router = AgentRouter()
+    router.register(stuck, timeout=0.2)
+    router.register(ParkingAgent())
+    router.register(EchoAgent(), default=True)
+
+    async def ask():
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=1))
+        blocked = asyncio.ensure_future(router.arun("bus"))
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        answer = await router.arun("parking")
+        elapsed = time.perf_counter() - start
+        # The default pool's only thread is free too
+        assert await asyncio.to_thread(lambda: "free") == "free"
+        return await blocked, answer, elapsed
+
+    timed_out, answer, elapsed = asyncio.run(ask())
+    assert timed_out == TIMEOUT_RESPONSE
+    assert answer == "transit: parking" and elapsed < 0.1
+    assert router.stats()["transit"]["in_flight"] == 1  # the stuck call keeps its place until it returns
+    stuck.release.set()
+
+# Test that agents listed in AGENT_PLUGINS are registered ahead of the default agent.
+def test_create_agent_router_loads_plugins(monkeypatch):
+    """
+    The plugin agent should receive its keywords' questions, the default agent the rest.
+    """
+    monkeypatch.setenv("AGENT_PLUGINS", f"{__name__}:TransitAgent")
+    monkeypatch.setenv("AGENT_TRANSIT_TIMEOUT", "2.5")
+    router = create_agent_router(EchoAgent())
+
+    assert [agent.name for agent in router.agents] == ["transit", "echo"]
+    assert router.get("transit").timeout == 2.5
+    assert router.run("bus?") == "transit: bus?" and router.run("park?") == "echo: park?"
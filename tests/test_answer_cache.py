@@ -0,0 +1,151 @@
+import sys
+import os
+import json
+import asyncio
+import pytest
+from starlette.testclient import TestClient
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.server import app
+from app import routes
+from app.agents.urban_agent import UrbanAgent
+from app.asgi import create_asgi_app
+from app.core.answer_cache import CachedAnswer, create_answer_cache, etag_matches, mark_degraded
+from app.core.cache import DiskBackend
+from app.core.topics import TopicTable
+
+
+# Pytest fixture that counts how often the Flask routes run the agent.
+@pytest.fixture
+def agent_runs(monkeypatch):
+    """
+    Fixture to wrap the routes' agent so tests can tell cached answers from computed ones.
+    """
+    runs = []
+    run = routes.urban_agent.run
+    monkeypatch.setattr(routes.urban_agent, "run", lambda question: runs.append(question) or run(question))
+    return runs
+
+# Test that a repeated question is served from the answer cache with the same ETag.
+def test_repeated_question_skips_the_agent(agent_runs):
+    """
+    The second ask should return the same body and ETag without running the agent again.
+    """
+    client = app.test_client()
+    first = client.post('/api/ask', json={'question': 'Where can I park downtown?'})
+    second = client.post('/api/ask', json={'question': '  where can I PARK downtown? '})
+
+    assert first.status_code == second.status_code == 200
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert first.headers['Cache-Control'] == 'public, max-age=60'
+    assert first.data == second.data
+    assert len(agent_runs) == 1
+
+# Test conditional requests against the answer's ETag.
+def test_conditional_requests(agent_runs):
+    """
+    A matching If-None-Match should get 304 on GET and 412 on POST, with no body and no agent run.
+    """
+    client = app.test_client()
+    etag = client.get('/api/ask', query_string={'question': 'Is there traffic?'}).headers['ETag']
+
+    not_modified = client.get('/api/ask', query_string={'question': 'Is there traffic?'},
+                              headers={'If-None-Match': f'"other", W/{etag}'})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+    assert not_modified.headers['ETag'] == etag
+
+    failed = client.post('/api/ask', json={'question': 'Is there traffic?'}, headers={'If-None-Match': etag})
+    assert failed.status_code == 412
+    assert len(agent_runs) == 1
+    assert not etag_matches('"other"', etag)
+
+# Test that degraded answers are neither cached nor cacheable.
+def test_degraded_answers_are_not_cached(monkeypatch):
+    """
+    An answer built from a fallback should be marked no-store and computed again next time.
+    """
+    runs = []
+
+    def degraded_run(question):
+        runs.append(question)
+        mark_degraded()
+        return "fallback answer"
+
+    monkeypatch.setattr(routes.urban_agent, "run", degraded_run)
+    client = app.test_client()
+    for _ in range(2):
+        response = client.post('/api/ask', json={'question': 'Why is the bus late?'})
+        assert response.get_json() == {'response': 'fallback answer'}
+        assert response.headers['Cache-Control'] == 'no-store'
+        assert 'ETag' not in response.headers
+    assert len(runs) == 2
+
+# Test that reloading the topic table invalidates cached answers.
+def test_topic_reload_invalidates_answers(tmp_path):
+    """
+    After the topic file changes, answers cached for the old table should be gone.
+    """
+    path = tmp_path / "topics.json"
+    path.write_text(json.dumps({"topics": [{"name": "parking", "patterns": ["parking"], "response": "old"}]}))
+    table = TopicTable(str(path), check_interval=0)
+    cache = create_answer_cache(table, cache_type="simple")
+    old_version = table.version
+    cache.set("Where is parking?", "", old_version, CachedAnswer('{"response":"old"}', '"etag"'))
+    assert cache.get("where is  parking?", "", old_version).etag == '"etag"'
+
+    path.write_text(json.dumps({"topics": [{"name": "parking", "patterns": ["parking"], "response": "new"}]}))
+    os.utime(path, (os.path.getmtime(path) + 1, os.path.getmtime(path) + 1))
+
+    assert table.version != old_version
+    assert cache.get("Where is parking?", "", old_version) is None
+
+# Test that the ASGI endpoint caches answers and honours If-None-Match too.
+def test_asgi_answer_cache(monkeypatch):
+    """
+    The asynchronous endpoint should answer a repeated GET from the cache and revalidate with 304.
+    """
+    agent = UrbanAgent()
+    runs = []
+    arun = agent.arun
+
+    async def counted_arun(question):
+        runs.append(question)
+        return await arun(question)
+
+    monkeypatch.setattr(agent, "arun", counted_arun)
+    with TestClient(create_asgi_app(agent)) as client:
+        first = client.get('/api/ask', params={'question': 'Where is the library?'})
+        second = client.get('/api/ask', params={'question': 'Where is the library?'},
+                            headers={'If-None-Match': first.headers['ETag']})
+    assert first.status_code == 200 and first.json()['response']
+    assert second.status_code == 304
+    assert len(runs) == 1
+
+# Test that the ASGI endpoints keep a disk answer cache off the event loop.
+def test_asgi_disk_answer_cache_off_the_loop(monkeypatch, tmp_path):
+    """
+    /api/ask and /api/ask/stream should read and write a blocking answer cache on worker threads.
+    """
+    monkeypatch.setenv("ANSWER_CACHE_TYPE", "filesystem")
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+    on_loop = []
+
+    def running_loop():
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    get, put = DiskBackend.get, DiskBackend.set
+    monkeypatch.setattr(DiskBackend, "get", lambda self, key: on_loop.append(running_loop()) or get(self, key))
+    monkeypatch.setattr(DiskBackend, "set", lambda self, *args: on_loop.append(running_loop()) or put(self, *args))
+    with TestClient(create_asgi_app(UrbanAgent())) as client:
+        first = client.post('/api/ask', json={'question': 'Where is the library?'})
+        second = client.post('/api/ask', json={'question': 'Where is the library?'})
+        client.post('/api/ask/stream', json={'question': 'Where can I park?'})
+    assert first.json() == second.json()
+    # Miss, store and hit on /api/ask; miss and store on the stream
+    assert len(on_loop) == 5 and not any(on_loop)
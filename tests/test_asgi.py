@@ -0,0 +1,142 @@
+import sys
+import os
+import asyncio
+import time
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.agents.urban_agent import UrbanAgent
+from app.asgi import create_asgi_app
+from app.core.async_cognitive_services import AsyncCognitiveServicesClient
+
+# Canned Text Analytics payloads keyed by the operation at the end of the URL
+FAKE_RESULTS = {
+    "languages": {"documents": [{"id": "1", "detectedLanguage": {"name": "English", "confidenceScore": 0.99}}]},
+    "keyPhrases": {"documents": [{"id": "1", "keyPhrases": ["parking"]}]},
+    "sentiment": {"documents": [{"id": "1", "sentiment": "neutral",
+                                 "confidenceScores": {"positive": 0.1, "neutral": 0.8, "negative": 0.1}}]},
+}
+
+
+def slow_azure_transport(delay=0.1, statuses=None):
+    """
+    Build an httpx transport that answers like Text Analytics after a delay.
+    'statuses' is an optional list of status codes returned before the canned answer.
+    """
+    statuses = list(statuses or [])
+
+    async def handler(request):
+        await asyncio.sleep(delay)
+        if statuses:
+            return httpx.Response(statuses.pop(0), headers={"Retry-After": "0"})
+        operation = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200, json=FAKE_RESULTS[operation])
+
+    return httpx.MockTransport(handler)
+
+
+# Pytest fixture that builds an ASGI test client around an agent talking to a fake Azure.
+@pytest.fixture
+def client():
+    """
+    Fixture to create a Starlette test client whose agent uses a mocked Azure transport.
+    """
+    agent = UrbanAgent()
+    agent.async_cognitive_client = AsyncCognitiveServicesClient(
+        api_key="key", endpoint="https://example.test/", transport=slow_azure_transport(delay=0))
+    with TestClient(create_asgi_app(agent)) as client:
+        yield client
+
+# Test that the asynchronous client runs the three analyses concurrently.
+def test_async_analyze_runs_concurrently():
+    """
+    With each call taking 100 ms, the gathered analysis should take about one call's latency.
+    """
+    cognitive_client = AsyncCognitiveServicesClient(
+        api_key="key", endpoint="https://example.test", transport=slow_azure_transport())
+
+    async def analyze():
+        start = time.perf_counter()
+        analysis = await cognitive_client.analyze("Where can I park downtown?")
+        await cognitive_client.aclose()
+        return analysis, time.perf_counter() - start
+
+    analysis, elapsed = asyncio.run(analyze())
+    assert analysis.key_phrases == ["parking"]
+    assert analysis.language == "English"
+    assert elapsed < 0.25
+
+# Test that throttled calls are retried before giving up.
+def test_async_client_retries_throttled_calls():
+    """
+    A 429 followed by a success should yield the successful result.
+    """
+    cognitive_client = AsyncCognitiveServicesClient(
+        api_key="key", endpoint="https://example.test", backoff_factor=0,
+        transport=slow_azure_transport(delay=0, statuses=[429]))
+
+    assert asyncio.run(cognitive_client.detect_language("Hello")) == ("English", 0.99)
+
+# Test a valid question sent to the asynchronous '/api/ask' route.
+def test_asgi_ask_route(client):
+    """
+    The ASGI '/api/ask' route should answer with a 'response' key.
+    """
+    response = client.post('/api/ask', json={'question': 'Where can I find parking?'})
+    assert response.status_code == 200
+    assert 'parking' in response.json()['response']
+
+# Test the asynchronous '/api/ask' route without a question.
+def test_asgi_ask_route_no_question(client):
+    """
+    Missing questions should be rejected with a 400 error.
+    """
+    response = client.post('/api/ask', json={})
+    assert response.status_code == 400
+    assert response.json()['error'] == 'Question is required'
+
+# Test that building the app leaves the Azure client to the first health check.
+def test_asgi_app_builds_no_client():
+    """
+    create_asgi_app should not build the agent's Cognitive Services client; only running the checks does.
+    """
+    agent = UrbanAgent()
+    create_asgi_app(agent)
+    assert "_cognitive_client" not in vars(agent)
+
+# Test that the asynchronous path checks the breakers without the synchronous client.
+def test_async_path_builds_no_sync_client():
+    """
+    arun and astream should consult the shared breakers through the async client, never building the requests one.
+    """
+    agent = UrbanAgent()
+    agent.async_cognitive_client = AsyncCognitiveServicesClient(
+        api_key="key", endpoint="https://example.test/", transport=slow_azure_transport(delay=0))
+
+    async def ask():
+        response = await agent.arun("Where can I park downtown?")
+        events = [event async for event in agent.astream("Is the library open?")]
+        return response, events
+
+    response, events = asyncio.run(ask())
+    assert response and events[-1][0] == "done"
+    assert "_cognitive_client" not in vars(agent)
+
+# Test the asynchronous health check.
+def test_asgi_health_route():
+    """
+    The ASGI '/api/health' route should report the Cognitive Services status from the background check.
+    """
+    agent = UrbanAgent()
+    agent.cognitive_client.is_available = lambda: "up"
+    with TestClient(create_asgi_app(agent)) as client:
+        deadline = time.monotonic() + 2
+        while client.get('/api/health/ready').status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        response = client.get('/api/health')
+    assert response.status_code == 200
+    assert response.json()['services']['cognitive_services'] == 'up'
+    assert response.json()['checks']['cognitive_services']['latency_ms'] is not None
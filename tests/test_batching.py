@@ -0,0 +1,62 @@
+import sys
+import os
+import threading
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.batching import MicroBatcher, create_batcher
+from app.core.cognitive_services import TextAnalysis
+
+
+class RecordingClient:
+    """Stand-in for CognitiveServicesClient that records the batches it receives."""
+
+    pool_size = 4
+
+    def __init__(self):
+        self.batches = []
+
+    def analyze_batch(self, texts):
+        self.batches.append(list(texts))
+        return [TextAnalysis(key_phrases=[text]) for text in texts]
+
+# Test that concurrent submissions are merged and every caller gets its own result.
+def test_concurrent_questions_share_one_batch():
+    """
+    Eight questions submitted within the window should be answered by a single batch.
+    """
+    client = RecordingClient()
+    batcher = MicroBatcher(client, max_batch_size=8, max_wait=0.5)
+    results = {}
+
+    def ask(number):
+        results[number] = batcher.analyze(f"question {number}", timeout=5)
+
+    threads = [threading.Thread(target=ask, args=(number,)) for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(client.batches) == 1
+    assert all(results[number].key_phrases == [f"question {number}"] for number in range(8))
+    assert batcher.stats()["fill_ratio"] == 1.0
+
+# Test that a lone question is dispatched once the wait window closes.
+def test_lone_question_dispatched_after_max_wait():
+    """
+    A single question should not wait for a full batch.
+    """
+    client = RecordingClient()
+    batcher = MicroBatcher(client, max_batch_size=10, max_wait=0.01)
+
+    assert batcher.analyze("Is the blue line delayed?", timeout=1).key_phrases == ["Is the blue line delayed?"]
+    assert batcher.stats()["fill_ratio"] == 0.1
+
+# Test that micro-batching is opt-in.
+def test_batcher_disabled_by_default(monkeypatch):
+    """
+    Without MICRO_BATCH_ENABLED the agent should talk to the client directly.
+    """
+    monkeypatch.delenv("MICRO_BATCH_ENABLED", raising=False)
+    assert create_batcher(RecordingClient()) is None
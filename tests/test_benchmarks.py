@@ -0,0 +1,86 @@
+import sys
+import os
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import harness
+from benchmarks.histogram import LatencyHistogram
+from benchmarks.mock_azure import MockAzureServer
+from app.core.cognitive_services import CognitiveServicesClient
+
+# Test the nearest-rank percentile, including the top of the range.
+def test_percentile_nearest_rank():
+    """
+    The 99th percentile of 1..100 should be 99 and the 100th should be the maximum.
+    """
+    values = list(range(1, 101))
+    assert harness.percentile(values, 50) == 50
+    assert harness.percentile(values, 99) == 99
+    assert harness.percentile(values, 100) == 100
+    assert harness.percentile([7], 99.9) == 7
+
+# Test that comparing two result files flags slow-downs beyond the threshold.
+def test_compare_flags_regressions():
+    """
+    Only the benchmark that slowed down by more than the threshold should be a regression.
+    """
+    baseline = {"benchmarks": {"a": {"p50": 1.0}, "b": {"p50": 1.0}, "gone": {"p50": 1.0}}}
+    current = {"benchmarks": {"a": {"p50": 1.05}, "b": {"p50": 1.5}, "new": {"p50": 1.0}}}
+    rows = {row["name"]: row for row in harness.compare(baseline, current, threshold=0.1)}
+    assert set(rows) == {"a", "b"}
+    assert not rows["a"]["regression"]
+    assert rows["b"]["regression"]
+
+# Test that results are saved with the environment they were measured in.
+def test_save_results_round_trip(tmp_path):
+    """
+    A saved result file should load back with its benchmarks, settings and environment.
+    """
+    path = str(tmp_path / "results.json")
+    stats = harness.measure(lambda: sum(range(10)), samples=3, warmup=1)
+    harness.save_results({"sum": stats}, path, {"samples": 3})
+    document = harness.load_results(path)
+    assert document["benchmarks"]["sum"]["samples"] == 3
+    assert document["settings"] == {"samples": 3}
+    assert document["environment"]["python"]
+
+# Test that the mock Azure server answers the client's multi-document batches.
+def test_mock_azure_serves_batches():
+    """
+    The pooled client should analyze a batch against the mock, one request per operation.
+    """
+    with MockAzureServer() as mock:
+        client = CognitiveServicesClient(api_key="key", endpoint=mock.endpoint, cache=False)
+        analyses = client.analyze_batch(["Why is the bus so slow?", "Where is the nearest park?"])
+        assert analyses[0].sentiment == "negative"
+        assert "park" in analyses[1].key_phrases
+        stats = mock.stats()
+        assert (stats["requests"], stats["errors"], stats["documents"]) == (3, 0, 6)
+
+# Test that histogram percentiles stay within the configured precision.
+def test_histogram_percentiles_are_precise():
+    """
+    p99 and p99.9 of a wide spread of values should be within 0.1% of the exact nearest-rank values.
+    """
+    histogram = LatencyHistogram()
+    values = [(index * 7919) % 5_000_000 + 1 for index in range(20000)]
+    for value in values:
+        histogram.record(value)
+    ordered = sorted(values)
+    for p in (50, 99, 99.9):
+        exact = harness.percentile(ordered, p)
+        assert exact <= histogram.value_at_percentile(p) <= exact * 1.001
+    assert histogram.value_at_percentile(100) == ordered[-1]
+    assert histogram.count == len(values)
+
+# Test that merging histograms gives the same percentiles as recording into one.
+def test_histogram_merge():
+    """
+    Two merged halves should report the same summary as the whole.
+    """
+    whole, first, second = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for value in range(1, 1001):
+        whole.record(value)
+        (first if value % 2 else second).record(value)
+    first.merge(second)
+    assert first.to_dict() == whole.to_dict()
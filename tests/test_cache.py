@@ -0,0 +1,129 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+import httpx
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.async_cognitive_services import AsyncCognitiveServicesClient
+from app.core.cache import AnalysisCache, MemoryBackend, DiskBackend, create_cache
+
+# Test that keys ignore case and whitespace differences but not the operation.
+def test_keys_are_normalized():
+    """
+    Questions that differ only in case or spacing should share one cache entry per operation.
+    """
+    cache = AnalysisCache(MemoryBackend(), namespace="v3.1")
+    assert cache.make_key("sentiment", "What are  smart cities?") == cache.make_key("sentiment", "what are smart cities? ")
+    assert cache.make_key("sentiment", "What are smart cities?") != cache.make_key("keyPhrases", "What are smart cities?")
+
+# Test hit and miss counting.
+def test_hit_and_miss_counters():
+    """
+    A miss followed by a store and a hit should be reflected in the stats.
+    """
+    cache = AnalysisCache(MemoryBackend())
+    assert cache.get("languages", "Hello") is None
+    cache.set("languages", "Hello", ["English", 0.99])
+    assert cache.get("languages", "hello") == ["English", 0.99]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+# Test least-recently-used eviction in the in-process backend.
+def test_memory_backend_evicts_least_recently_used():
+    """
+    When full, the entry that was used least recently should be dropped first.
+    """
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", "1", ttl=60)
+    backend.set("b", "2", ttl=60)
+    backend.get("a")  # 'b' is now the least recently used entry
+    backend.set("c", "3", ttl=60)
+
+    assert backend.get("a") == "1"
+    assert backend.get("b") is None
+    assert backend.get("c") == "3"
+
+# Test the memory bound of the in-process backend.
+def test_memory_backend_respects_byte_bound():
+    """
+    Entries should be evicted once their total size exceeds max_bytes.
+    """
+    backend = MemoryBackend(max_bytes=15)
+    backend.set("a", "x" * 9, ttl=60)
+    backend.set("b", "y" * 9, ttl=60)
+    assert backend.get("a") is None
+    assert backend.get("b") == "y" * 9
+
+# Test that expired entries are not returned.
+def test_entries_expire():
+    """
+    An entry should be treated as a miss once its TTL has elapsed.
+    """
+    backend = MemoryBackend()
+    backend.set("a", "1", ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get("a") is None
+
+# Test the on-disk backend, including LRU eviction.
+def test_disk_backend(tmp_path):
+    """
+    The SQLite backend should persist entries and evict the least recently used ones.
+    """
+    backend = DiskBackend(str(tmp_path / "analysis.sqlite3"), max_entries=2)
+    backend.set("a", "1", ttl=60)
+    time.sleep(0.01)
+    backend.set("b", "2", ttl=60)
+    time.sleep(0.01)
+    backend.get("a")
+    backend.set("c", "3", ttl=60)
+
+    assert backend.get("a") == "1"
+    assert backend.get("b") is None
+    assert DiskBackend(str(tmp_path / "analysis.sqlite3")).get("c") == "3"
+
+# Test that CACHE_TYPE selects the backend.
+def test_create_cache_from_setting(tmp_path, monkeypatch):
+    """
+    The factory should honor CACHE_TYPE and allow caching to be disabled.
+    """
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+    assert isinstance(create_cache("simple").backend, MemoryBackend)
+    assert isinstance(create_cache("filesystem").backend, DiskBackend)
+    assert create_cache("null") is None
+
+# Test that the async client keeps disk cache I/O off the event loop.
+def test_async_client_reads_disk_cache_off_the_loop(tmp_path):
+    """
+    Lookups and stores of a blocking backend should run on worker threads, in-memory ones on the loop.
+    """
+    threads = []
+
+    class RecordingBackend(DiskBackend):
+        def get(self, key):
+            threads.append(threading.current_thread())
+            return super().get(key)
+
+        def set(self, key, value, ttl):
+            threads.append(threading.current_thread())
+            super().set(key, value, ttl)
+
+    def handler(request):
+        return httpx.Response(200, json={"documents": [{"id": "1", "keyPhrases": ["parking"]}]})
+
+    cache = AnalysisCache(RecordingBackend(str(tmp_path / "analysis.sqlite3")))
+    client = AsyncCognitiveServicesClient(api_key="key", endpoint="https://example.test/",
+                                          transport=httpx.MockTransport(handler), cache=cache)
+
+    async def ask():
+        first = await client.extract_key_phrases("Where can I park?")
+        second = await client.extract_key_phrases("Where can I park?")
+        await client.aclose()
+        return first, second, threading.current_thread()
+
+    first, second, loop_thread = asyncio.run(ask())
+    assert first == second == ["parking"] and cache.hits == 1
+    assert len(threads) == 3 and loop_thread not in threads
+    assert cache.blocking and not AnalysisCache(MemoryBackend()).blocking
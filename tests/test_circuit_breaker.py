@@ -0,0 +1,127 @@
+import sys
+import os
+import time
+import asyncio
+import httpx
+import pytest
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core import circuit_breaker, cognitive_services
+from app.core.circuit_breaker import CLOSED, OPEN, HALF_OPEN, CircuitBreaker
+from app.core.async_cognitive_services import AsyncCognitiveServicesClient
+from app.core.cognitive_services import CognitiveServicesClient
+from app.core.deadline import DeadlineExceeded, deadline
+
+
+# Pytest fixture that gives each test its own set of process-wide breakers.
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    """
+    Fixture to isolate breaker state between tests.
+    """
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+
+# Test the closed -> open -> half-open -> closed cycle.
+def test_breaker_opens_and_recovers():
+    """
+    Enough failures should open the breaker; after the cool-down, successful probes close it.
+    """
+    breaker = CircuitBreaker("sentiment", window_size=4, min_calls=4, failure_rate=0.5, open_duration=0.05, half_open_calls=2)
+    for _ in range(2):
+        breaker.record_success(0.01)
+    for _ in range(2):
+        breaker.record_failure(0.01)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and breaker.allow()
+    assert not breaker.allow()  # only two probes at a time
+    breaker.record_success(0.01)
+    breaker.record_success(0.01)
+    assert breaker.state == CLOSED
+
+# Test that slow calls open the breaker even when they succeed.
+def test_breaker_opens_on_slow_calls():
+    """
+    A window full of calls slower than the latency threshold should open the breaker.
+    """
+    breaker = CircuitBreaker("languages", window_size=3, min_calls=3, slow_call_duration=1.0, slow_call_rate=0.6)
+    for _ in range(3):
+        breaker.record_success(1.5)
+    assert breaker.state == OPEN
+
+# Test that a failed probe sends the breaker straight back to open.
+def test_failed_probe_reopens_breaker():
+    """
+    A failure while half-open should reopen the breaker.
+    """
+    breaker = CircuitBreaker("keyPhrases", window_size=1, min_calls=1, open_duration=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+
+# Test that the client fails fast while the breaker is open.
+def test_client_skips_network_while_open(monkeypatch):
+    """
+    Once the breaker opens, further calls should return the default without calling Azure.
+    """
+    monkeypatch.setenv("CIRCUIT_BREAKER_MIN_CALLS", "2")
+    calls = []
+
+    def failing_post(self, url, **kwargs):
+        calls.append(url)
+        raise cognitive_services.requests.ConnectionError("Azure is down")
+
+    monkeypatch.setattr(cognitive_services.requests.Session, "post", failing_post)
+    client = CognitiveServicesClient(api_key="key", endpoint="https://example.test/")
+    for _ in range(5):
+        assert client.analyze_sentiment("Is the bus late?") == ("neutral", 0.5)
+
+    assert len(calls) == 2
+    assert client.circuit_open()
+    assert circuit_breaker.breaker_states()["sentiment"]["state"] == OPEN
+
+# Test that probes cut short by the deadline or cancelled give their slot back.
+def test_interrupted_probes_release_their_slot(monkeypatch):
+    """
+    A half-open probe that runs out of time, or whose task is cancelled, should
+    neither reopen the breaker nor keep the next probe from going ahead.
+    """
+    breaker = CircuitBreaker("languages", window_size=1, min_calls=1, open_duration=0.01, half_open_calls=1)
+    circuit_breaker._breakers["languages"] = breaker
+    breaker.record_failure()
+    time.sleep(0.02)
+
+    def slow_post(self, url, timeout=None, **kwargs):
+        time.sleep(timeout[1])
+        raise cognitive_services.requests.ReadTimeout("timed out")
+
+    monkeypatch.setattr(cognitive_services.requests.Session, "post", slow_post)
+    client = CognitiveServicesClient(api_key="key", endpoint="https://example.test/", cache=False)
+    with deadline(0.05), pytest.raises(DeadlineExceeded):
+        client._post("languages", [{"id": "1", "text": "Is the bus late?"}])
+    assert breaker.state == HALF_OPEN
+
+    async def stuck(request):
+        await asyncio.sleep(5)
+
+    async_client = AsyncCognitiveServicesClient(api_key="key", endpoint="https://example.test/",
+                                                transport=httpx.MockTransport(stuck), cache=False)
+
+    async def cancel_probe():
+        task = asyncio.ensure_future(async_client._post("languages", [{"id": "1", "text": "Is the bus late?"}]))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,174 @@
+import sys
+import os
+import time
+import pytest
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core import cognitive_services
+from app.core.cognitive_services import CognitiveServicesClient, TextAnalysis
+
+# Canned Text Analytics payloads keyed by the operation at the end of the URL
+FAKE_RESULTS = {
+    "languages": {"documents": [{"id": "1", "detectedLanguage": {"name": "English", "confidenceScore": 0.99}}]},
+    "keyPhrases": {"documents": [{"id": "1", "keyPhrases": ["public transit", "delays"]}]},
+    "sentiment": {"documents": [{"id": "1", "sentiment": "negative",
+                                 "confidenceScores": {"positive": 0.1, "neutral": 0.1, "negative": 0.8}}]},
+}
+
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+# Pytest fixture that replaces the HTTP layer with a slow fake Azure service.
+@pytest.fixture
+def fake_azure(monkeypatch):
+    """
+    Fixture that answers every Text Analytics POST after a fixed delay and
+    records the operations that were called.
+    """
+    calls = []
+
+    def fake_post(self, url, json=None, timeout=None, **kwargs):
+        operation = url.rsplit("/", 1)[-1]
+        calls.append((operation, timeout))
+        time.sleep(0.1)
+        return FakeResponse(FAKE_RESULTS[operation])
+
+    monkeypatch.setattr(cognitive_services.requests.Session, "post", fake_post)
+    return calls
+
+# Test that a combined analysis runs all three operations and merges their results.
+def test_analyze_combines_operations(fake_azure):
+    """
+    The combined analysis should call each operation once and return a single TextAnalysis.
+    """
+    client = CognitiveServicesClient(api_key="key", endpoint="https://example.test/")
+    analysis = client.analyze("Why is public transit so slow?")
+
+    assert sorted(operation for operation, _ in fake_azure) == ["keyPhrases", "languages", "sentiment"]
+    assert analysis == TextAnalysis("English", 0.99, ["public transit", "delays"], "negative", 0.8)
+
+# Test that the three operations are dispatched concurrently rather than one after another.
+def test_analyze_runs_operations_concurrently(fake_azure):
+    """
+    With each call taking 100 ms, the combined analysis should take about one call's latency.
+    """
+    client = CognitiveServicesClient(api_key="key", endpoint="https://example.test/")
+    start = time.perf_counter()
+    client.analyze("Is parking available downtown?")
+    assert time.perf_counter() - start < 0.25
+
+# Test the fallback values when Azure credentials are not configured.
+def test_analyze_without_credentials(monkeypatch):
+    """
+    Without credentials the client should return defaults and never touch the network.
+    """
+    monkeypatch.delenv("AZURE_API_KEY", raising=False)
+    monkeypatch.delenv("AZURE_ENDPOINT", raising=False)
+    client = CognitiveServicesClient()
+    analysis = client.analyze("What are smart cities?")
+
+    assert analysis.language == "en"
+    assert analysis.key_phrases == ["What are smart cities?"]
+    assert analysis.sentiment == "neutral"
+
+# Test that every call carries the configured connect and read timeouts.
+def test_calls_use_configured_timeouts(fake_azure):
+    """
+    Requests must never be sent without a timeout, or a slow Azure response would hang the worker.
+    """
+    client = CognitiveServicesClient(api_key="key", endpoint="https://example.test", connect_timeout=1.5, read_timeout=4)
+    client.detect_language("Where can I park?")
+
+    assert fake_azure == [("languages", (1.5, 4))]
+
+# Test that a long Retry-After header cannot stall a worker beyond the backoff cap.
+def test_retry_after_is_capped():
+    """
+    The retry policy should honor Retry-After, but never sleep longer than backoff_max.
+    """
+    retry = cognitive_services._CappedRetry(total=2, backoff_max=5)
+
+    long_wait = FakeResponse({})
+    long_wait.headers = {"Retry-After": "120"}
+    short_wait = FakeResponse({})
+    short_wait.headers = {"Retry-After": "2"}
+
+    assert retry.get_retry_after(long_wait) == 5
+    assert retry.get_retry_after(short_wait) == 2
+
+# Test that repeated questions are answered from the analysis cache.
+def test_repeated_analysis_is_cached(fake_azure):
+    """
+    Asking the same question twice should only reach Azure once per operation.
+    """
+    client = CognitiveServicesClient(api_key="key", endpoint="https://example.test/")
+    first = client.analyze("What are smart cities?")
+    second = client.analyze("what are  smart cities?")
+
+    assert first == second
+    assert len(fake_azure) == 3
+    assert client.cache.stats()["hits"] == 3
+
+# Test that a batch is packed into multi-document requests and fanned back out by id.
+def test_analyze_batch_packs_documents(monkeypatch):
+    """
+    25 distinct texts should need one language request and three requests each
+    for key phrases and sentiment, and every text should get its own result.
+    """
+    calls = []
+
+    def fake_post(self, url, json=None, timeout=None, **kwargs):
+        operation = url.rsplit("/", 1)[-1]
+        calls.append((operation, len(json["documents"])))
+        documents = []
+        for document in json["documents"]:
+            if operation == "languages":
+                documents.append({"id": document["id"], "detectedLanguage": {"name": "English", "confidenceScore": 0.9}})
+            elif operation == "keyPhrases":
+                documents.append({"id": document["id"], "keyPhrases": [document["text"].upper()]})
+            else:
+                documents.append({"id": document["id"], "sentiment": "positive",
+                                  "confidenceScores": {"positive": 0.9, "neutral": 0.05, "negative": 0.05}})
+        return FakeResponse({"documents": documents, "errors": []})
+
+    monkeypatch.setattr(cognitive_services.requests.Session, "post", fake_post)
+    client = CognitiveServicesClient(api_key="key", endpoint="https://example.test/")
+    texts = [f"question {number}" for number in range(25)] + ["Question 0"]  # the last one is a duplicate
+    analyses = client.analyze_batch(texts)
+
+    assert [analysis.key_phrases for analysis in analyses[:25]] == [[text.upper()] for text in texts[:25]]
+    assert analyses[25].key_phrases == ["QUESTION 0"]
+    assert sorted(calls) == [("keyPhrases", 5), ("keyPhrases", 10), ("keyPhrases", 10), ("languages", 25),
+                             ("sentiment", 5), ("sentiment", 10), ("sentiment", 10)]
+
+# Test that documents rejected by Azure get fallback values without affecting the others.
+def test_analyze_batch_handles_document_errors(monkeypatch):
+    """
+    A per-document error should only change the result of that document.
+    """
+    def fake_post(self, url, json=None, timeout=None, **kwargs):
+        operation = url.rsplit("/", 1)[-1]
+        if operation != "keyPhrases":
+            return FakeResponse(FAKE_RESULTS[operation])
+        return FakeResponse({"documents": [{"id": "0", "keyPhrases": ["parking"]}],
+                             "errors": [{"id": "1", "error": {"code": "InvalidDocument"}}]})
+
+    monkeypatch.setattr(cognitive_services.requests.Session, "post", fake_post)
+    client = CognitiveServicesClient(api_key="key", endpoint="https://example.test/")
+    analyses = client.analyze_batch(["Where can I park?", "x" * 6000])
+
+    assert analyses[0].key_phrases == ["parking"]
+    assert analyses[1].key_phrases == ["x" * 6000]
@@ -0,0 +1,166 @@
+import sys
+import os
+import time
+import asyncio
+import contextvars
+import httpx
+import pytest
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.agents.urban_agent import UrbanAgent
+from app.asgi import ClientDisconnected, cancel_on_disconnect
+from app.core import cognitive_services
+from app.core.async_cognitive_services import AsyncCognitiveServicesClient
+from app.core.cognitive_services import CognitiveServicesClient
+from app.core.deadline import DeadlineExceeded, check, deadline, remaining, request_budget
+
+# Canned Text Analytics payloads keyed by the operation at the end of the URL
+FAKE_RESULTS = {
+    "languages": {"documents": [{"id": "1", "detectedLanguage": {"name": "English", "confidenceScore": 0.99}}]},
+    "keyPhrases": {"documents": [{"id": "1", "keyPhrases": ["parking"]}]},
+    "sentiment": {"documents": [{"id": "1", "sentiment": "negative",
+                                 "confidenceScores": {"positive": 0.1, "neutral": 0.1, "negative": 0.8}}]},
+}
+
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class FakeRequest:
+    """Request whose client disconnects after a delay."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def receive(self):
+        await asyncio.sleep(self.delay)
+        return {"type": "http.disconnect"}
+
+# Test how the time budget of a request is chosen.
+def test_request_budget(monkeypatch):
+    """
+    A valid header should win, capped at REQUEST_TIMEOUT_MAX; anything else falls back to REQUEST_TIMEOUT.
+    """
+    monkeypatch.setenv("REQUEST_TIMEOUT", "20")
+    monkeypatch.setenv("REQUEST_TIMEOUT_MAX", "45")
+    assert request_budget("5") == 5
+    assert request_budget("600") == 45
+    assert request_budget(None) == request_budget("soon") == request_budget("-1") == request_budget("nan") == 20
+
+# Test that nested deadlines keep the earliest one.
+def test_nested_deadlines():
+    """
+    An inner deadline may shorten the budget but never extend it, and it ends with its block.
+    """
+    assert remaining() is None
+    with deadline(0.5):
+        with deadline(10):
+            assert remaining() <= 0.5
+        with deadline(0):
+            with pytest.raises(DeadlineExceeded):
+                check("test")
+        assert 0 < remaining() <= 0.5
+    assert remaining() is None
+
+# Test that a deadline inside an abandoned generator can be closed from another context.
+def test_generator_closed_from_another_context():
+    """
+    Closing a generator suspended inside deadline() from a different context should not raise.
+    """
+    def events():
+        with deadline(5):
+            yield remaining()
+
+    stream = events()
+    assert 0 < next(stream) <= 5
+    contextvars.Context().run(stream.close)
+
+# Test that Azure calls take the time left as their timeout and are skipped once it is gone.
+def test_calls_bounded_by_deadline(monkeypatch):
+    """
+    Timeouts should shrink to the remaining budget, and no call should be made after the deadline.
+    """
+    timeouts = []
+
+    def fake_post(self, url, json=None, timeout=None, **kwargs):
+        timeouts.append(timeout)
+        return FakeResponse(FAKE_RESULTS[url.rsplit("/", 1)[-1]])
+
+    monkeypatch.setattr(cognitive_services.requests.Session, "post", fake_post)
+    client = CognitiveServicesClient(api_key="key", endpoint="https://example.test/", cache=False)
+
+    with deadline(1):
+        assert client.detect_language("Is the library open?") == ("English", 0.99)
+    assert 0 < timeouts[0][0] <= 1 and 0 < timeouts[0][1] <= 1
+
+    agent = UrbanAgent()
+    agent.cognitive_client = client
+    with deadline(0):
+        response = agent.process_urban_question("Where can I park?")
+    assert len(timeouts) == 1
+    assert response == agent.fallback_response("Where can I park?")
+
+# Test that a slow stage is cut short and the finished stages still shape the answer.
+def test_partial_answer_when_budget_runs_out():
+    """
+    With sentiment slower than the budget, the answer should come back on time with the Azure key phrases.
+    """
+    async def handler(request):
+        operation = request.url.path.rsplit("/", 1)[-1]
+        if operation == "sentiment":
+            # Honour the read timeout the way a real transport would
+            await asyncio.sleep(request.extensions["timeout"]["read"])
+            raise httpx.ReadTimeout("timed out", request=request)
+        return httpx.Response(200, json=FAKE_RESULTS[operation])
+
+    agent = UrbanAgent()
+    agent.async_cognitive_client = AsyncCognitiveServicesClient(
+        api_key="key", endpoint="https://example.test/", transport=httpx.MockTransport(handler), cache=False)
+
+    async def ask():
+        with deadline(0.2):
+            return await agent.arun("Where can I leave my car?")
+
+    start = time.perf_counter()
+    response = asyncio.run(ask())
+    assert time.perf_counter() - start < 1
+    # Only the key phrases Azure returned lead to the parking answer
+    assert "parking" in response
+    assert "parking" not in agent.fallback_response("Where can I leave my car?")
+
+# Test that work is cancelled when the client disconnects.
+def test_disconnect_cancels_work():
+    """
+    The answer's task should be cancelled as soon as the client goes away.
+    """
+    cancelled = []
+
+    async def slow_answer():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def ask(request):
+        result = await cancel_on_disconnect(request, asyncio.sleep(0, "answer"))
+        with pytest.raises(ClientDisconnected):
+            await cancel_on_disconnect(FakeRequest(0.05), slow_answer())
+        await asyncio.sleep(0)
+        return result
+
+    start = time.perf_counter()
+    assert asyncio.run(ask(FakeRequest(5))) == "answer"
+    assert cancelled == [True] and time.perf_counter() - start < 1
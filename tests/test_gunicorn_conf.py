@@ -0,0 +1,72 @@
+import sys
+import os
+import json
+import runpy
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import routes
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+def load_config(monkeypatch, **env):
+    """Evaluate gunicorn.conf.py with the given environment variables set."""
+    for name in [name for name in os.environ if name.startswith("GUNICORN_")]:
+        monkeypatch.delenv(name)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")  # restored afterwards; the config sets it to the worker count
+    return runpy.run_path(CONFIG_PATH)
+
+# Test worker sizing for each worker class.
+def test_worker_sizing(monkeypatch):
+    """
+    gthread should run a process per CPU plus one with several threads each, sync 2 x CPUs + 1 single-threaded workers.
+    """
+    config = load_config(monkeypatch, PORT="8080")
+    cpus = config["cpus"]
+    assert config["bind"] == "0.0.0.0:8080"
+    assert config["worker_class"] == "gthread" and config["preload_app"]
+    assert (config["workers"], config["threads"]) == (cpus + 1, 8)
+    assert config["max_requests_jitter"] > 0
+
+    config = load_config(monkeypatch, GUNICORN_WORKER_CLASS="sync")
+    assert (config["workers"], config["threads"]) == (2 * cpus + 1, 1)
+
+    config = load_config(monkeypatch, GUNICORN_WORKERS="3", GUNICORN_THREADS="16")
+    assert (config["workers"], config["threads"]) == (3, 16)
+
+# Test that the post_fork hook gives the worker new connection pools.
+def test_post_fork_resets_connection_pools(monkeypatch):
+    """
+    After a fork, the preloaded agent's Azure clients should use new sessions and executors.
+    """
+    config = load_config(monkeypatch)
+    routes.warm_up(connect=False)
+    client = routes.urban_agent.cognitive_client
+    session, executor = client.session, client._executor
+    routes.urban_agent.async_cognitive_client._client = object()
+
+    config["post_fork"](server=None, worker=None)
+
+    assert client.session is not session and client._executor is not executor
+    assert routes.urban_agent.async_cognitive_client._client is None
+
+# Test that the child_exit hook archives the metrics file of the exited worker.
+def test_child_exit_archives_worker_metrics(monkeypatch, tmp_path):
+    """
+    The master should fold an exited worker's metrics file into the archive of METRICS_MULTIPROC_DIR.
+    """
+    from app.core.metrics import REGISTRY
+
+    class Worker:
+        pid = 2 ** 22 + 1
+
+    config = load_config(monkeypatch, METRICS_MULTIPROC_DIR=str(tmp_path))
+    monkeypatch.setattr(REGISTRY, "multiproc_dir", str(tmp_path))
+    (tmp_path / f"metrics_{Worker.pid}.json").write_text(json.dumps({"urban_http_requests_total": {}}))
+
+    config["child_exit"](server=None, worker=Worker())
+
+    assert os.listdir(tmp_path) == ["metrics_archive.json"]
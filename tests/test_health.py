@@ -0,0 +1,79 @@
+import sys
+import os
+import time
+import threading
+import pytest
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.health import HealthProber
+
+
+# Pytest fixture that creates a Flask test client with a stubbed background check.
+@pytest.fixture
+def client(monkeypatch):
+    """
+    Fixture to create a test client whose health prober never calls Azure.
+    """
+    from app import create_app
+    from app import routes
+    monkeypatch.setattr(routes, "health_prober", HealthProber({"cognitive_services": lambda: "up"}, interval=60))
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+# Test that snapshots never wait for a slow check.
+def test_snapshot_does_not_block_on_checks():
+    """
+    A check hanging on the network should not delay the snapshot; it reports 'unknown' until it finishes.
+    """
+    release = threading.Event()
+
+    def slow_check():
+        release.wait(2)
+        return "up"
+
+    prober = HealthProber({"cognitive_services": slow_check}, interval=60)
+    start = time.perf_counter()
+    snapshot = prober.snapshot()
+    assert time.perf_counter() - start < 0.1
+    assert snapshot["cognitive_services"]["status"] == "unknown"
+    assert not prober.ready
+
+    release.set()
+    deadline = time.monotonic() + 1
+    while not prober.ready and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert prober.ready
+    assert prober.snapshot()["cognitive_services"]["status"] == "up"
+
+# Test that a failing check is reported as down with its timing.
+def test_failing_check_reports_down():
+    """
+    An exception raised by a check should mark the service down, not break the prober.
+    """
+    def broken_check():
+        raise RuntimeError("boom")
+
+    prober = HealthProber({"cognitive_services": broken_check}, interval=60)
+    prober.probe()
+    result = prober.snapshot()["cognitive_services"]
+    assert result["status"] == "down"
+    assert result["checked_at"] is not None
+    assert result["latency_ms"] >= 0
+
+# Test the Flask health, liveness and readiness endpoints.
+def test_health_endpoints(client):
+    """
+    Liveness should always pass; readiness and the cached health report follow the first check.
+    """
+    from app import routes
+    assert client.get('/api/health/live').get_json() == {"status": "alive"}
+
+    routes.health_prober.probe()
+    assert client.get('/api/health/ready').status_code == 200
+    response = client.get('/api/health')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'healthy'
+    assert response.get_json()['services']['cognitive_services'] == 'up'
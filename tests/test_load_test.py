@@ -0,0 +1,51 @@
+import sys
+import os
+import json
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import load_test
+
+# Test that a ramped schedule starts at the first rate and ends near the last.
+def test_arrival_times_ramp():
+    """
+    Ramping from 10 to 30 requests per second over 2 seconds should send about 40 requests, denser at the end.
+    """
+    times = load_test.arrival_times(10, 30, 2)
+    assert 38 <= len(times) <= 42
+    assert abs((times[1] - times[0]) - 0.1) < 1e-9
+    assert times[-1] - times[-2] < 0.04
+
+# Test that payload files of different shapes become requests.
+def test_load_payloads_shapes(tmp_path):
+    """
+    Full requests, request bodies and free-text lines should all be replayable.
+    """
+    path = tmp_path / "payloads.jsonl"
+    path.write_text("\n".join([
+        json.dumps({"endpoint": "/api/ask/batch", "data": {"questions": ["a", "b"]}}),
+        json.dumps({"question": "Where can I park?"}),
+        json.dumps({"request_id": "r1", "title": "Faster answers", "body": "Make it fast"}),
+        "",
+    ]))
+    payloads = load_test.load_payloads(str(path), "/api/ask", "POST")
+    assert payloads == [
+        ("/api/ask/batch", "POST", {"questions": ["a", "b"]}),
+        ("/api/ask", "POST", {"question": "Where can I park?"}),
+        ("/api/ask", "POST", {"question": "Make it fast"}),
+    ]
+
+# Test that the first window that falls behind its offered load is reported as saturated.
+def test_saturation_window():
+    """
+    A window where only half the offered requests complete should be the saturation point.
+    """
+    results = []
+    for second, completed_share in ((0, 1.0), (1, 1.0), (2, 0.5)):
+        for index in range(10):
+            ok = index < completed_share * 10
+            results.append({"scheduled": second + index / 10, "completed": second + index / 10 + 0.01,
+                            "latency": 0.01, "success": ok})
+    rows, saturation = load_test.summarize_windows(results, 1.0, None)
+    assert len(rows) == 3
+    assert saturation["start"] == 2
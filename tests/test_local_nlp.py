@@ -0,0 +1,53 @@
+import sys
+import os
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.local_nlp import LocalAnalyzer, LocalFastPath
+
+analyzer = LocalAnalyzer()
+
+# Test language identification on a few cities' worth of languages.
+def test_detect_language():
+    """
+    Trigram profiles should tell common languages apart.
+    """
+    assert analyzer.detect_language("Where can I find parking downtown?")[0] == "English"
+    assert analyzer.detect_language("¿Dónde puedo encontrar estacionamiento en el centro?")[0] == "Spanish"
+    assert analyzer.detect_language("Wo finde ich einen Parkplatz in der Innenstadt?")[0] == "German"
+
+# Test the lexicon sentiment scorer, including negation.
+def test_analyze_sentiment():
+    """
+    Sentiment words should decide polarity and negations should flip it.
+    """
+    assert analyzer.analyze_sentiment("The bus is always late and dirty")[0] == "negative"
+    assert analyzer.analyze_sentiment("Thanks, the new park is great")[0] == "positive"
+    assert analyzer.analyze_sentiment("The street is not safe at night")[0] == "negative"
+    assert analyzer.analyze_sentiment("What are smart cities?") == ("neutral", 0.9)
+
+# Test the rule-based key phrase extractor.
+def test_extract_key_phrases():
+    """
+    Key phrases should be the runs of content words between stop words.
+    """
+    assert analyzer.extract_key_phrases("What are smart cities?") == ["smart cities"]
+    assert analyzer.extract_key_phrases("Is public transit running on the blue line?") == ["public transit running", "blue line"]
+
+# Test path selection and counters for each mode.
+def test_fast_path_modes():
+    """
+    Remote never answers locally, local always does, and hybrid only above the threshold.
+    """
+    remote = LocalFastPath(mode="remote")
+    local = LocalFastPath(mode="local")
+    hybrid = LocalFastPath(mode="hybrid", threshold=0.85)
+
+    assert remote.try_local("What are smart cities?") is None
+    assert local.try_local("hello") is not None
+    assert hybrid.try_local("What are smart cities?").key_phrases == ["smart cities"]
+    assert hybrid.try_local("hello") is None
+
+    assert remote.stats()["remote"] == 1
+    assert local.stats()["local"] == 1
+    assert hybrid.stats()["local"] == 1 and hybrid.stats()["escalated"] == 1
@@ -0,0 +1,91 @@
+import sys
+import os
+import json
+import queue
+import logging
+import pytest
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import logging_config
+from app.logging_config import AsyncQueueHandler, JsonFormatter, SamplingFilter, parse_sampling
+
+
+def make_record(name="app.agents.urban_agent", level=logging.INFO, msg="Answering %s", args=("parking",), **extra):
+    """Build a log record as a logger call would."""
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+# Pytest fixture that restores the default handlers after a test reconfigured logging.
+@pytest.fixture
+def restore_logging():
+    """
+    Fixture to reinstall the default logging handlers once the test is done.
+    """
+    yield
+    logging_config.configure_root_logger()
+
+# Test the JSON record layout.
+def test_json_formatter_includes_extra_fields():
+    """
+    Records should become JSON objects carrying the message, the trace id and fields passed in 'extra'.
+    """
+    record = make_record(trace_id="0af7651916cd43dd8448eb211c80319c", path="/api/ask", status=200)
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Answering parking"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "app.agents.urban_agent"
+    assert entry["trace_id"] == "0af7651916cd43dd8448eb211c80319c"
+    assert entry["path"] == "/api/ask" and entry["status"] == 200
+
+# Test that a full queue drops records instead of blocking.
+def test_queue_handler_drop_policies():
+    """
+    'drop_new' should keep the queued records, 'drop_old' the latest ones; both count the drops.
+    Records should be queued unformatted.
+    """
+    drop_new = AsyncQueueHandler(queue.Queue(maxsize=2), drop_policy="drop_new")
+    drop_old = AsyncQueueHandler(queue.Queue(maxsize=2), drop_policy="drop_old")
+    for handler in (drop_new, drop_old):
+        for number in range(5):
+            handler.handle(make_record(args=(number,)))
+
+    assert drop_new.dropped_records == 3
+    assert [record.args for record in drop_new.queue.queue] == [(0,), (1,)]
+    assert drop_old.dropped_records == 3
+    assert [record.args for record in drop_old.queue.queue] == [(3,), (4,)]
+    assert drop_new.queue.queue[0].msg == "Answering %s"  # formatting is left to the writer thread
+
+# Test per-logger sampling.
+def test_sampling_filter_applies_to_logger_and_children():
+    """
+    A rate of zero should silence a logger's INFO records, including its children's, but never warnings.
+    """
+    sampling = SamplingFilter(parse_sampling("app.agents=0, app.core.cache=1"))
+    assert not sampling.filter(make_record(name="app.agents.urban_agent"))
+    assert sampling.filter(make_record(name="app.agents.urban_agent", level=logging.WARNING))
+    assert sampling.filter(make_record(name="app.core.cache"))
+    assert sampling.filter(make_record(name="app.routes"))
+
+# Test that create_app wires request logging without duplicating handlers.
+def test_create_app_logs_requests_as_json(monkeypatch, capsys, restore_logging):
+    """
+    Each request should be logged once as JSON, even after the app was created twice.
+    """
+    from app import create_app
+    monkeypatch.setenv("LOG_ASYNC", "False")
+    create_app()
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        client.post('/api/ask', json={'question': 'Where can I park?'})
+        client.get('/api/health/live')
+
+    lines = [json.loads(line) for line in capsys.readouterr().err.splitlines() if line.startswith("{")]
+    requests_logged = [line for line in lines if line.get("path") == "/api/ask"]
+    assert len(requests_logged) == 1
+    assert requests_logged[0]["status"] == 200
+    assert len(requests_logged[0]["trace_id"]) == 32
+    assert not any(line.get("path") == "/api/health/live" for line in lines)
@@ -0,0 +1,160 @@
+import sys
+import os
+import json
+import time
+import pytest
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+# A process id that cannot belong to a running process (above the Linux pid_max limit)
+DEAD_PID = 2 ** 22 + 1
+
+
+# Pytest fixture that creates a Flask test client.
+@pytest.fixture
+def client():
+    """
+    Fixture to create a test client for the Flask app.
+    """
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+# Test the text exposition format of each metric type.
+def test_render_exposition_format():
+    """
+    Counters, gauges and histograms should render with labels, cumulative buckets, sum and count.
+    """
+    registry = MetricsRegistry(multiproc_dir="")
+    requests = Counter("requests_total", "Requests", ("route",), registry=registry)
+    in_flight = Gauge("in_flight", "In flight", registry=registry)
+    latency = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0), registry=registry)
+
+    requests.labels(route="/api/ask").inc()
+    requests.labels(route="/api/ask").inc(2)
+    in_flight.inc()
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/api/ask"} 3.0' in text
+    assert "in_flight 1.0" in text
+    assert 'latency_seconds_bucket{le="0.1"} 2.0' in text
+    assert 'latency_seconds_bucket{le="1.0"} 3.0' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4.0' in text
+    assert "latency_seconds_sum 3.65" in text
+    assert "latency_seconds_count 4.0" in text
+
+# Test that values written by other worker processes are aggregated.
+def test_multiprocess_aggregation(tmp_path):
+    """
+    Counters and histograms from every worker file should be summed; gauges of exited workers dropped.
+    """
+    registry = MetricsRegistry(multiproc_dir=str(tmp_path))
+    requests = Counter("requests_total", "Requests", ("route",), registry=registry)
+    in_flight = Gauge("in_flight", "In flight", registry=registry)
+    latency = Histogram("latency_seconds", "Latency", buckets=(0.1,), registry=registry)
+    requests.labels(route="/api/ask").inc()
+    in_flight.inc()
+    latency.observe(0.05)
+
+    # A live sibling worker and one that has exited
+    for pid in (os.getppid(), DEAD_PID):
+        (tmp_path / f"metrics_{pid}.json").write_text(json.dumps({
+            "requests_total": {json.dumps(["/api/ask"]): 2.0},
+            "in_flight": {json.dumps([]): 1.0},
+            "latency_seconds": {json.dumps([]): [[0, 1], 0.5]},
+        }))
+
+    text = registry.render()
+    assert 'requests_total{route="/api/ask"} 5.0' in text
+    assert "in_flight 2.0" in text  # this process and the live sibling only
+    assert 'latency_seconds_bucket{le="0.1"} 1.0' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3.0' in text
+
+    # This process's own values are flushed for the other workers to read
+    registry.flush()
+    own = json.loads((tmp_path / f"metrics_{os.getpid()}.json").read_text())
+    assert own["requests_total"] == {json.dumps(["/api/ask"]): 1.0}
+
+# Test that gauges of a shared value report the latest one instead of a sum.
+def test_latest_gauges_not_summed_across_workers(tmp_path):
+    """
+    A "latest" gauge should show the value set most recently by a live worker, not the total of all workers.
+    """
+    registry = MetricsRegistry(multiproc_dir=str(tmp_path))
+    remaining = Gauge("budget_remaining", "Budget left", registry=registry, multiprocess_mode="latest")
+    remaining.set(90)
+    set_at = remaining.labels().updated
+
+    siblings = {os.getppid(): [80.0, set_at + 0.001], DEAD_PID: [10.0, set_at + 2]}
+    for pid, value in siblings.items():
+        (tmp_path / f"metrics_{pid}.json").write_text(json.dumps({"budget_remaining": {json.dumps([]): value}}))
+    assert "\nbudget_remaining 80.0\n" in registry.render()  # the live sibling's newer value
+
+    time.sleep(0.01)
+    remaining.set(70)
+    assert "\nbudget_remaining 70.0\n" in registry.render()
+    with pytest.raises(ValueError):
+        Gauge("other", "Other", registry=registry, multiprocess_mode="average")
+
+# Test that the file of an exited worker is folded into the archive.
+def test_mark_process_dead_archives_worker_file(tmp_path):
+    """
+    The worker's file should be deleted while its counters and histograms, but not its gauges, still add up.
+    """
+    registry = MetricsRegistry(multiproc_dir=str(tmp_path))
+    Counter("requests_total", "Requests", registry=registry)
+    Gauge("in_flight", "In flight", registry=registry)
+    Histogram("latency_seconds", "Latency", buckets=(0.1,), registry=registry)
+    for pid in (DEAD_PID, DEAD_PID + 1):
+        (tmp_path / f"metrics_{pid}.json").write_text(json.dumps({
+            "requests_total": {json.dumps([]): 2.0},
+            "in_flight": {json.dumps([]): 1.0},
+            "latency_seconds": {json.dumps([]): [[1, 0], 0.05]},
+        }))
+
+    registry.mark_process_dead(DEAD_PID)
+    registry.mark_process_dead(DEAD_PID + 1)
+    registry.mark_process_dead(DEAD_PID + 2)  # never flushed
+
+    assert os.listdir(tmp_path) == ["metrics_archive.json"]
+    text = registry.render()
+    assert "requests_total 4.0" in text
+    assert "\nin_flight " not in text
+    assert 'latency_seconds_bucket{le="0.1"} 2.0' in text
+
+# Test that a forked worker starts from zero.
+def test_start_resets_values_inherited_across_fork():
+    """
+    When the process id changes, values recorded by the parent should be dropped in place.
+    """
+    registry = MetricsRegistry(multiproc_dir="")
+    requests = Counter("requests_total", "Requests", registry=registry)
+    child = requests.labels()
+    child.inc(5)
+
+    registry._pid = -1  # pretend the values were recorded before a fork
+    registry.start()
+    child.inc()
+    assert "requests_total 1.0" in registry.render()
+
+# Test the Flask metrics endpoint.
+def test_metrics_route(client):
+    """
+    '/metrics' should report per-route request counts and the serialization stage after a question.
+    """
+    client.post('/api/ask', json={'question': 'Where can I park?'})
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    text = response.get_data(as_text=True)
+    assert 'urban_http_requests_total{method="POST",route="/api/ask",status="200"}' in text
+    assert 'urban_http_request_duration_seconds_count{method="POST",route="/api/ask"}' in text
+    assert 'urban_stage_duration_seconds_count{stage="serialization"}' in text
+    assert 'urban_stage_duration_seconds_count{stage="topic_match"}' in text
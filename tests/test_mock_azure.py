@@ -0,0 +1,99 @@
+import sys
+import os
+import random
+import pytest
+import requests
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.mock_azure import LatencyDistribution
+from app.core import circuit_breaker
+from app.core.cognitive_services import CognitiveServicesClient
+
+
+def post(mock, operation, documents, **params):
+    return requests.post(f"{mock.endpoint}text/analytics/v3.1/{operation}", json={"documents": documents},
+                         params=params, timeout=5)
+
+# Test the languages, keyPhrases and sentiment contracts on a multi-document batch.
+def test_mock_azure_contracts(mock_azure):
+    """
+    Each operation should return one result per valid document, and per-document errors for empty ones.
+    """
+    documents = [{"id": "1", "text": "The bus is late again. But the new park is great!"},
+                 {"id": "2", "text": "¿Dónde está la biblioteca?"},
+                 {"id": "3", "text": ""}]
+
+    languages = post(mock_azure, "languages", documents).json()
+    assert [doc["detectedLanguage"]["iso6391Name"] for doc in languages["documents"]] == ["en", "es"]
+    assert languages["errors"][0]["id"] == "3"
+    assert languages["errors"][0]["error"]["innererror"]["code"] == "InvalidDocument"
+
+    sentiment = post(mock_azure, "sentiment", documents, showStats="true").json()
+    first = sentiment["documents"][0]
+    assert first["sentiment"] == "mixed"
+    assert [sentence["sentiment"] for sentence in first["sentences"]] == ["negative", "positive"]
+    assert sentiment["statistics"]["validDocumentsCount"] == 2
+
+    phrases = post(mock_azure, "keyPhrases", documents[:1]).json()
+    assert "park" in phrases["documents"][0]["keyPhrases"]
+
+# Test that invalid batches are rejected the way Azure rejects them.
+def test_mock_azure_validates_batches(mock_azure):
+    """
+    Too many documents or duplicated ids should be answered with 400 and an Azure error code.
+    """
+    too_many = [{"id": str(index), "text": "hello"} for index in range(11)]
+    response = post(mock_azure, "sentiment", too_many)
+    assert response.status_code == 400
+    assert response.json()["error"]["innererror"]["code"] == "InvalidDocumentBatch"
+    assert post(mock_azure, "languages", too_many).status_code == 200  # languages accepts up to 1000
+
+    duplicated = [{"id": "1", "text": "a"}, {"id": "1", "text": "b"}]
+    assert post(mock_azure, "keyPhrases", duplicated).status_code == 400
+    assert mock_azure.stats()["rejected"] == 2
+
+# Test that injected throttling and the quota answer 429 with Retry-After.
+def test_mock_azure_throttles(mock_azure):
+    """
+    A request beyond the per-second quota, or picked by the throttle rate, should get 429 and Retry-After.
+    """
+    documents = [{"id": "1", "text": "hello"}]
+    mock_azure.tps = 2
+    mock_azure._quota_tokens = 2
+    statuses = [post(mock_azure, "languages", documents).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+
+    mock_azure.tps = 0
+    mock_azure.throttle_rate, mock_azure.retry_after = 1.0, 3
+    response = post(mock_azure, "languages", documents)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    assert mock_azure.stats()["throttled"] == 2
+
+# Test that the client retries injected 429s and then falls back.
+def test_client_retries_throttled_calls(mock_azure, monkeypatch):
+    """
+    With every call throttled, the client should try max_retries + 1 times and return the fallback sentiment.
+    """
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    mock_azure.throttle_rate, mock_azure.retry_after = 1.0, 0
+    client = CognitiveServicesClient(api_key="key", endpoint=mock_azure.endpoint, max_retries=2,
+                                     backoff_factor=0, cache=False)
+    assert client.analyze_sentiment("The park is great") == ("neutral", 0.5)
+    assert mock_azure.stats()["throttled"] == 3
+
+# Test that latency distributions parse and sample as specified.
+def test_latency_distributions():
+    """
+    Every supported spec should parse, seeded samples should repeat, and delays should never be negative.
+    """
+    for spec in ("fixed:40", "uniform:20:80", "normal:50:10", "lognormal:40:0.5", "exponential:50"):
+        distribution = LatencyDistribution.parse(spec)
+        assert str(distribution) == spec
+        first = [distribution.sample(random.Random(1)) for _ in range(3)]
+        assert first == [distribution.sample(random.Random(1)) for _ in range(3)]
+        assert all(value >= 0 for value in first)
+    assert LatencyDistribution.parse("normal:0:100").sample(random.Random(3)) >= 0
+    with pytest.raises(ValueError):
+        LatencyDistribution.parse("pareto:1")
@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+import pytest
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter, MovingWindowRateLimiter
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.rate_limit_storage import SQLiteStorage
+
+
+# Pytest fixture that creates a Flask test client.
+@pytest.fixture
+def client():
+    """
+    Fixture to create a test client for the Flask app.
+    """
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+# Test that two workers share one moving window.
+def test_moving_window_shared_between_workers(tmp_path):
+    """
+    Two storages on the same file, as in two gunicorn workers, should count against a single limit.
+    """
+    uri = f"sqlite://{tmp_path / 'ratelimit.db'}"
+    first, second = storage_from_string(uri), storage_from_string(uri)
+    assert isinstance(first, SQLiteStorage)
+
+    limit = parse("3 per minute")
+    workers = [MovingWindowRateLimiter(first), MovingWindowRateLimiter(second)]
+    results = [workers[number % 2].hit(limit, "127.0.0.1") for number in range(5)]
+    assert results == [True, True, True, False, False]
+
+    oldest, count = first.get_moving_window(limit.key_for("127.0.0.1"), 3, 60)
+    assert count == 3 and oldest <= time.time()
+
+# Test the fixed-window counters and their expiry.
+def test_fixed_window_counter_expires(tmp_path):
+    """
+    A counter should be shared, and start again from the increment once its window has expired.
+    """
+    uri = f"sqlite://{tmp_path / 'ratelimit.db'}"
+    first, second = storage_from_string(uri), storage_from_string(uri)
+    assert first.incr("key", 0.05) == 1
+    assert second.incr("key", 0.05) == 2
+    assert first.get("key") == 2
+
+    time.sleep(0.06)
+    assert first.get("key") == 0
+    assert second.incr("key", 60) == 1
+
+    limiter = FixedWindowRateLimiter(first)
+    assert limiter.hit(parse("1 per minute"), "other")
+    assert not limiter.hit(parse("1 per minute"), "other")
+
+# Test that the configured per-route limit is enforced.
+def test_ask_route_limit_enforced(client):
+    """
+    '/api/ask' should reject the eleventh question within a minute with the default limit.
+    """
+    statuses = [client.post('/api/ask', json={'question': 'Where can I park?'}).status_code for _ in range(11)]
+    assert statuses == [200] * 10 + [429]
@@ -101,3 +101,24 @@ def test_ask_route_valid_question(client):
     assert 'response' in response.get_json()
 
 
+
+# Test the batch route with a mix of valid and invalid questions.
+def test_ask_batch_route(client):
+    """
+    Test the '/api/ask/batch' route returns one result per question, in order,
+    with an error for invalid items.
+    """
+    response = client.post('/api/ask/batch', json={'questions': ['Is there traffic downtown?', '', 'What about parking?']})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert 'response' in results[0] and 'response' in results[2]
+    assert 'error' in results[1]
+
+# Test the batch route without a list of questions.
+def test_ask_batch_route_no_questions(client):
+    """
+    Test the '/api/ask/batch' route rejects a missing or empty list of questions.
+    """
+    response = client.post('/api/ask/batch', json={'questions': []})
+    assert response.status_code == 400
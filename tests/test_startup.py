@@ -0,0 +1,60 @@
+import sys
+import os
+import subprocess
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import routes
+from app.agents.urban_agent import UrbanAgent
+from benchmarks.startup import parse_importtime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(code):
+    """Run code in a fresh interpreter without DB_PASSWORD and return its output."""
+    environment = {name: value for name, value in os.environ.items() if name != "DB_PASSWORD"}
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=dict(environment, PYTHONPATH=ROOT),
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout.split()
+
+# Test that importing the applications builds nothing and loads only what they use.
+def test_imports_are_lazy():
+    """
+    The WSGI app should import without DB_PASSWORD or an agent, and the ASGI app without the Flask extensions.
+    """
+    built = run_python("import wsgi, app.routes; print('urban_agent' in vars(app.routes))")
+    assert built == ["False"]
+
+    loaded = run_python("import sys, app.asgi; print(*(name in sys.modules for name in "
+                        "('flask_limiter', 'flask_swagger_ui', 'httpx')))")
+    assert loaded == ["False", "False", "False"]
+
+# Test that warming up builds the components and clients ahead of the first request.
+def test_warm_up_builds_components():
+    """
+    After warm_up, the agent, its clients and the answer cache should exist without any request.
+    """
+    routes.warm_up(connect=False)
+    assert {'urban_agent', 'health_prober', 'answer_cache'} <= set(vars(routes))
+    assert '_cognitive_client' in vars(routes.urban_agent)
+
+    agent = UrbanAgent()
+    assert agent.cognitive_client is agent.cognitive_client
+    assert '_async_cognitive_client' not in vars(agent)
+
+# Test parsing of the -X importtime report.
+def test_parse_importtime():
+    """
+    Each module line should become an entry with its depth and times in seconds.
+    """
+    report = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |     json.decoder",
+        "import time:       300 |        420 |   json",
+    ])
+    assert parse_importtime(report) == [
+        {"module": "json.decoder", "depth": 2, "self": 0.00012, "cumulative": 0.00012},
+        {"module": "json", "depth": 1, "self": 0.0003, "cumulative": 0.00042},
+    ]
@@ -0,0 +1,154 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import httpx
+from starlette.testclient import TestClient
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.agents.urban_agent import UrbanAgent
+from app.asgi import create_asgi_app
+from app.core.agent_base import AgentBase
+from app.core.agent_router import AgentRouter
+from app.core.async_cognitive_services import AsyncCognitiveServicesClient
+from app.core.streaming import chunk_text, format_event
+
+# Canned Text Analytics payloads keyed by the operation at the end of the URL
+FAKE_RESULTS = {
+    "languages": {"documents": [{"id": "1", "detectedLanguage": {"name": "English", "confidenceScore": 0.99}}]},
+    "keyPhrases": {"documents": [{"id": "1", "keyPhrases": ["parking"]}]},
+    "sentiment": {"documents": [{"id": "1", "sentiment": "neutral",
+                                 "confidenceScores": {"positive": 0.1, "neutral": 0.8, "negative": 0.1}}]},
+}
+
+
+def streaming_agent(delays=None, finished=None):
+    """
+    Build an agent whose fake Azure answers each operation after its own delay in seconds.
+    Operations whose answer was sent are appended to 'finished'.
+    """
+    delays = delays or {}
+
+    async def handler(request):
+        operation = request.url.path.rsplit("/", 1)[-1]
+        await asyncio.sleep(delays.get(operation, 0))
+        if finished is not None:
+            finished.append(operation)
+        return httpx.Response(200, json=FAKE_RESULTS[operation])
+
+    agent = UrbanAgent()
+    agent.async_cognitive_client = AsyncCognitiveServicesClient(
+        api_key="key", endpoint="https://example.test/", transport=httpx.MockTransport(handler), cache=False)
+    return agent
+
+
+def parse_events(text):
+    """Split a text/event-stream body into (event, data) pairs."""
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+# Test the event sequence of a streamed answer.
+def test_stream_emits_analysis_then_answer_chunks():
+    """
+    The stream should report the three analyses, then answer chunks that add up to the final response.
+    """
+    with TestClient(create_asgi_app(streaming_agent())) as client:
+        response = client.post('/api/ask/stream', json={'question': 'Where can I find parking downtown?'})
+    assert response.headers['content-type'].startswith('text/event-stream')
+    assert response.headers['cache-control'] == 'no-cache'
+
+    events = parse_events(response.text)
+    names = [name for name, _ in events]
+    assert sorted(names[:3]) == ['key_phrases', 'language', 'sentiment']
+    assert names[-1] == 'done' and set(names[3:-1]) == {'answer'}
+    done = events[-1][1]['response']
+    assert ''.join(data['text'] for name, data in events if name == 'answer') == done
+    assert dict(events)['key_phrases'] == {'key_phrases': ['parking'], 'source': 'azure'}
+
+# Test that each analysis is reported as soon as it is ready.
+def test_stream_reports_fast_analyses_first():
+    """
+    With sentiment slow, the language and key phrase events should arrive well before it.
+    """
+    agent = streaming_agent({"sentiment": 0.3})
+
+    async def first_events():
+        start = time.perf_counter()
+        arrivals = []
+        async for name, _ in agent.astream('Where can I find parking downtown?'):
+            arrivals.append((name, time.perf_counter() - start))
+        return arrivals
+
+    arrivals = asyncio.run(first_events())
+    assert 'sentiment' not in [name for name, _ in arrivals[:2]]
+    assert arrivals[2][0] == 'sentiment'
+    assert arrivals[0][1] < 0.2 <= arrivals[2][1]
+
+# Test that closing a stream cancels the analyses still in flight.
+def test_closing_stream_cancels_pending_calls():
+    """
+    A client going away after the first event should stop the slower Azure calls.
+    """
+    finished = []
+    agent = streaming_agent({"keyPhrases": 0.3, "sentiment": 0.3}, finished)
+
+    async def read_one_event():
+        stream = agent.astream('Where can I find parking downtown?')
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.4)
+        return first
+
+    assert asyncio.run(read_one_event())[0] == 'language'
+    assert finished == ['languages']
+
+# Test that a cached answer is streamed without running the agent.
+def test_stream_serves_cached_answers():
+    """
+    Once an answer is cached, streaming it again should skip the analysis events.
+    """
+    with TestClient(create_asgi_app(streaming_agent())) as client:
+        client.post('/api/ask', json={'question': 'Is the library open?'})
+        events = parse_events(client.post('/api/ask/stream', json={'question': 'Is the library open?'}).text)
+    assert {name for name, _ in events} == {'answer', 'done'}
+
+# Test that an agent without astream streams its whole answer, routed once.
+def test_stream_from_agent_without_astream():
+    """
+    A question for an agent that cannot stream should be classified once and its answer sent in chunks.
+    """
+    class TransitAgent(AgentBase):
+        name = "transit"
+        keywords = ("bus",)
+
+        def run(self, question):
+            return "The next bus leaves in five minutes."
+
+    class CountingRouter(AgentRouter):
+        def classify(self, question):
+            self.classified = getattr(self, "classified", 0) + 1
+            return super().classify(question)
+
+    router = CountingRouter()
+    router.register(TransitAgent())
+    router.register(streaming_agent(), default=True)
+    with TestClient(create_asgi_app(router.get("urban").agent, router)) as client:
+        events = parse_events(client.post('/api/ask/stream', json={'question': 'When is the next bus?'}).text)
+    assert events[-1] == ('done', {'response': "The next bus leaves in five minutes."})
+    assert router.classified == 1
+
+# Test the event framing helpers.
+def test_chunk_text_and_format_event():
+    """
+    Chunks should concatenate back to the text, and events should be framed as SSE.
+    """
+    text = " Thank you for your question about urban services. Could you provide more specifics?"
+    chunks = chunk_text(text, words=4)
+    assert len(chunks) == 4 and ''.join(chunks) == text
+    assert chunk_text("") == [""]
+    assert format_event("answer", {"text": "hi"}) == 'event: answer\ndata: {"text": "hi"}\n\n'
@@ -0,0 +1,84 @@
+import sys
+import os
+import json
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.topics import Topic, TopicIndex, TopicTable, DEFAULT_TOPICS_FILE
+
+
+def write_topics(path, topics):
+    """Write a topic data file from (name, patterns, response) tuples."""
+    path.write_text(json.dumps({"topics": [
+        {"name": name, "patterns": patterns, "response": response} for name, patterns, response in topics
+    ]}))
+
+# Test that the compiled index matches substrings and respects table order.
+def test_index_matches_like_substring_search():
+    """
+    Patterns should match anywhere in a phrase, case-insensitively, with earlier topics winning.
+    """
+    index = TopicIndex([
+        Topic("traffic", "traffic answer", ["traffic", "congestion"]),
+        Topic("event", "event answer", ["event"]),
+        Topic("public transit", "transit answer", ["public transit"]),
+    ])
+
+    assert index.match_phrase("Upcoming EVENTS").name == "event"
+    assert index.match_phrase("public transit and traffic").name == "traffic"
+    assert index.match_phrase("rush hour congestion").name == "traffic"
+    assert index.match_phrase("zoning rules") is None
+    assert index.match(["zoning rules", "public transit"]).name == "public transit"
+
+# Test that matching agrees with a naive scan over a table with overlapping patterns.
+def test_index_agrees_with_naive_scan():
+    """
+    The automaton should give the same answer as checking every pattern in order.
+    """
+    topics = [Topic(f"t{number}", str(number), [pattern]) for number, pattern in
+              enumerate(["she", "he", "hers", "his", "park", "parking lot", "bus", "us"])]
+    index = TopicIndex(topics)
+    phrases = ["ushers", "parking lot", "a bus stop", "this", "nothing", "hishe"]
+
+    for phrase in phrases:
+        expected = next((topic for topic in topics if topic.patterns[0] in phrase), None)
+        assert index.match_phrase(phrase) == expected
+
+# Test that the bundled table loads.
+def test_default_topic_file_loads():
+    """
+    The shipped topic file should compile and include the original topics.
+    """
+    index = TopicIndex.from_file(DEFAULT_TOPICS_FILE)
+    assert [topic.name for topic in index.topics][:5] == ["traffic", "parking", "weather", "event", "public transit"]
+    assert index.version
+
+# Test that the table picks up changes to the data file without a restart.
+def test_table_reloads_changed_file(tmp_path):
+    """
+    After the data file changes, the next lookup should use the new topics.
+    """
+    path = tmp_path / "topics.json"
+    write_topics(path, [("parking", ["parking"], "old answer")])
+    table = TopicTable(str(path), check_interval=0)
+    old_version = table.version
+
+    write_topics(path, [("parking", ["parking", "garage"], "new answer")])
+    os.utime(path, (os.path.getmtime(path) + 1, os.path.getmtime(path) + 1))
+
+    assert table.index.match_phrase("garage").response == "new answer"
+    assert table.version != old_version
+
+# Test that a broken data file does not replace a working table.
+def test_table_keeps_previous_index_on_bad_file(tmp_path):
+    """
+    A file that fails to parse should be ignored and the previous table kept.
+    """
+    path = tmp_path / "topics.json"
+    write_topics(path, [("parking", ["parking"], "answer")])
+    table = TopicTable(str(path), check_interval=0)
+
+    path.write_text("{not json")
+    os.utime(path, (os.path.getmtime(path) + 1, os.path.getmtime(path) + 1))
+
+    assert table.index.match_phrase("parking").response == "answer"
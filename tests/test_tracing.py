@@ -0,0 +1,152 @@
+import sys
+import os
+import json
+import pytest
+import requests
+
+# Add the root directory to the Python path so that modules can be imported correctly.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.core.cognitive_services import CognitiveServicesClient
+from app.core.tracing import FileExporter, Tracer, parse_traceparent, tracer
+
+# Canned Text Analytics payloads keyed by the operation at the end of the URL
+FAKE_RESULTS = {
+    "languages": {"documents": [{"id": "1", "detectedLanguage": {"name": "English", "confidenceScore": 0.99}}]},
+    "keyPhrases": {"documents": [{"id": "1", "keyPhrases": ["parking"]}]},
+    "sentiment": {"documents": [{"id": "1", "sentiment": "neutral",
+                                 "confidenceScores": {"positive": 0.1, "neutral": 0.8, "negative": 0.1}}]},
+}
+
+INCOMING_TRACEPARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class ListProcessor:
+    """Span processor keeping finished spans in memory."""
+
+    def __init__(self):
+        self.spans = []
+
+    def on_end(self, span):
+        self.spans.append(span)
+
+
+# Pytest fixture that records every span of the application tracer.
+@pytest.fixture
+def spans(monkeypatch):
+    """
+    Fixture to sample every trace and collect the finished spans in a list.
+    """
+    processor = ListProcessor()
+    monkeypatch.setattr(tracer, "processor", processor)
+    monkeypatch.setattr(tracer, "sample_ratio", 1.0)
+    return processor.spans
+
+# Pytest fixture that creates a Flask test client.
+@pytest.fixture
+def client():
+    """
+    Fixture to create a test client for the Flask app.
+    """
+    from app import create_app
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+
+# Test the request span and its children for a question.
+def test_request_span_tree(client, spans):
+    """
+    A question should produce a server span with the agent and response generation spans below it.
+    """
+    response = client.post('/api/ask', json={'question': 'Where can I park?'})
+    by_name = {span.name: span for span in spans}
+    root = by_name['POST /api/ask']
+
+    assert response.headers['X-Trace-Id'] == root.trace_id
+    assert root.parent_id is None
+    assert root.attributes['http.status_code'] == 200
+    assert by_name['process_urban_question'].parent_id == root.span_id
+    assert by_name['generate_response'].parent_id == by_name['process_urban_question'].span_id
+    assert all(span.trace_id == root.trace_id for span in spans)
+
+# Test that an incoming traceparent header is continued.
+def test_incoming_traceparent_is_continued(client, spans):
+    """
+    The request span should join the caller's trace as a child of the caller's span.
+    """
+    response = client.post('/api/ask', json={'question': 'Where can I park?'},
+                           headers={'traceparent': INCOMING_TRACEPARENT})
+    root = next(span for span in spans if span.name == 'POST /api/ask')
+    assert root.trace_id == '0af7651916cd43dd8448eb211c80319c'
+    assert root.parent_id == 'b7ad6b7169203331'
+    assert response.headers['X-Trace-Id'] == root.trace_id
+
+# Test that unsampled requests record nothing but still get a trace id.
+def test_unsampled_requests_record_no_spans(client, spans, monkeypatch):
+    """
+    With a sampling ratio of zero, no span should be recorded and the trace id should still be returned.
+    """
+    monkeypatch.setattr(tracer, "sample_ratio", 0.0)
+    response = client.post('/api/ask', json={'question': 'Where can I park?'})
+    assert spans == []
+    assert len(response.headers['X-Trace-Id']) == 32
+
+# Test that Azure calls made on worker threads join the caller's trace.
+def test_cognitive_spans_cross_threads(spans, monkeypatch):
+    """
+    The three concurrent Text Analytics calls should be children of the span that started them
+    and pass the trace on in a traceparent header.
+    """
+    sent_headers = []
+
+    def fake_post(self, url, json=None, headers=None, timeout=None, **kwargs):
+        sent_headers.append(headers)
+        return FakeResponse(FAKE_RESULTS[url.rsplit("/", 1)[-1]])
+
+    monkeypatch.setattr(requests.Session, "post", fake_post)
+    cognitive_client = CognitiveServicesClient(api_key="key", endpoint="https://example.test", cache=False)
+
+    with tracer.start_span("question") as parent:
+        cognitive_client.analyze("Where can I park?")
+
+    calls = [span for span in spans if span.name.startswith("cognitive_services.")]
+    assert sorted(span.name for span in calls) == [
+        "cognitive_services.keyPhrases", "cognitive_services.languages", "cognitive_services.sentiment"]
+    assert all(span.parent_id == parent.span_id and span.kind == "client" for span in calls)
+    assert all(parse_traceparent(headers["traceparent"])[0] == parent.trace_id for headers in sent_headers)
+
+# Test the file exporter and header parsing.
+def test_file_exporter_and_traceparent_parsing(tmp_path):
+    """
+    Exported spans should be written as JSON lines; malformed traceparent headers should be ignored.
+    """
+    processor = ListProcessor()
+    local_tracer = Tracer(processor, sample_ratio=1.0)
+    with local_tracer.start_span("outer"):
+        with local_tracer.start_span("inner"):
+            pass
+
+    path = tmp_path / "traces.jsonl"
+    FileExporter(str(path)).export(processor.spans)
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record["name"] for record in records] == ["inner", "outer"]
+    assert records[0]["parent_id"] == records[1]["span_id"]
+    assert records[1]["duration_ms"] >= 0
+
+    assert parse_traceparent("00-abc-def-01") is None
+    assert parse_traceparent("00-" + "0" * 32 + "-b7ad6b7169203331-01") is None
+    assert parse_traceparent(INCOMING_TRACEPARENT) == ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331", True)